@@ -1,11 +1,13 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
 from app.api import deps
 from app.api.deps import current_active_superuser, current_active_user
+from app.api.pagination import KeysetCursorPage
 from app.models.user import User
 
 router = APIRouter()
@@ -50,6 +52,23 @@ async def list_acmgseqvars(
     return await crud.acmgseqvar.get_multi(db, skip=skip, limit=limit)
 
 
+@router.get(
+    "/list-all-cursor",
+    dependencies=[Depends(current_active_superuser)],
+    response_model=KeysetCursorPage[schemas.AcmgSeqVarRead],
+)
+async def list_acmgseqvars_cursor(db: AsyncSession = Depends(deps.get_db)):
+    """
+    List all ACMG Sequence Variants in pages with a keyset cursor. Available only for superusers.
+
+    Unlike ``skip`` of ``/list-all``, the cursor takes the same time at any depth.
+
+    :return: page of ACMG Sequence Variants with the cursor of the next page
+    :rtype: dict
+    """
+    return await paginate(db, crud.acmgseqvar.query_multi())
+
+
 @router.get(
     "/get-by-id",
     dependencies=[Depends(current_active_superuser)],
@@ -87,6 +106,20 @@ async def list_acmgseqvars_by_user(
     return await crud.acmgseqvar.get_multi_by_user(db, user_id=user.id, skip=skip, limit=limit)
 
 
+@router.get("/list-cursor", response_model=KeysetCursorPage[schemas.AcmgSeqVarRead])
+async def list_acmgseqvars_by_user_cursor(
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    List ACMG Sequence Variants for a current user in pages with a keyset cursor.
+
+    :return: page of ACMG Sequence Variants with the cursor of the next page
+    :rtype: dict
+    """
+    return await paginate(db, crud.acmgseqvar.query_by_user(user_id=user.id))
+
+
 @router.get("/get", response_model=schemas.AcmgSeqVarRead)
 async def get_acmgseqvar_by_user(
     seqvar: str,
@@ -140,6 +173,25 @@ async def update_acmgseqvar(
         return await crud.acmgseqvar.update(db, db_obj=result, obj_in=acmgseqvar)
 
 
+@router.put("/upsert", response_model=schemas.AcmgSeqVarRead)
+async def upsert_acmgseqvar(
+    acmgseqvar: schemas.AcmgSeqVarCreate,
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    Create or replace the ACMG Sequence Variant of the current user with the same
+    ``seqvar_name`` in one statement, also for concurrent saves.
+
+    :param acmgseqvar: ACMG Sequence Variant to save
+    :type acmgseqvar: dict or :class:`.schemas.AcmgSeqVarCreate`
+    :return: ACMG Sequence Variant
+    :rtype: dict
+    """
+    acmgseqvar.user = user.id
+    return await crud.acmgseqvar.upsert(db, obj_in=acmgseqvar)
+
+
 @router.delete(
     "/delete-by-id",
     dependencies=[Depends(current_active_superuser)],
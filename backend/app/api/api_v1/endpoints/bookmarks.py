@@ -1,11 +1,13 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
 from app.api import deps
 from app.api.deps import current_active_superuser, current_active_user
+from app.api.pagination import KeysetCursorPage
 from app.models.user import User
 
 router = APIRouter()
@@ -48,6 +50,23 @@ async def list_bookmarks(skip: int = 0, limit: int = 100, db: AsyncSession = Dep
     return await crud.bookmark.get_multi(db, skip=skip, limit=limit)
 
 
+@router.get(
+    "/list-all-cursor",
+    dependencies=[Depends(current_active_superuser)],
+    response_model=KeysetCursorPage[schemas.BookmarkRead],
+)
+async def list_bookmarks_cursor(db: AsyncSession = Depends(deps.get_db)):
+    """
+    List all bookmarks in pages with a keyset cursor. Available only for superusers.
+
+    Unlike ``skip`` of ``/list-all``, the cursor takes the same time at any depth.
+
+    :return: page of bookmarks with the cursor of the next page
+    :rtype: dict
+    """
+    return await paginate(db, crud.bookmark.query_multi())
+
+
 @router.get(
     "/get-by-id",
     dependencies=[Depends(current_active_superuser)],
@@ -110,6 +129,20 @@ async def list_bookmarks_for_user(
     return await crud.bookmark.get_multi_by_user(db, user_id=user.id, skip=skip, limit=limit)
 
 
+@router.get("/list-cursor", response_model=KeysetCursorPage[schemas.BookmarkRead])
+async def list_bookmarks_for_user_cursor(
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    List bookmarks for a current user in pages with a keyset cursor.
+
+    :return: page of bookmarks with the cursor of the next page
+    :rtype: dict
+    """
+    return await paginate(db, crud.bookmark.query_by_user(user_id=user.id))
+
+
 @router.get("/get", response_model=schemas.BookmarkRead)
 async def get_bookmark_for_user(
     obj_type: str,
@@ -174,3 +207,64 @@ async def delete_bookmark_for_user(
             return Response(status_code=204)
         else:
             raise HTTPException(status_code=404, detail="Bookmark not found")
+
+
+@router.post("/get-batch", response_model=list[schemas.BookmarkRead])
+async def get_bookmarks_for_user(
+    batch: schemas.BookmarkBatch,
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    Get the bookmarks of the current user on any of the given objects with one query.
+
+    :param batch: objects to look up the bookmarks of
+    :type batch: dict or :class:`.schemas.BookmarkBatch`
+    :return: the existing bookmarks, objects without bookmark are left out
+    :rtype: list
+    """
+    return await crud.bookmark.get_multi_by_user_and_objs(
+        db,
+        user_id=user.id,
+        objs=[(bookmark.obj_type, bookmark.obj_id) for bookmark in batch.bookmarks],
+    )
+
+
+@router.post("/create-batch", response_model=list[schemas.BookmarkRead])
+async def create_bookmarks_for_user(
+    batch: schemas.BookmarkBatch,
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    Bookmark the given objects for the current user in one transaction.
+
+    Objects that are bookmarked already keep their bookmark.
+
+    :param batch: objects to bookmark
+    :type batch: dict or :class:`.schemas.BookmarkBatch`
+    :return: the bookmarks of the objects, in the order of the request
+    :rtype: list
+    """
+    return await crud.bookmark.bulk_create_for_user(db, user_id=user.id, objs_in=batch.bookmarks)
+
+
+@router.post("/delete-batch", response_model=list[schemas.BookmarkRead])
+async def delete_bookmarks_for_user(
+    batch: schemas.BookmarkBatch,
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    Delete the bookmarks of the current user on the given objects in one transaction.
+
+    :param batch: objects to delete the bookmarks of
+    :type batch: dict or :class:`.schemas.BookmarkBatch`
+    :return: the deleted bookmarks, objects without bookmark are left out
+    :rtype: list
+    """
+    return await crud.bookmark.bulk_remove_for_user(
+        db,
+        user_id=user.id,
+        objs=[(bookmark.obj_type, bookmark.obj_id) for bookmark in batch.bookmarks],
+    )
@@ -1,11 +1,13 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
 from app.api import deps
 from app.api.deps import current_active_superuser, current_active_user
+from app.api.pagination import KeysetCursorPage
 from app.models.user import User
 
 router = APIRouter()
@@ -48,6 +50,23 @@ async def list_caseinfos(skip: int = 0, limit: int = 100, db: AsyncSession = Dep
     return await crud.caseinfo.get_multi(db, skip=skip, limit=limit)
 
 
+@router.get(
+    "/list-all-cursor",
+    dependencies=[Depends(current_active_superuser)],
+    response_model=KeysetCursorPage[schemas.CaseInfoRead],
+)
+async def list_caseinfos_cursor(db: AsyncSession = Depends(deps.get_db)):
+    """
+    List all Case Information in pages with a keyset cursor. Available only for superusers.
+
+    Unlike ``skip`` of ``/list-all``, the cursor takes the same time at any depth.
+
+    :return: page of Case Information with the cursor of the next page
+    :rtype: dict
+    """
+    return await paginate(db, crud.caseinfo.query_multi())
+
+
 @router.get(
     "/get-by-id",
     dependencies=[Depends(current_active_superuser)],
@@ -83,6 +102,20 @@ async def list_caseinfos_for_user(
     return await crud.caseinfo.get_multi_by_user(db, user_id=user.id)
 
 
+@router.get("/list-cursor", response_model=KeysetCursorPage[schemas.CaseInfoRead])
+async def list_caseinfos_for_user_cursor(
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    List Case Information for a current user in pages with a keyset cursor.
+
+    :return: page of Case Information with the cursor of the next page
+    :rtype: dict
+    """
+    return await paginate(db, crud.caseinfo.query_by_user(user_id=user.id))
+
+
 @router.get("/get", response_model=schemas.CaseInfoRead)
 async def get_caseinfo_for_user(
     db: AsyncSession = Depends(deps.get_db),
@@ -132,6 +165,27 @@ async def update_caseinfo_for_user(
     return await crud.caseinfo.update(db, db_obj=caseinfo, obj_in=caseinfoupdate)
 
 
+@router.put("/upsert", response_model=schemas.CaseInfoRead)
+async def upsert_caseinfo_for_user(
+    caseinfo: schemas.CaseInfoCreate,
+    db: AsyncSession = Depends(deps.get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    Create or replace the Case Information of the current user with the same
+    ``pseudonym`` in one statement, also for concurrent saves.
+
+    :param caseinfo: Case Information to save, a missing pseudonym is the empty one
+    :type caseinfo: dict or :class:`.schemas.CaseInfoCreate`
+    :return: Case Information
+    :rtype: dict
+    """
+    caseinfo.user = user.id
+    if caseinfo.pseudonym is None:
+        caseinfo.pseudonym = ""
+    return await crud.caseinfo.upsert(db, obj_in=caseinfo)
+
+
 @router.delete(
     "/delete-by-id",
     dependencies=[Depends(current_active_superuser)],
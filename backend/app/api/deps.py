@@ -1,12 +1,9 @@
-from typing import AsyncIterator
-
 from app.core import auth
-from app.db.session import SessionLocal
+from app.core.deps import get_async_session
 
 current_active_user = auth.fastapi_users.current_user(active=True)
 current_active_superuser = auth.fastapi_users.current_user(active=True, superuser=True)
+current_optional_user = auth.fastapi_users.current_user(active=True, optional=True)
 
-
-async def get_db() -> AsyncIterator[SessionLocal]:  # type: ignore[valid-type]
-    async with SessionLocal() as db:
-        yield db
+#: The database session of the request, shared with the authentication.
+get_db = get_async_session
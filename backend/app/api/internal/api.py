@@ -1,198 +1,24 @@
-import datetime
 import subprocess
 
-from fastapi import APIRouter, Response
+from fastapi import APIRouter, Depends, Response
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from app.api.internal.endpoints import proxy, remote
+from app.api.deps import current_active_superuser
+from app.api.internal.endpoints import aggregate, proxy, remote
+from app.core.cache import response_cache
 from app.core.config import settings
+from app.core.dataversions import DATA_VERSIONS, TODAY, DataVersions  # noqa
+from app.core.diskcache import remote_cache
+from app.core.metrics import registry
+from app.core.resilience import upstream_guards
+from app.core.versionregistry import data_version_registry
 
 api_router = APIRouter()
 
 api_router.include_router(proxy.router, prefix="/proxy", tags=["proxy"])
 api_router.include_router(remote.router, prefix="/remote", tags=["remote"])
-
-
-class DataVersions(BaseModel):
-    """Container with data versions."""
-
-    #: Annonars version.
-    annonars: str
-    #: AutoACMG version.
-    autoacmg: str
-    #: Viguno version.
-    viguno: str
-    #: Mehari version.
-    mehari: str
-    #: Cada-prio version.
-    cada_prio: str
-    #: Dotty version.
-    dotty: str
-    #: Variant validator version.
-    variant_validator: str
-    #: InterVar version.
-    intervar: str
-    #: AutoCNV version.
-    autocnv: str
-    #: PubTator3 version.
-    pubtator3: str
-    #: Beacon Network version.
-    beacon_network: str
-    #: String to use for AlphaMissense version.
-    alphamissense: str
-    #: String to use for ClinGen gene curation version.
-    clingen_gene: str
-    #: String to use for ClinGen variant curation version.
-    clingen_variant: str
-    #: String to use for GRCh37 ENSEMBL version.
-    ensembl_37: str
-    #: String to use for GRCh38 ENSEMBL version.
-    ensembl_38: str
-    #: String to use for ENSEMBL version.
-    ensembl: str
-    #: Version of dbNSFP.
-    dbnsfp: str
-    #: Version of dbscSNV.
-    dbscsnv: str
-    #: Version of CADD.
-    cadd: str
-    #: Version of gnomAD for constraints.
-    gnomad_constraints: str
-    #: Version of gnomAD mtDNA.
-    gnomad_mtdna: str
-    #: Version of gnomAD v2.
-    gnomad_v2: str
-    #: Version of gnomAD v3.
-    gnomad_v3: str
-    #: Version of gnomAD v4.
-    gnomad_v4: str
-    #: Version of gnomAD SV.
-    gnomad_sv: str
-    #: Version of gnomAD CNV v4.
-    gnomad_cnv4: str
-    #: Version of gnomAD SV v4.
-    gnomad_sv4: str
-    #: Version of dbVar.
-    dbvar: str
-    #: Version of DGV.
-    dgv: str
-    #: Version of DGV Gold Standard.
-    dgv_gs: str
-    #: ExAC CNVs.
-    exac_cnv: str
-    #: Thousand Genomes SVs.
-    g1k_svs: str
-    #: HelixMtDb
-    helixmtdb: str
-    #: UCSC conservation (GRCh37).
-    ucsc_cons_37: str
-    #: UCSC conservation (GRCh38).
-    ucsc_cons_38: str
-    #: UCSC repeat masker (GRCh37).
-    ucsc_rmsk_37: str
-    #: UCSC repeat masker (GRCh38).
-    ucsc_rmsk_38: str
-    #: UCSC genomicSuperDups (GRCh37).
-    ucsc_genomic_super_dups_37: str
-    #: UCSC genomicSuperDups (GRCh38).
-    ucsc_genomic_super_dups_38: str
-    #: UCSC genome browser altSeqLiftOverPsl (GRCh37).
-    ucsc_alt_seq_liftover_37: str
-    #: UCSC genome browser altSeqLiftOverPsl (GRCh38).
-    ucsc_alt_seq_liftover_38: str
-    #: UCSC genome browser fixSeqLiftOverPsl (GRCh37).
-    ucsc_fix_seq_liftover_37: str
-    #: UCSC genome browser fixSeqLiftOverPsl (GRCh38).
-    ucsc_fix_seq_liftover_38: str
-    #: RefSeq version (GRCh37).
-    refseq_37: str
-    #: RefSeq version (GRCh38).
-    refseq_38: str
-    #: dbSNP version.
-    dbsnp: str
-    #: ACMG secondary findings version.
-    acmg_sf: str
-    #: HPO
-    hpo: str
-    #: Orphadata
-    orphadata: str
-    #: Pathogenic MMS
-    patho_mms: str
-    #: Mehari transcript data.
-    mehari_tx: str
-    #: ClinVar release.
-    clinvar_release: str
-    #: ClinVar version.
-    clinvar_version: str
-    #: RefSeq functional elements for GRCh37.
-    refseq_fe_37: str
-    #: RefSeq functional elements for GRCh38.
-    refseq_fe_38: str
-
-
-#: The current date.
-TODAY = datetime.date.strftime(datetime.date.today(), "%Y%m%d")
-
-#: The data versions to use.
-DATA_VERSIONS = DataVersions(
-    annonars="0.2.1",
-    autoacmg="0.3.0",
-    viguno="0.36.1",
-    mehari="0.25.4",
-    cada_prio="0.6.1",
-    dotty="0.4.1",
-    variant_validator="2.2.1",
-    intervar="2021-08",
-    autocnv="latest",
-    pubtator3="latest",
-    beacon_network="latest",
-    alphamissense="1",
-    clingen_gene=TODAY,
-    clingen_variant=TODAY,
-    ensembl_37="87",
-    ensembl_38="109",
-    ensembl="111",
-    dbnsfp="4.5",
-    dbscsnv="1.1",
-    cadd="1.6",
-    gnomad_constraints="4.0",
-    gnomad_mtdna="3.1",
-    gnomad_v2="2.1.1",
-    gnomad_v3="3.1.2",
-    gnomad_v4="4.0",
-    gnomad_sv="2.1.1",
-    gnomad_cnv4="4.0",
-    gnomad_sv4="4.0",
-    dbvar="20231030",
-    dgv="20200225",
-    dgv_gs="20160515",
-    exac_cnv="0.3.1",
-    g1k_svs="phase3v2",
-    helixmtdb="20200327",
-    ucsc_cons_37="20161007",
-    ucsc_cons_38="20190906",
-    ucsc_rmsk_37="20200322",
-    ucsc_rmsk_38="20221018",
-    ucsc_genomic_super_dups_37="20111025",
-    ucsc_genomic_super_dups_38="20141019",
-    ucsc_alt_seq_liftover_37="20200322",
-    ucsc_alt_seq_liftover_38="20221103",
-    ucsc_fix_seq_liftover_37="20200524",
-    ucsc_fix_seq_liftover_38="20221103",
-    refseq_37="105",
-    refseq_38="GCF_000001405.40+RS_2023_03",
-    dbsnp="b151",
-    acmg_sf="3.1",
-    hpo="20240116",
-    orphadata=TODAY,
-    patho_mms="20220730",
-    mehari_tx="0.4.4",
-    clinvar_release="2023_09",
-    clinvar_version="v2.0",
-    refseq_fe_37="105.20201022",
-    refseq_fe_38="110",
-)
+api_router.include_router(aggregate.router, prefix="/aggregate", tags=["aggregate"])
 
 
 @api_router.get("/version")
@@ -233,7 +59,72 @@ async def data_versions():
     """
     Return versions of data and services used in the application.
 
+    The versions are probed from the upstream services at runtime, see
+    :mod:`app.core.versionregistry`.
+
     :return: A JSON response containing the versions of various data and services.
     :rtype: dict
     """
-    return JSONResponse(content=DATA_VERSIONS.dict())
+    return Response(content=data_version_registry.body, media_type="application/json")
+
+
+@api_router.get("/proxy-cache/stats", dependencies=[Depends(current_active_superuser)])
+async def proxy_cache_stats():
+    """
+    Return hit/miss counters of the reverse proxy response cache.  Available only
+    for superusers.
+
+    :return: counters and size of the in-process cache tier
+    :rtype: dict
+    """
+    return JSONResponse(content=response_cache.stats())
+
+
+@api_router.get("/remote-cache/stats", dependencies=[Depends(current_active_superuser)])
+async def remote_cache_stats():
+    """
+    Return hit/miss counters and the usage of the remote service cache.  Available
+    only for superusers.
+
+    :return: counters, and entries and size by service
+    :rtype: dict
+    """
+    return JSONResponse(content=await remote_cache.stats())
+
+
+@api_router.delete("/remote-cache", dependencies=[Depends(current_active_superuser)])
+async def remote_cache_purge(service: str | None = None):
+    """
+    Purge the remote service cache. Available only for superusers.
+
+    :param service: only purge the responses of this service, e.g., ``variantvalidator``
+    :type service: str
+    :return: number of purged entries
+    :rtype: dict
+    """
+    return JSONResponse(content={"purged": await remote_cache.purge(service)})
+
+
+@api_router.get("/circuit-breakers", dependencies=[Depends(current_active_superuser)])
+async def circuit_breakers():
+    """
+    Return the state of the bulkheads and circuit breakers of the upstream services.
+    Available only for superusers.
+
+    :return: state by upstream name (or remote host name)
+    :rtype: dict
+    """
+    return JSONResponse(content=upstream_guards.state())
+
+
+@api_router.get("/metrics", dependencies=[Depends(current_active_superuser)])
+async def metrics():
+    """
+    Return the metrics of upstream requests, database queries, Redis token lookups
+    and the event loop lag in the Prometheus text format.  Available only for
+    superusers.
+
+    :return: metrics in the Prometheus text exposition format
+    :rtype: str
+    """
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,308 @@
+"""Aggregation of the upstream data shown on one page into one response."""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable
+from urllib.parse import urlencode
+
+import httpx
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.api import deps
+from app.api.deps import current_optional_user
+from app.api.internal.endpoints import proxy
+from app.api.internal.endpoints.remote import (
+    PUBTATOR3_URL,
+    fetch_shared,
+    fetch_variantvalidator,
+    wintervar_acmg,
+)
+from app.core.cache import CachedResponse, cache_key, data_version, response_cache
+from app.core.config import settings
+from app.core.resilience import UpstreamUnavailable
+from app.models.user import User
+from app.schemas.aggregate import AggregateSection, GeneAggregateSection, VariantAggregate
+from app.schemas.common import HgncId, SeqvarName, StrucvarName
+
+router = APIRouter()
+
+#: Headers for the requests to the upstreams, the bodies are parsed.
+UPSTREAM_HEADERS = [(b"accept", b"application/json"), (b"accept-encoding", b"identity")]
+
+#: Entries of ``DATA_VERSIONS`` the cached sections of the gene aggregate depend on,
+#: part of their cache key.
+GENE_DATA_VERSIONS = ("annonars", "clinvar_release", "viguno")
+
+#: Sections of the gene aggregate stored in ``response_cache``.  The literature has no
+#: data version and is searched on every request (its responses are kept in
+#: ``remote_cache`` for the PubTator 3 TTL).
+GENE_CACHED_SECTIONS = ("info", "clinvar", "hpo")
+
+
+def to_section(entry: CachedResponse) -> AggregateSection:
+    """Convert a buffered upstream response to a section."""
+    _, data = proxy.parse_body(entry)
+    if entry.status_code >= 400:
+        error = data if isinstance(data, str) else f"upstream returned {entry.status_code}"
+        return AggregateSection(status=entry.status_code, error=error)
+    return AggregateSection(status=entry.status_code, data=data)
+
+
+async def proxy_section(upstream_name: str, path: str, **query: str) -> AggregateSection:
+    """Fetch a section from an upstream behind ``/internal/proxy``, using its cache."""
+    upstream = proxy.upstream_registry.upstreams[upstream_name]
+    entry = await proxy.fetch_buffered(
+        upstream, path, urlencode(query), method="GET", headers=UPSTREAM_HEADERS, body=b""
+    )
+    return to_section(entry)
+
+
+async def remote_section(url: str) -> AggregateSection:
+    """Fetch a section from a remote service."""
+    return to_section(await fetch_shared("GET", url, decode=True))
+
+
+async def variantvalidator_section(path: str) -> AggregateSection:
+    """Fetch a section from VariantValidator, batched with concurrent lookups."""
+    return to_section(await fetch_variantvalidator(path, "content-type=application/json"))
+
+
+async def response_section(response: Awaitable[Response]) -> AggregateSection:
+    """Convert the response of a remote endpoint implementation to a section."""
+    resp = await response
+    entry = CachedResponse.from_upstream(resp.status_code, resp.headers.items(), resp.body)
+    return to_section(entry)
+
+
+async def bookmark_section(
+    db: AsyncSession, user: User | None, obj_type: str, obj_id: str
+) -> AggregateSection:
+    """Look up the bookmark of the current user for the object."""
+    if user is None:
+        return AggregateSection(status=401, error="Not authenticated")
+    bookmark = await crud.bookmark.get_by_user_and_obj(
+        db, user_id=user.id, obj_type=obj_type, obj_id=obj_id
+    )
+    if bookmark is None:
+        return AggregateSection(status=404, error="Bookmark not found")
+    return AggregateSection(
+        status=200, data=schemas.BookmarkRead.model_validate(bookmark).model_dump(mode="json")
+    )
+
+
+async def guarded(section: Awaitable[AggregateSection]) -> AggregateSection:
+    """Await a section, converting timeouts and upstream errors to error sections."""
+    try:
+        return await asyncio.wait_for(section, settings.AGGREGATE_SECTION_TIMEOUT)
+    except asyncio.TimeoutError:
+        return AggregateSection(status=504, error="Timeout waiting for upstream")
+    except UpstreamUnavailable as e:
+        return AggregateSection(status=503, error=str(e))
+    except httpx.HTTPError as e:
+        return AggregateSection(status=502, error=f"Upstream request failed: {e!r}")
+
+
+async def gather_sections(
+    sections: dict[str, Awaitable[AggregateSection]],
+) -> dict[str, AggregateSection]:
+    """Fetch all sections concurrently; failed sections carry an error marker."""
+    results = await asyncio.gather(*(guarded(section) for section in sections.values()))
+    return dict(zip(sections, results))
+
+
+@router.get("/seqvar/{seqvar_name}", response_model=VariantAggregate)
+async def seqvar(
+    seqvar_name: SeqvarName,
+    db: AsyncSession = Depends(deps.get_db),
+    user: User | None = Depends(current_optional_user),
+):
+    """
+    Return the data shown on the page of a sequence variant with one request.
+
+    The sections are fetched concurrently through the reverse proxy (and its
+    cache) and the remote endpoints:
+
+    - ``variant``: annonars variant annotations
+    - ``consequences``: mehari transcript consequences
+    - ``variantvalidator``: VariantValidator results
+    - ``acmg``: WinterVar ACMG rating
+    - ``bookmark``: bookmark of the current user
+
+    Sections that failed have ``error`` set and the status of the failed request.
+
+    :param seqvar_name: the variant, e.g., ``grch37-1-55516888-G-GA``
+    :type seqvar_name: str
+    :return: the aggregated data
+    :rtype: :class:`app.schemas.aggregate.VariantAggregate`
+    """
+    release, chromosome, position, reference, alternative = seqvar_name.split("-")
+    variant = {"chromosome": chromosome, "reference": reference, "alternative": alternative}
+    vv_release = release.replace("grch", "GRCh")
+    sections: dict[str, Awaitable[AggregateSection]] = {
+        "variant": proxy_section(
+            "annonars", "/annos/variant", genome_release=release, pos=position, **variant
+        ),
+        "consequences": proxy_section(
+            "mehari", "/seqvars/csq", genome_release=release, position=position, **variant
+        ),
+        "variantvalidator": variantvalidator_section(
+            f"{vv_release}/{chromosome}-{position}-{reference}-{alternative}/all"
+        ),
+        "acmg": response_section(
+            wintervar_acmg(
+                chromosome,
+                position,
+                reference,
+                alternative,
+                "hg19" if release == "grch37" else "hg38",
+            )
+        ),
+        "bookmark": bookmark_section(db, user, "seqvar", seqvar_name),
+    }
+    return VariantAggregate(name=seqvar_name, sections=await gather_sections(sections))
+
+
+@router.get("/strucvar/{strucvar_name}", response_model=VariantAggregate)
+async def strucvar(
+    strucvar_name: StrucvarName,
+    db: AsyncSession = Depends(deps.get_db),
+    user: User | None = Depends(current_optional_user),
+):
+    """
+    Return the data shown on the page of a structural variant with one request.
+
+    The sections are fetched concurrently:
+
+    - ``consequences``: mehari transcript consequences
+    - ``clinvar``: overlapping ClinVar structural variants from annonars
+    - ``bookmark``: bookmark of the current user
+
+    Sections that failed have ``error`` set and the status of the failed request.
+
+    :param strucvar_name: the variant, e.g., ``DEL-grch37-17-41176312-41277500``
+    :type strucvar_name: str
+    :return: the aggregated data
+    :rtype: :class:`app.schemas.aggregate.VariantAggregate`
+    """
+    sv_type, release, chromosome, start, stop = strucvar_name.split("-")
+    region = {"genome_release": release, "chromosome": chromosome, "start": start, "stop": stop}
+    sections: dict[str, Awaitable[AggregateSection]] = {
+        "consequences": proxy_section("mehari", "/strucvars/csq", sv_type=sv_type, **region),
+        "clinvar": proxy_section("annonars", "/clinvar-sv/query", **region),
+        "bookmark": bookmark_section(db, user, "strucvar", strucvar_name),
+    }
+    return VariantAggregate(name=strucvar_name, sections=await gather_sections(sections))
+
+
+def gene_symbol(info: AggregateSection, hgnc_id: str) -> str | None:
+    """Return the gene symbol from the annonars gene info section, if available."""
+    data: Any = info.data
+    try:
+        return data["genes"][hgnc_id]["hgnc"]["symbol"]
+    except (KeyError, TypeError):
+        return None
+
+
+async def literature_section(
+    hgnc_id: str, info: asyncio.Future[AggregateSection]
+) -> AggregateSection:
+    """Search PubTator 3 for the gene once its symbol is known from the gene info."""
+    symbol = gene_symbol(await asyncio.shield(info), hgnc_id)
+    if symbol is None:
+        return AggregateSection(status=424, error="Gene symbol not available")
+    return await remote_section(f"{PUBTATOR3_URL}search/?text=@GENE_{symbol}&sort=score%20desc")
+
+
+async def stream_sections(
+    tasks: dict[str, asyncio.Task[AggregateSection]], key: str | None, cached: bytes = b""
+) -> AsyncIterator[bytes]:
+    """Yield the ``cached`` lines and then the sections as NDJSON lines as they complete.
+
+    The sections in ``GENE_CACHED_SECTIONS`` are stored in ``response_cache`` under
+    ``key`` unless one of them failed with a server error or timeout.  Remaining
+    tasks are cancelled when the client disconnects.
+    """
+    names = {task: name for name, task in tasks.items()}
+    pending = set(tasks.values())
+    lines = []
+    complete = True
+    try:
+        if cached:
+            yield cached
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                section = task.result()
+                line = GeneAggregateSection(section=names[task], **section.model_dump())
+                data = line.model_dump_json().encode() + b"\n"
+                if names[task] in GENE_CACHED_SECTIONS:
+                    complete = complete and section.status < 500
+                    lines.append(data)
+                yield data
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    if key is not None and complete:
+        entry = CachedResponse(200, [("content-type", "application/x-ndjson")], b"".join(lines))
+        await response_cache.set(key, entry)
+
+
+@router.get("/gene/{hgnc_id}")
+async def gene(hgnc_id: HgncId) -> Response:
+    """
+    Return the data shown on the page of a gene with one request.
+
+    The sections are fetched concurrently and each is streamed as one line of
+    NDJSON (see :class:`app.schemas.aggregate.GeneAggregateSection`) as soon as
+    it is complete:
+
+    - ``info``: annonars gene info
+    - ``clinvar``: annonars ClinVar gene summary
+    - ``hpo``: viguno HPO terms of the gene
+    - ``literature``: PubTator 3 search for the gene symbol (after ``info``)
+
+    The ``info``, ``clinvar`` and ``hpo`` sections are cached per version of the data
+    they depend on (see ``GENE_DATA_VERSIONS``) and served in one piece from the
+    cache.  The ``literature`` is searched on every request, with the gene symbol
+    from the cached ``info`` section.
+
+    :param hgnc_id: the gene, e.g., ``HGNC:1100``
+    :type hgnc_id: str
+    :return: NDJSON stream of the sections
+    :rtype: :class:`fastapi.responses.StreamingResponse`
+    """
+    key = None
+    if settings.PROXY_CACHE_ENABLED:
+        versions = "/".join(data_version(name) for name in GENE_DATA_VERSIONS)
+        key = cache_key("aggregate", "/gene", f"hgnc_id={hgnc_id}", version=versions)
+        entry = await response_cache.get(key)
+        if entry is not None:
+            sections = map(GeneAggregateSection.model_validate_json, entry.body.splitlines())
+            cached = {line.section: line for line in sections}
+            info_section: asyncio.Future[AggregateSection] = asyncio.Future()
+            info_section.set_result(
+                AggregateSection(**cached["info"].model_dump(exclude={"section"}))
+            )
+            tasks = {
+                "literature": asyncio.ensure_future(
+                    guarded(literature_section(hgnc_id, info_section))
+                )
+            }
+            return StreamingResponse(
+                stream_sections(tasks, None, entry.body), media_type="application/x-ndjson"
+            )
+
+    info = asyncio.ensure_future(guarded(proxy_section("annonars", "/genes/info", hgnc_id=hgnc_id)))
+    tasks = {
+        "info": info,
+        "clinvar": asyncio.ensure_future(
+            guarded(proxy_section("annonars", "/genes/clinvar", hgnc_id=hgnc_id))
+        ),
+        "hpo": asyncio.ensure_future(
+            guarded(proxy_section("viguno", "/hpo/genes", gene_id=hgnc_id, hpo_terms="true"))
+        ),
+        "literature": asyncio.ensure_future(guarded(literature_section(hgnc_id, info))),
+    }
+    return StreamingResponse(stream_sections(tasks, key), media_type="application/x-ndjson")
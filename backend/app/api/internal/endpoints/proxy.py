@@ -1,21 +1,263 @@
 """Reverse proxies to internal services."""
 
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable
+
 import httpx
 from fastapi import APIRouter, BackgroundTasks, Request, Response
 from fastapi.responses import StreamingResponse
 from starlette.background import BackgroundTask
 
+from app.core.cache import (
+    CachedResponse,
+    cache_key,
+    data_version,
+    entity_tag,
+    if_none_match,
+    response_cache,
+    validity_period,
+)
 from app.core.config import settings
+from app.core.metrics import observe_upstream, observe_upstream_bytes
+from app.core.resilience import UpstreamUnavailable, upstream_guards
+from app.core.singleflight import SingleFlight
+from app.core.upstreams import (
+    ResponseTooLarge,
+    Upstream,
+    send_buffered,
+    send_hedged,
+    upstream_clients,
+    upstream_registry,
+)
+from app.schemas.proxy import BatchRequest, BatchResult, BatchSubRequest
 
 router = APIRouter()
 
+#: Methods whose requests are forwarded without reading a body.
+BODILESS_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+#: Coalesces identical concurrent GET requests to cacheable upstreams.
+proxy_flight: SingleFlight[CachedResponse] = SingleFlight()
+
+
+async def cache_through(backend_resp: httpx.Response, key: str) -> AsyncIterator[bytes]:
+    """Stream the upstream response and store it in the cache once it is complete.
+
+    Responses larger than ``PROXY_CACHE_MAX_ITEM_BYTES`` are streamed but not stored.
+    """
+    chunks: list[bytes] | None = []
+    size = 0
+    async for chunk in backend_resp.aiter_raw():
+        if chunks is not None:
+            size += len(chunk)
+            if size > settings.PROXY_CACHE_MAX_ITEM_BYTES:
+                chunks = None
+            else:
+                chunks.append(chunk)
+        yield chunk
+    if chunks is not None:
+        await response_cache.set(
+            key,
+            CachedResponse.from_upstream(
+                backend_resp.status_code, backend_resp.headers.multi_items(), b"".join(chunks)
+            ),
+        )
+
+
+async def close_upstream(upstream: Upstream, backend_resp: httpx.Response):
+    """Close a streamed upstream response and record the number of bytes received."""
+    await backend_resp.aclose()
+    observe_upstream_bytes(upstream.name, backend_resp.num_bytes_downloaded)
+
+
+async def fetch_and_cache(
+    fetch: Callable[[], Awaitable[CachedResponse]], key: str
+) -> CachedResponse:
+    """Fetch the buffered upstream response and store it in the cache if successful."""
+    entry = await fetch()
+    if entry.status_code == 200 and len(entry.body) <= settings.PROXY_CACHE_MAX_ITEM_BYTES:
+        await response_cache.set(key, entry)
+    return entry
+
+
+def streaming_response(
+    upstream: Upstream,
+    backend_resp: httpx.Response,
+    content: AsyncIterator[bytes],
+    validators: dict[str, str] | None,
+) -> StreamingResponse:
+    """Return a response streaming ``content`` of ``backend_resp`` and closing it afterwards."""
+    headers = backend_resp.headers
+    if validators is not None and backend_resp.status_code == 200:
+        headers = headers.copy()
+        headers.update(validators)
+    return StreamingResponse(
+        content,
+        status_code=backend_resp.status_code,
+        headers=headers,
+        background=BackgroundTasks([BackgroundTask(close_upstream, upstream, backend_resp)]),
+    )
+
+
+def content_length(request: Request) -> int:
+    """Return the declared length of the request body, -1 if it is not known."""
+    try:
+        return int(request.headers.get("content-length", "-1"))
+    except ValueError:
+        return -1
+
+
+async def fetch_buffered(
+    upstream: Upstream,
+    upstream_path: str,
+    query: str,
+    *,
+    method: str,
+    headers: list[tuple[bytes, bytes]],
+    body: bytes,
+    max_size: int | None = None,
+) -> CachedResponse:
+    """Fetch the buffered response of an upstream, using the cache if possible.
+
+    Identical concurrent GET requests to cacheable upstreams share one upstream call
+    and GET requests are hedged, see ``send_hedged``.
+
+    :raises ResponseTooLarge: if the body is larger than ``max_size``, see ``send_buffered``
+    """
+    key = None
+    if upstream.cacheable and settings.PROXY_CACHE_ENABLED:
+        accept_encoding = next(
+            (v.decode("latin-1") for k, v in headers if k.lower() == b"accept-encoding"), ""
+        )
+        key = cache_key(
+            upstream.name,
+            upstream_path,
+            query,
+            version=data_version(upstream.data_version),
+            method=method,
+            body=body,
+            accept_encoding=accept_encoding,
+        )
+        entry = await response_cache.get(key)
+        if entry is not None:
+            return entry
+
+    client = upstream_clients(upstream.name)
+    guard = upstream_guards(upstream.name)
+
+    def build_request() -> httpx.Request:
+        backend_url = upstream.base_url() + upstream_path + (f"?{query}" if query else "")
+        return client.build_request(
+            method=method, url=backend_url, headers=headers, content=body, timeout=upstream.timeout
+        )
+
+    def fetch() -> Awaitable[CachedResponse]:
+        if method == "GET":
+            return send_hedged(client, build_request, guard, max_size=max_size)
+        else:
+            return send_buffered(client, build_request(), guard=guard, max_size=max_size)
+
+    if key is None:
+        return await fetch()
+    elif method == "GET":
+        return await proxy_flight.do(key, lambda: fetch_and_cache(fetch, key))
+    else:
+        return await fetch_and_cache(fetch, key)
+
+
+def parse_body(entry: CachedResponse) -> tuple[str | None, Any]:
+    """Return the content type and the parsed JSON body or the body as text of a response."""
+    content_type = next((v for k, v in entry.headers if k.lower() == "content-type"), None)
+    body: Any = entry.body.decode("utf-8", errors="replace")
+    if content_type is not None and "json" in content_type:
+        try:
+            body = json.loads(entry.body)
+        except ValueError:
+            pass
+    return content_type, body
+
+
+async def batch_item(idx: int, item: BatchSubRequest) -> BatchResult:
+    """Execute one sub-request of a batch and convert the response to a result."""
+    item_id = item.id if item.id is not None else str(idx)
+    path, _, query = item.path.lstrip("/").partition("?")
+    resolved = upstream_registry.resolve(path)
+    if resolved is None:
+        return BatchResult(id=item_id, status=404, body="Reverse proxy route not found")
+    upstream, upstream_path = resolved
+    if item.method not in upstream.methods:
+        return BatchResult(id=item_id, status=405, body="Method not allowed for upstream")
+
+    headers = [(b"accept", b"application/json"), (b"accept-encoding", b"identity")]
+    body = b""
+    if item.method == "POST":
+        headers.append((b"content-type", b"application/json"))
+        body = json.dumps(item.body).encode()
+    try:
+        entry = await fetch_buffered(
+            upstream, upstream_path, query, method=item.method, headers=headers, body=body
+        )
+    except UpstreamUnavailable as e:
+        return BatchResult(id=item_id, status=503, body=str(e))
+    except httpx.HTTPError as e:
+        return BatchResult(id=item_id, status=502, body=f"Upstream request failed: {e!r}")
+
+    content_type, result_body = parse_body(entry)
+    return BatchResult(
+        id=item_id, status=entry.status_code, content_type=content_type, body=result_body
+    )
+
+
+async def batch_results(batch: BatchRequest) -> AsyncIterator[bytes]:
+    """Execute the sub-requests concurrently and yield NDJSON lines as they complete.
+
+    At most ``PROXY_BATCH_CONCURRENCY`` sub-requests are in flight at the same time.
+    Remaining sub-requests are cancelled when the client disconnects.
+    """
+    semaphore = asyncio.Semaphore(settings.PROXY_BATCH_CONCURRENCY)
+
+    async def bounded(idx: int, item: BatchSubRequest) -> BatchResult:
+        async with semaphore:
+            return await batch_item(idx, item)
+
+    tasks = [asyncio.ensure_future(bounded(idx, item)) for idx, item in enumerate(batch.requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            yield result.model_dump_json().encode() + b"\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/batch")
+async def batch(batch: BatchRequest) -> StreamingResponse:
+    """
+    Execute multiple proxy requests with one round trip.
+
+    The sub-requests are sent concurrently over the shared upstream pools and each
+    result is streamed back as one line of NDJSON as soon as it is complete, so the
+    order of the lines is not the order of the sub-requests.  Each line carries the
+    ``id`` of its sub-request and the status of the upstream response.
+
+    :param batch: the sub-requests
+    :type batch: :class:`app.schemas.proxy.BatchRequest`
+    :return: NDJSON stream of :class:`app.schemas.proxy.BatchResult`
+    :rtype: :class:`fastapi.responses.StreamingResponse`
+    """
+    return StreamingResponse(batch_results(batch), media_type="application/x-ndjson")
+
 
 @router.get("/{path:path}")
 @router.post("/{path:path}")
-async def reverse_proxy(request: Request) -> Response:
+async def reverse_proxy(request: Request, path: str) -> Response:
     """
     Reverse proxy to internal services.
-    Supported services:
+
+    The upstream is looked up in ``upstream_registry`` by the first segment of
+    ``path``.  Built-in upstreams are:
     - AnnoNARS
     - MeHARI
     - Viguno
@@ -24,54 +266,128 @@ async def reverse_proxy(request: Request) -> Response:
     - CADA-Prio
     - AutoACMG
 
+    Further upstreams can be configured with the ``PROXY_UPSTREAMS`` setting.
+    Successful responses of cacheable upstreams are served from ``response_cache``
+    and identical concurrent GET requests to them share one upstream call.
+
+    Request bodies are streamed to the upstream as they arrive.  Only bodies of
+    known size up to ``PROXY_CACHE_MAX_ITEM_BYTES`` sent to cacheable upstreams are
+    read up front, as they are part of the cache key.
+
+    GET responses of cacheable upstreams are buffered up to
+    ``PROXY_CACHE_MAX_ITEM_BYTES`` and streamed through once they exceed it.
+
+    GET responses of cacheable upstreams carry a strong ETag derived from the
+    request and the data version of the upstream.  A matching ``If-None-Match``
+    is answered with 304 without contacting the upstream.  The tag changes every
+    ``PROXY_CACHE_REDIS_TTL`` seconds (see ``validity_period``) and is sent with a
+    ``Cache-Control: max-age`` up to then, so that data updates without a new
+    version reach the clients once the cache entries have expired.
+
+    Requests to the upstream go through its bulkhead and circuit breaker in
+    ``upstream_guards``; rejected requests are answered with 503.  Latency, status
+    and size of the upstream responses are recorded in ``app.core.metrics``.
+
     :param request: request
     :type request: :class:`fastapi.Request`
+    :param path: path below the proxy prefix, starting with the upstream name
+    :type path: str
     :return: response
     :rtype: :class:`fastapi.Response`
     """
+    resolved = upstream_registry.resolve(path)
+    if resolved is None:
+        return Response(status_code=404, content="Reverse proxy route not found")
+    upstream, upstream_path = resolved
+    if request.method not in upstream.methods:
+        return Response(status_code=405, content="Method not allowed for upstream")
+
     url = request.url
-    backend_url = None
+    cacheable = upstream.cacheable and settings.PROXY_CACHE_ENABLED
+    if request.method in BODILESS_METHODS:
+        body: bytes | None = b""
+    elif cacheable and 0 <= content_length(request) <= settings.PROXY_CACHE_MAX_ITEM_BYTES:
+        # The body is part of the cache key, so small bodies are read up front.
+        body = await request.body()
+    else:
+        body = None
+        cacheable = False
 
-    if url.path.startswith(f"{settings.INTERNAL_STR}/proxy/annonars"):
-        backend_url = settings.BACKEND_PREFIX_ANNONARS + url.path.replace(
-            "/internal/proxy/annonars", ""
-        )
-    elif url.path.startswith(f"{settings.INTERNAL_STR}/proxy/mehari"):
-        backend_url = settings.BACKEND_PREFIX_MEHARI + url.path.replace(
-            "/internal/proxy/mehari", ""
-        )
-    elif url.path.startswith(f"{settings.INTERNAL_STR}/proxy/viguno"):
-        backend_url = settings.BACKEND_PREFIX_VIGUNO + url.path.replace(
-            "/internal/proxy/viguno", ""
-        )
-    elif url.path.startswith(f"{settings.INTERNAL_STR}/proxy/nginx"):
-        backend_url = settings.BACKEND_PREFIX_NGINX + url.path.replace("/internal/proxy/nginx", "")
-    elif url.path.startswith(f"{settings.INTERNAL_STR}/proxy/dotty"):
-        backend_url = settings.BACKEND_PREFIX_DOTTY + url.path.replace("/internal/proxy/dotty", "")
-    elif url.path.startswith(f"{settings.INTERNAL_STR}/proxy/cada-prio"):
-        backend_url = settings.BACKEND_PREFIX_CADA_PRIO + url.path.replace(
-            "/internal/proxy/cada-prio", ""
-        )
-    elif url.path.startswith(f"{settings.INTERNAL_STR}/proxy/auto-acmg"):
-        backend_url = settings.BACKEND_PREFIX_AUTOACMG + url.path.replace(
-            "/internal/proxy/auto-acmg", ""
+    validators = None
+    if upstream.cacheable and request.method == "GET":
+        period, max_age = validity_period()
+        etag = entity_tag(
+            upstream.name,
+            upstream_path,
+            url.query,
+            version=data_version(upstream.data_version),
+            period=period,
+            accept_encoding=request.headers.get("accept-encoding", ""),
         )
+        validators = {"etag": etag, "cache-control": f"max-age={max_age}"}
+        if if_none_match(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=validators)
+    if cacheable and request.method == "GET":
+        try:
+            buffered = await fetch_buffered(
+                upstream,
+                upstream_path,
+                url.query,
+                method=request.method,
+                headers=request.headers.raw,
+                body=b"",
+                max_size=settings.PROXY_CACHE_MAX_ITEM_BYTES,
+            )
+        except ResponseTooLarge as e:
+            # Too large to be cached, so the response is streamed through.  Waiters
+            # of the same upstream call send their own request.
+            if e.claim():
+                return streaming_response(upstream, e.response, e.content(), validators)
+            cacheable = False
+        else:
+            response = buffered.to_response()
+            if validators is not None and response.status_code == 200:
+                response.headers.update(validators)
+            return response
 
-    if backend_url:
-        client = httpx.AsyncClient()
-        backend_url = backend_url + (f"?{url.query}" if url.query else "")
-        backend_req = client.build_request(
+    key = None
+    if cacheable:
+        assert body is not None
+        key = cache_key(
+            upstream.name,
+            upstream_path,
+            url.query,
+            version=data_version(upstream.data_version),
             method=request.method,
-            url=backend_url,
-            headers=request.headers.raw,
-            content=await request.body(),
-        )
-        backend_resp = await client.send(backend_req, stream=True)
-        return StreamingResponse(
-            backend_resp.aiter_raw(),
-            status_code=backend_resp.status_code,
-            headers=backend_resp.headers,
-            background=BackgroundTasks([BackgroundTask(backend_resp.aclose)]),
+            body=body,
+            accept_encoding=request.headers.get("accept-encoding", ""),
         )
+        entry = await response_cache.get(key)
+        if entry is not None:
+            return entry.to_response()
+
+    backend_url = upstream.base_url() + upstream_path + (f"?{url.query}" if url.query else "")
+    client = upstream_clients(upstream.name)
+    backend_req = client.build_request(
+        method=request.method,
+        url=backend_url,
+        headers=request.headers.raw,
+        content=request.stream() if body is None else body,
+        timeout=upstream.timeout,
+    )
+
+    # The bulkhead slot is held until the response headers have arrived.
+    async with upstream_guards(upstream.name).call() as call:
+        started = time.perf_counter()
+        try:
+            backend_resp = await client.send(backend_req, stream=True)
+        except Exception:
+            observe_upstream(upstream.name, "error", time.perf_counter() - started)
+            raise
+        observe_upstream(upstream.name, backend_resp.status_code, time.perf_counter() - started)
+        call.completed(failed=backend_resp.status_code >= 500)
+    if key is not None and backend_resp.status_code == 200:
+        content = cache_through(backend_resp, key)
     else:
-        return Response(status_code=404, content="Reverse proxy route not found")
+        content = backend_resp.aiter_raw()
+    return streaming_response(upstream, backend_resp, content, validators)
@@ -1,11 +1,40 @@
 """Reverse proxies to external/remote services."""
 
+import asyncio
+import contextlib
+import functools
+import hashlib
 import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable
 
 import httpx
-from fastapi import APIRouter, BackgroundTasks, Request, Response
+import redis
+from celery.exceptions import CeleryError
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse
-from starlette.background import BackgroundTask
+from kombu.exceptions import KombuError
+
+from app import worker
+from app.autocnv import AUTOCNV_URL, AutoCnvJobStore
+from app.core.batching import MicroBatcher
+from app.core.cache import CachedResponse
+from app.core.config import settings
+from app.core.diskcache import remote_cache
+from app.core.ratelimit import rate_limiter
+from app.core.resilience import UpstreamUnavailable, upstream_guards
+from app.core.singleflight import SingleFlight
+from app.core.upstreams import send_buffered, send_hedged
+from app.schemas.remote import (
+    AcmgBatchRequest,
+    AcmgBatchResult,
+    AcmgBatchVariant,
+    AutoCnvJob,
+    AutoCnvJobCreate,
+    AutoCnvJobStatus,
+)
+
+logger = logging.getLogger(__name__)
 
 #: Keys for the ACMG rating
 ACMG_RATING_KEYS: tuple[str, ...] = (
@@ -46,6 +75,20 @@ def default_acmg_rating() -> dict[str, bool]:
 
 router = APIRouter()
 
+#: Base URL of the VariantValidator API.
+VARIANTVALIDATOR_URL = "https://rest.variantvalidator.org/VariantValidator/variantvalidator/"
+#: Base URL of the PubTator 3 API.
+PUBTATOR3_URL = "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/"
+
+#: Services whose responses are kept in ``remote_cache``, by host name; the time to
+#: live is taken from ``REMOTE_CACHE_TTLS``.
+REMOTE_CACHE_SERVICES = {
+    "rest.variantvalidator.org": "variantvalidator",
+    "wintervar.wglab.org": "wintervar",
+    "phoenix.bgi.com": "autocnv",
+    "www.ncbi.nlm.nih.gov": "pubtator3",
+}
+
 
 class HTTPXClientWrapper:
     """Wrapper around HTTPX AsyncClient to for graceful startup/shutdown within FastAPI."""
@@ -54,8 +97,9 @@ class HTTPXClientWrapper:
     async_client: httpx.AsyncClient | None = None
 
     def start(self):
+        # Retries are done by ``send_hedged``, limited by the retry budget.
         self.transport = httpx.AsyncHTTPTransport(
-            retries=1, verify=False
+            retries=0, verify=False
         )  # Disabling cert verification for AutCNV
         self.transport._pool._ssl_context.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
         self.async_client = httpx.AsyncClient(
@@ -73,6 +117,267 @@ class HTTPXClientWrapper:
 
 httpx_client_wrapper = HTTPXClientWrapper()
 
+#: Coalesces identical concurrent requests to the remote services.
+remote_flight: SingleFlight[CachedResponse] = SingleFlight()
+
+
+#: Background refreshes of stale cache entries, referenced until they are done.
+revalidations: set[asyncio.Task[CachedResponse]] = set()
+
+
+def revalidation_done(task: asyncio.Task[CachedResponse]):
+    revalidations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Refreshing a stale remote response failed: %r", task.exception())
+
+
+async def send_remote(
+    method: str, url: str, *, decode: bool = False, **kwargs: Any
+) -> CachedResponse:
+    """Send a request to a remote service after waiting for its rate limit.
+
+    GET requests are hedged and retried on connection errors, see ``send_hedged``,
+    except to hosts in ``REMOTE_RATE_LIMITS``: each of their requests takes a token,
+    so exactly one request is sent for the token taken here.
+
+    :raises UpstreamUnavailable: if the bulkhead, circuit breaker or rate limit of the
+        remote host rejects the request
+    """
+    client = httpx_client_wrapper()
+    host = httpx.URL(url).host
+    guard = upstream_guards(host)
+    await rate_limiter.acquire(host)
+    if method == "GET" and not kwargs and not settings.REMOTE_RATE_LIMITS.get(host):
+        return await send_hedged(
+            client, lambda: client.build_request(method, url), guard, decode=decode
+        )
+    return await send_buffered(
+        client,
+        client.build_request(method=method, url=url, **kwargs),
+        decode=decode,
+        guard=guard,
+    )
+
+
+async def fetch_shared(
+    method: str,
+    url: str,
+    *,
+    decode: bool = False,
+    fetch: Callable[[], Awaitable[CachedResponse]] | None = None,
+    **kwargs: Any,
+) -> CachedResponse:
+    """Fetch the buffered response, sharing one call among identical concurrent requests.
+
+    The request is sent with ``send_remote``, i.e., rate limited or hedged, unless
+    ``fetch`` is given.  Successful responses of the services in
+    ``REMOTE_CACHE_SERVICES`` are kept in ``remote_cache``; stale entries are
+    returned at once and refreshed in the background.
+
+    :param method: HTTP method
+    :param url: URL to fetch
+    :param decode: whether to undo the content encoding, e.g., for parsing the body
+    :param fetch: returns the response of ``url`` in another way, e.g., from a batched call
+    :param kwargs: further arguments to ``httpx.AsyncClient.build_request``, also part of the
+        key for coalescing requests
+    :return: the buffered response
+    :raises UpstreamUnavailable: if the bulkhead, circuit breaker or rate limit of the
+        remote host rejects the request
+    """
+    key = (method, url, decode, json.dumps(kwargs, sort_keys=True))
+
+    async def send() -> CachedResponse:
+        if fetch is not None:
+            return await fetch()
+        return await send_remote(method, url, decode=decode, **kwargs)
+
+    service = REMOTE_CACHE_SERVICES.get(httpx.URL(url).host)
+    ttl = settings.REMOTE_CACHE_TTLS.get(service) if service else None
+    if service is None or ttl is None or not remote_cache.enabled:
+        return await remote_flight.do(key, send)
+    cache_key = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+    async def send_and_store() -> CachedResponse:
+        entry = await send()
+        if entry.status_code == 200:
+            await remote_cache.set(cache_key, service, entry, ttl)
+        return entry
+
+    async def lookup() -> CachedResponse:
+        cached = await remote_cache.get(cache_key)
+        if cached is None:
+            return await send_and_store()
+        entry, fresh = cached
+        if not fresh:
+            task = asyncio.ensure_future(remote_flight.do(("revalidate", *key), send_and_store))
+            revalidations.add(task)
+            task.add_done_callback(revalidation_done)
+        return entry
+
+    return await remote_flight.do(key, lookup)
+
+
+def json_entry(data: Any) -> CachedResponse:
+    """Return a buffered JSON response with ``data``."""
+    return CachedResponse(200, [("content-type", "application/json")], json.dumps(data).encode())
+
+
+def variantvalidator_url(build: str, description: str, transcripts: str, query: str) -> str:
+    return f"{VARIANTVALIDATOR_URL}{build}/{description}/{transcripts}" + (
+        f"?{query}" if query else ""
+    )
+
+
+def split_variantvalidator(entry: CachedResponse, variants: list[str]) -> dict[str, CachedResponse]:
+    """Split the response for several variants by their ``submitted_variant``.
+
+    The ``flag`` of each part is derived from its results like VariantValidator does
+    for a single variant.  Variants without results are missing from the result.
+    """
+    if entry.status_code != 200:
+        return {variant: entry for variant in variants}
+    try:
+        data = json.loads(entry.body)
+        metadata = data.get("metadata")
+    except (ValueError, AttributeError):
+        return {}
+    parts: dict[str, dict[str, Any]] = {}
+    for key, value in data.items():
+        if isinstance(value, dict) and value.get("submitted_variant") in variants:
+            parts.setdefault(value["submitted_variant"], {})[key] = value
+    result = {}
+    for variant, part in parts.items():
+        if any(not key.startswith(("intergenic_variant", "validation_warning")) for key in part):
+            flag = "gene_variant"
+        elif any(key.startswith("intergenic_variant") for key in part):
+            flag = "intergenic"
+        else:
+            flag = "warning"
+        result[variant] = json_entry({**part, "flag": flag, "metadata": metadata})
+    return result
+
+
+async def variantvalidator_batch(
+    group: tuple[str, str, str], variants: list[str]
+) -> dict[str, CachedResponse]:
+    """Validate several variants with one VariantValidator call.
+
+    The variants are joined with ``|``.  Variants whose results cannot be told
+    apart in the combined response are validated one by one.
+
+    :param group: genome build, transcript selection and query string
+    """
+    build, transcripts, query = group
+    if len(variants) == 1:
+        url = variantvalidator_url(build, variants[0], transcripts, query)
+        return {variants[0]: await send_remote("GET", url, decode=True)}
+    url = variantvalidator_url(build, "|".join(variants), transcripts, query)
+    result = split_variantvalidator(await send_remote("GET", url, decode=True), variants)
+    missing = [variant for variant in variants if variant not in result]
+    entries = await asyncio.gather(
+        *(
+            send_remote(
+                "GET", variantvalidator_url(build, variant, transcripts, query), decode=True
+            )
+            for variant in missing
+        )
+    )
+    return {**result, **dict(zip(missing, entries))}
+
+
+async def pubtator3_export_batch(export_format: str, pmids: list[str]) -> dict[str, CachedResponse]:
+    """Export the annotations of several publications with one PubTator 3 call.
+
+    If the combined response cannot be split by publication, the publications are
+    exported one by one.
+    """
+
+    def export_url(ids: list[str]) -> str:
+        return f"{PUBTATOR3_URL}publications/export/{export_format}?pmids={','.join(ids)}"
+
+    entry = await send_remote("GET", export_url(pmids), decode=True)
+    if len(pmids) == 1 or entry.status_code != 200:
+        return {pmid: entry for pmid in pmids}
+    try:
+        documents = {
+            str(doc.get("pmid", doc["id"])): doc for doc in json.loads(entry.body)["PubTator3"]
+        }
+    except (ValueError, KeyError, TypeError):
+        entries = await asyncio.gather(
+            *(send_remote("GET", export_url([pmid]), decode=True) for pmid in pmids)
+        )
+        return dict(zip(pmids, entries))
+    return {
+        pmid: json_entry({"PubTator3": [documents[pmid]] if pmid in documents else []})
+        for pmid in pmids
+    }
+
+
+def merge_pubtator3_exports(entries: list[CachedResponse]) -> CachedResponse | None:
+    """Merge the exports of single publications, ``None`` if they cannot be parsed."""
+    if len(entries) == 1:
+        return entries[0]
+    for entry in entries:
+        if entry.status_code != 200:
+            return entry
+    try:
+        documents = [doc for entry in entries for doc in json.loads(entry.body)["PubTator3"]]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return json_entry({"PubTator3": documents})
+
+
+#: Combines concurrent VariantValidator lookups with the same build and transcripts.
+variantvalidator_batcher: MicroBatcher[tuple[str, str, str], str, CachedResponse] = MicroBatcher(
+    variantvalidator_batch, settings.REMOTE_BATCH_WINDOW, settings.REMOTE_BATCH_MAX_VARIANTS
+)
+#: Combines concurrent PubTator 3 exports in the same format.
+pubtator3_batcher: MicroBatcher[str, str, CachedResponse] = MicroBatcher(
+    pubtator3_export_batch, settings.REMOTE_BATCH_WINDOW, settings.REMOTE_BATCH_MAX_PMIDS
+)
+
+#: Query strings of VariantValidator requests whose responses can be split by variant.
+VARIANTVALIDATOR_BATCH_QUERIES = ("", "content-type=application/json")
+
+
+async def fetch_variantvalidator(path: str, query: str) -> CachedResponse:
+    """Fetch the VariantValidator results at ``path``, batched with concurrent lookups.
+
+    :param path: path below ``VARIANTVALIDATOR_URL``, e.g., ``GRCh37/1-55516888-G-GA/all``
+    :param query: query string
+    """
+    url = VARIANTVALIDATOR_URL + path + (f"?{query}" if query else "")
+    parts = path.split("/")
+    if (
+        not settings.REMOTE_BATCH_ENABLED
+        or len(parts) != 3
+        or "|" in parts[1]
+        or query not in VARIANTVALIDATOR_BATCH_QUERIES
+    ):
+        return await fetch_shared("GET", url)
+    build, variant, transcripts = parts
+    return await fetch_shared(
+        "GET",
+        url,
+        decode=True,
+        fetch=lambda: variantvalidator_batcher.submit((build, transcripts, query), variant),
+    )
+
+
+async def fetch_pubtator3_export(export_format: str, pmids: list[str]) -> list[CachedResponse]:
+    """Fetch the PubTator 3 export of each publication, batched with concurrent exports."""
+    return await asyncio.gather(
+        *(
+            fetch_shared(
+                "GET",
+                f"{PUBTATOR3_URL}publications/export/{export_format}?pmids={pmid}",
+                decode=True,
+                fetch=functools.partial(pubtator3_batcher.submit, export_format, pmid),
+            )
+            for pmid in pmids
+        )
+    )
+
 
 @router.get("/variantvalidator/{path:path}")
 async def variantvalidator(request: Request, path: str):
@@ -85,28 +390,12 @@ async def variantvalidator(request: Request, path: str):
     :param path: path to append to the backend URL
     :type path: str
     :return: response
-    :rtype: :class:`fastapi.responses.StreamingResponse`
+    :rtype: :class:`fastapi.Response`
     """
-    url = request.url
-
     # change grch to GRCh and strip "chr" prefixes
     path = path.replace("grch", "GRCh").replace("chr", "")
-    backend_url = "https://rest.variantvalidator.org/VariantValidator/variantvalidator/" + path
-
-    backend_url = backend_url + (f"?{url.query}" if url.query else "")
-    client = httpx_client_wrapper()
-    backend_req = client.build_request(
-        method=request.method,
-        url=backend_url,
-        content=await request.body(),
-    )
-    backend_resp = await client.send(backend_req, stream=True)
-    return StreamingResponse(
-        backend_resp.aiter_raw(),
-        status_code=backend_resp.status_code,
-        headers=backend_resp.headers,
-        background=BackgroundTasks([BackgroundTask(backend_resp.aclose)]),
-    )
+    backend_resp = await fetch_variantvalidator(path, request.url.query)
+    return backend_resp.to_response()
 
 
 @router.get("/acmg/{path:path}")
@@ -129,23 +418,33 @@ async def acmg(request: Request):
 
     if not chromosome or not position or not reference or not alternative or not build:
         return Response(status_code=400, content="Missing query parameters")
+    return await wintervar_acmg(chromosome, position, reference, alternative, build)
 
+
+async def wintervar_acmg(
+    chromosome: str, position: str, reference: str, alternative: str, build: str
+) -> Response:
+    """
+    Fetch the ACMG classification of a sequence variant from WinterVar.
+
+    :param build: genome build, ``hg19`` or ``hg38``
+    :return: ACMG rating as JSON, or the error response
+    :rtype: :class:`fastapi.Response`
+    """
     url = (
         f"http://wintervar.wglab.org/api_new.php?"
         f"queryType=position&chr={chromosome}&pos={position}"
         f"&ref={reference}&alt={alternative}&build={build}"
     )
-    client = httpx_client_wrapper()
-    backend_req = client.build_request(method="GET", url=url)
-    backend_resp = await client.send(backend_req)
-    if backend_resp.is_error:
-        return Response(status_code=backend_resp.status_code, content=backend_resp.content)
+    backend_resp = await fetch_shared("GET", url, decode=True)
+    if backend_resp.status_code >= 400:
+        return Response(status_code=backend_resp.status_code, content=backend_resp.body)
 
-    if backend_resp.content == b"":
+    if backend_resp.body == b"":
         return Response(status_code=404, content="Variant not found in WinterVar")
 
     try:
-        backend_json = backend_resp.json()
+        backend_json = json.loads(backend_resp.body)
     except json.JSONDecodeError:
         return Response(
             status_code=500, content=json.dumps({"error": "Invalid response from Intervar"})
@@ -158,6 +457,133 @@ async def acmg(request: Request):
     return JSONResponse(acmg_rating)
 
 
+async def acmg_batch_item(idx: int, variant: AcmgBatchVariant) -> AcmgBatchResult:
+    """Classify one variant of a batch and convert the response to a result."""
+    item_id = variant.id if variant.id is not None else str(idx)
+    try:
+        response = await wintervar_acmg(
+            variant.chromosome,
+            str(variant.position),
+            variant.reference,
+            variant.alternative,
+            variant.release,
+        )
+    except UpstreamUnavailable as e:
+        return AcmgBatchResult(id=item_id, status=503, error=str(e))
+    except httpx.HTTPError as e:
+        return AcmgBatchResult(id=item_id, status=502, error=f"Upstream request failed: {e!r}")
+    if response.status_code != 200:
+        error = bytes(response.body).decode(errors="replace")
+        return AcmgBatchResult(id=item_id, status=response.status_code, error=error)
+    return AcmgBatchResult(id=item_id, status=200, rating=json.loads(response.body))
+
+
+async def acmg_batch_results(batch: AcmgBatchRequest) -> AsyncIterator[bytes]:
+    """Classify the variants concurrently and yield NDJSON lines as they complete.
+
+    At most ``REMOTE_ACMG_BATCH_CONCURRENCY`` variants are classified at the same
+    time.  Remaining variants are cancelled when the client disconnects.
+    """
+    semaphore = asyncio.Semaphore(settings.REMOTE_ACMG_BATCH_CONCURRENCY)
+
+    async def bounded(idx: int, variant: AcmgBatchVariant) -> AcmgBatchResult:
+        async with semaphore:
+            return await acmg_batch_item(idx, variant)
+
+    tasks = [
+        asyncio.ensure_future(bounded(idx, variant)) for idx, variant in enumerate(batch.variants)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            yield result.model_dump_json().encode() + b"\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/acmg/batch")
+async def acmg_batch(batch: AcmgBatchRequest) -> StreamingResponse:
+    """
+    Classify multiple SNVs and indels with one request.
+    Requests to the `WinterVar <http://wintervar.wglab.org/>`_ backend are sent
+    concurrently and each result is streamed back as one line of NDJSON as soon as
+    it is complete, so the order of the lines is not the order of the variants.
+    The WinterVar responses are kept in the remote service cache per variant and
+    release, so classifying the same variants again does not reach WinterVar.
+
+    :param batch: the variants
+    :type batch: :class:`app.schemas.remote.AcmgBatchRequest`
+    :return: NDJSON stream of :class:`app.schemas.remote.AcmgBatchResult`
+    :rtype: :class:`fastapi.responses.StreamingResponse`
+    """
+    return StreamingResponse(acmg_batch_results(batch), media_type="application/x-ndjson")
+
+
+#: The AutoCNV jobs, started in the app lifespan.
+autocnv_jobs = AutoCnvJobStore()
+
+
+@router.post("/cnv/acmg/jobs", response_model=AutoCnvJob, status_code=202)
+async def cnv_acmg_job_submit(cnv: AutoCnvJobCreate, response: Response):
+    """
+    Submit a CNV for ACMG classification with `AutoCNV <https://phoenix.bgi.com/>`_.
+
+    Returns at once with the job; the classification runs in the background worker.
+    The job ID is derived from the CNV, so submitting a CNV again returns the
+    existing job (with the result once it is done, then with status 200) unless
+    it failed.  If the job cannot be handed to the worker, it is marked as failed
+    and 503 is returned.
+
+    :param cnv: the CNV
+    :type cnv: :class:`app.schemas.remote.AutoCnvJobCreate`
+    :return: the job
+    :rtype: :class:`app.schemas.remote.AutoCnvJob`
+    """
+    try:
+        job, created = await autocnv_jobs.submit(cnv)
+    except redis.RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Job store unavailable: {e}")
+    if created:
+        logger.info('submitting AutoCNV job "%s" to worker', job.id)
+        try:
+            # Publishing to the broker blocks.
+            await asyncio.to_thread(worker.run_autocnv_job.delay, job.id)
+        except (KombuError, CeleryError, OSError) as e:
+            # Mark the job as failed, so that it is dispatched again on resubmission.
+            job.status = AutoCnvJobStatus.failed
+            job.error = f"Submitting the job to the worker failed: {e!r}"
+            with contextlib.suppress(redis.RedisError):
+                await autocnv_jobs.put(job)
+            raise HTTPException(status_code=503, detail=f"Worker queue unavailable: {e}")
+    elif job.status == AutoCnvJobStatus.done:
+        response.status_code = 200
+    return job
+
+
+@router.get("/cnv/acmg/jobs/{job_id}", response_model=AutoCnvJob)
+async def cnv_acmg_job(
+    job_id: str, wait: float = Query(default=0.0, ge=0.0, le=settings.AUTOCNV_JOB_MAX_WAIT)
+):
+    """
+    Return an AutoCNV job and its result, if done.
+
+    :param job_id: the job ID as returned on submission
+    :type job_id: str
+    :param wait: seconds to wait for the job to be done or failed
+    :type wait: float
+    :return: the job
+    :rtype: :class:`app.schemas.remote.AutoCnvJob`
+    """
+    try:
+        job = await autocnv_jobs.wait(job_id, wait)
+    except redis.RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Job store unavailable: {e}")
+    if job is None:
+        raise HTTPException(status_code=404, detail="AutoCNV job not found")
+    return job
+
+
 @router.get("/cnv/acmg/{path:path}")
 async def cnv_acmg(request: Request):
     """
@@ -178,17 +604,16 @@ async def cnv_acmg(request: Request):
     if not chromosome or not start or not end or not func:
         return Response(status_code=400, content="Missing query parameters")
 
-    client = httpx_client_wrapper()
-    backend_req = client.build_request(
-        method="POST",
-        url="https://phoenix.bgi.com/api/acit/jobs/",
+    backend_resp = await fetch_shared(
+        "POST",
+        AUTOCNV_URL,
+        decode=True,
         data={"chromosome": chromosome, "start": start, "end": end, "func": func, "error": 0},
     )
-    backend_resp = await client.send(backend_req)
-    if backend_resp.is_error:
-        return Response(status_code=backend_resp.status_code, content=backend_resp.content)
+    if backend_resp.status_code >= 400:
+        return Response(status_code=backend_resp.status_code, content=backend_resp.body)
     else:
-        return JSONResponse(backend_resp.json())
+        return JSONResponse(json.loads(backend_resp.body))
 
 
 @router.get("/pubtator3-api/{path:path}")
@@ -201,24 +626,22 @@ async def pubtator3_api(request: Request, path: str):
     :param path: path to append to the backend URL
     :type path: str
     :return: response
-    :rtype: :class:`fastapi.responses.StreamingResponse`
+    :rtype: :class:`fastapi.Response`
     """
     url = request.url
-    backend_url = "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/" + path
+    backend_url = PUBTATOR3_URL + path
     backend_url = backend_url + (f"?{url.query}" if url.query else "")
 
-    client = httpx_client_wrapper()
-    backend_req = client.build_request(
-        method=request.method,
-        url=backend_url,
-        content=await request.body(),
-    )
-    backend_resp = await client.send(backend_req, stream=True)
-    if "set-cookie" in backend_resp.headers:
-        backend_resp.headers.pop("set-cookie")
-    return StreamingResponse(
-        backend_resp.aiter_raw(),
-        status_code=backend_resp.status_code,
-        headers=backend_resp.headers,
-        background=BackgroundTasks([BackgroundTask(backend_resp.aclose)]),
-    )
+    merged = None
+    if (
+        settings.REMOTE_BATCH_ENABLED
+        and path == "publications/export/biocjson"
+        and list(request.query_params) == ["pmids"]
+    ):
+        pmids = list(dict.fromkeys(filter(None, request.query_params["pmids"].split(","))))
+        if pmids:
+            merged = merge_pubtator3_exports(await fetch_pubtator3_export("biocjson", pmids))
+    backend_resp = merged or await fetch_shared(request.method, backend_url)
+    response = backend_resp.to_response()
+    del response.headers["set-cookie"]
+    return response
@@ -0,0 +1,34 @@
+"""Keyset pagination of the list endpoints with ``fastapi_pagination``."""
+
+from typing import Generic, Optional, TypeVar
+
+from fastapi_pagination.bases import CursorRawParams
+from fastapi_pagination.cursor import CursorPage, CursorParams
+
+T = TypeVar("T")
+
+
+class KeysetCursorParams(CursorParams):
+    """Cursor params without total count.
+
+    Counting the rows takes time linear in the number of rows on every page,
+    which would undo the constant time of seeking to the cursor.
+    """
+
+    # Linked to ``KeysetCursorPage`` when it is defined, for paginating outside of requests.
+    __page_type__ = None
+
+    def to_raw_params(self) -> CursorRawParams:
+        params = super().to_raw_params()
+        params.include_total = False
+
+        return params
+
+
+class KeysetCursorPage(CursorPage[T], Generic[T]):
+    """Cursor page without total count."""
+
+    __params_type__ = KeysetCursorParams
+
+    #: Always ``None``, the rows are not counted.
+    total: Optional[int] = None  # type: ignore[assignment]
@@ -0,0 +1,153 @@
+"""Asynchronous classification of CNVs with AutoCNV.
+
+AutoCNV takes up to a minute to answer.  Instead of holding the request open,
+``/internal/remote/cnv/acmg/jobs`` stores a job in Redis and the Celery task
+``app.worker.run_autocnv_job`` sends the request to AutoCNV and stores the
+result in the job, where clients poll for it.
+
+The job ID is derived from the CNV, so the result is shared by all submissions
+of the same CNV until it expires after ``REMOTE_CACHE_TTLS["autocnv"]`` seconds.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+
+import httpx
+import redis.asyncio
+
+from app.core.config import settings
+from app.schemas.remote import AutoCnvJob, AutoCnvJobCreate, AutoCnvJobStatus
+
+logger = logging.getLogger(__name__)
+
+#: Prefix of the keys in Redis.
+REDIS_KEY_PREFIX = "reev:autocnv-job:"
+
+#: URL of the AutoCNV jobs endpoint.
+AUTOCNV_URL = "https://phoenix.bgi.com/api/acit/jobs/"
+
+#: Seconds between two lookups of a job while waiting for it.
+POLL_INTERVAL = 0.25
+
+#: Seconds that finished jobs are kept if ``REMOTE_CACHE_TTLS`` has no ``autocnv`` entry.
+DEFAULT_DONE_TTL = 24 * 60 * 60
+
+
+def job_id(cnv: AutoCnvJobCreate) -> str:
+    """Return the job ID of a CNV."""
+    key = json.dumps([cnv.chromosome, cnv.start, cnv.end, cnv.func])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+class AutoCnvJobStore:
+    """The AutoCNV jobs in Redis."""
+
+    def __init__(self) -> None:
+        #: Redis client, set by ``start()``.
+        self.redis: redis.asyncio.Redis | None = None
+
+    def start(self):
+        self.redis = redis.asyncio.from_url(settings.REDIS_URL)
+
+    async def stop(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    async def get(self, job_id: str) -> AutoCnvJob | None:
+        assert self.redis is not None
+        data = await self.redis.get(REDIS_KEY_PREFIX + job_id)
+        return AutoCnvJob.model_validate_json(data) if data is not None else None
+
+    async def put(self, job: AutoCnvJob, only_new: bool = False) -> bool:
+        """Store ``job``, return whether it was stored.
+
+        :param only_new: only store the job if there is none with its ID
+        """
+        assert self.redis is not None
+        if job.status == AutoCnvJobStatus.done:
+            ttl = settings.REMOTE_CACHE_TTLS.get("autocnv", DEFAULT_DONE_TTL)
+        else:
+            ttl = settings.AUTOCNV_JOB_TIMEOUT
+        stored = await self.redis.set(
+            REDIS_KEY_PREFIX + job.id, job.model_dump_json(), ex=ttl, nx=only_new
+        )
+        return bool(stored)
+
+    async def submit(self, cnv: AutoCnvJobCreate) -> tuple[AutoCnvJob, bool]:
+        """Return the job of ``cnv``, creating a new one unless there is one that did not fail.
+
+        :return: the job and whether it was created and has to be run
+        """
+        job = await self.get(job_id(cnv))
+        if job is not None and job.status != AutoCnvJobStatus.failed:
+            return job, False
+        new_job = AutoCnvJob(id=job_id(cnv), **cnv.model_dump())
+        if await self.put(new_job, only_new=job is None):
+            return new_job, True
+        # Another submission of the same CNV was faster.
+        job = await self.get(new_job.id)
+        return job or new_job, False
+
+    async def wait(self, job_id: str, timeout: float) -> AutoCnvJob | None:
+        """Return the job once it is done or failed, or after ``timeout`` seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            job = await self.get(job_id)
+            finished = job is None or job.status in (AutoCnvJobStatus.done, AutoCnvJobStatus.failed)
+            if finished or loop.time() + POLL_INTERVAL > deadline:
+                return job
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+async def run_job(job_id: str, store: AutoCnvJobStore):
+    """Classify the CNV of a pending job with AutoCNV and store the result in the job.
+
+    Unexpected errors are stored in the job as well, marking it as failed, and raised.
+    """
+    # Import here to prevent circular imports.
+    from app.api.internal.endpoints.remote import HTTPXClientWrapper
+
+    job = await store.get(job_id)
+    if job is None or job.status != AutoCnvJobStatus.pending:
+        logger.info("AutoCNV job %s is missing or already handled", job_id)
+        return
+    job.status = AutoCnvJobStatus.running
+    await store.put(job)
+
+    try:
+        wrapper = HTTPXClientWrapper()
+        wrapper.start()
+        try:
+            response = await wrapper().post(
+                AUTOCNV_URL,
+                data={
+                    "chromosome": job.chromosome,
+                    "start": job.start,
+                    "end": job.end,
+                    "func": job.func,
+                    "error": 0,
+                },
+            )
+            job.status_code = response.status_code
+            if response.status_code >= 400:
+                job.status = AutoCnvJobStatus.failed
+                job.error = response.text
+            else:
+                job.status = AutoCnvJobStatus.done
+                job.result = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            job.status = AutoCnvJobStatus.failed
+            job.error = f"AutoCNV request failed: {e!r}"
+        finally:
+            await wrapper.stop()
+        await store.put(job)
+    except Exception as e:
+        # Otherwise the job stays running until it expires and cannot be submitted again.
+        job.status = AutoCnvJobStatus.failed
+        job.error = f"AutoCNV job failed: {e!r}"
+        await store.put(job)
+        raise
@@ -1,9 +1,10 @@
+import time
 import uuid
 from typing import Optional
 
 import redis.asyncio
 from fastapi import Depends, Request, Response
-from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
+from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin, exceptions
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
@@ -17,6 +18,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.deps import get_async_session
+from app.core.metrics import redis_auth_duration
 from app.etc import utils
 from app.models.user import OAuthAccount, User
 
@@ -69,8 +71,37 @@ cookie_transport = CookieRedirectTransport(cookie_max_age=settings.SESSION_EXPIR
 redis_obj = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
 
 
+class InstrumentedRedisStrategy(RedisStrategy[User, uuid.UUID]):
+    """Redis strategy that records the duration of the token lookups in the metrics."""
+
+    async def read_token(
+        self, token: str | None, user_manager: BaseUserManager[User, uuid.UUID]
+    ) -> User | None:
+        if token is None:
+            return None
+
+        started = time.perf_counter()
+        try:
+            user_id = await self.redis.get(f"{self.key_prefix}{token}")
+        except Exception:
+            redis_auth_duration.labels("error").observe(time.perf_counter() - started)
+            raise
+        result = "miss" if user_id is None else "hit"
+        redis_auth_duration.labels(result).observe(time.perf_counter() - started)
+        if user_id is None:
+            return None
+
+        try:
+            parsed_id = user_manager.parse_id(user_id)
+            return await user_manager.get(parsed_id)
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+
 def get_redis_strategy() -> RedisStrategy:
-    return RedisStrategy(redis_obj, lifetime_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    return InstrumentedRedisStrategy(
+        redis_obj, lifetime_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
 
 
 auth_backend_bearer = AuthenticationBackend(
@@ -0,0 +1,101 @@
+"""Micro-batching of concurrent lookups into one call."""
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+G = TypeVar("G", bound=Hashable)
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class Batch(Generic[K, T]):
+    """The items of one batch and the futures of their callers."""
+
+    def __init__(self) -> None:
+        #: Futures of the callers, by item.
+        self.waiters: dict[K, list[asyncio.Future[T]]] = {}
+        #: Timer sending the batch at the end of the window.
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class MicroBatcher(Generic[G, K, T]):
+    """Combine lookups submitted concurrently for the same group into one call.
+
+    The first lookup of a group opens a batch that is sent after ``window``
+    seconds or as soon as it has ``max_items`` distinct items, whichever comes
+    first.  ``call(group, items)`` must return the result of each item; each
+    caller gets the result of its item, or the exception raised by the call.
+
+    The call runs in its own task, so it is completed (and, e.g., its results are
+    cached) even if all callers have been cancelled.
+    """
+
+    def __init__(
+        self,
+        call: Callable[[G, list[K]], Awaitable[dict[K, T]]],
+        window: float,
+        max_items: int,
+    ):
+        self.call = call
+        #: Seconds to wait for further items after the first one.
+        self.window = window
+        #: Maximal number of distinct items per call.
+        self.max_items = max_items
+        #: Open batches, by group.
+        self.pending: dict[G, Batch[K, T]] = {}
+        #: Running calls, referenced until they are done.
+        self.tasks: set[asyncio.Task[None]] = set()
+        #: Number of calls made.
+        self.calls = 0
+        #: Number of items looked up by the calls.
+        self.items = 0
+
+    async def submit(self, group: G, item: K) -> T:
+        """Return the result of ``item``, looked up together with concurrent items of ``group``."""
+        loop = asyncio.get_running_loop()
+        batch = self.pending.get(group)
+        if batch is None:
+            batch = self.pending[group] = Batch()
+            batch.timer = loop.call_later(self.window, self._flush, group, batch)
+        future: asyncio.Future[T] = loop.create_future()
+        batch.waiters.setdefault(item, []).append(future)
+        if len(batch.waiters) >= self.max_items:
+            self._flush(group, batch)
+        return await future
+
+    def _flush(self, group: G, batch: Batch[K, T]):
+        if self.pending.get(group) is not batch:
+            return
+        del self.pending[group]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._run(group, batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, group: G, batch: Batch[K, T]):
+        items = list(batch.waiters)
+        self.calls += 1
+        self.items += len(items)
+        try:
+            try:
+                results = await self.call(group, items)
+            except Exception as e:
+                for futures in batch.waiters.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                return
+            for item, futures in batch.waiters.items():
+                for future in futures:
+                    if future.done():
+                        continue
+                    if item in results:
+                        future.set_result(results[item])
+                    else:
+                        future.set_exception(KeyError(item))
+        finally:
+            # Only has an effect if the call itself was cancelled, e.g., on shutdown.
+            for futures in batch.waiters.values():
+                for future in futures:
+                    future.cancel()
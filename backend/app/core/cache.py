@@ -0,0 +1,339 @@
+"""Two-tier cache for responses of the internal upstream services.
+
+The first tier is an in-process LRU cache with a size budget in bytes, the second
+tier is shared between processes in Redis.  Keys include the data version of the
+upstream so a new data release invalidates all previous entries.  Entries expire
+after ``PROXY_CACHE_REDIS_TTL`` in both tiers, so that data updates that do not
+change the version are picked up eventually.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Iterable
+from urllib.parse import parse_qsl
+
+import redis.asyncio
+from fastapi import Response
+
+from app.core.compression import normalize_accept_encoding
+from app.core.config import settings
+from app.core.dataversions import DATA_VERSIONS
+
+logger = logging.getLogger(__name__)
+
+#: Prefix of the keys in Redis.
+REDIS_KEY_PREFIX = "reev:proxy-cache:"
+
+#: Seconds to skip the Redis tier after it failed.
+REDIS_BACKOFF_SECONDS = 30.0
+
+#: Headers that apply to a single connection and must not be stored.
+HOP_BY_HOP_HEADERS = frozenset(
+    (
+        "connection",
+        "content-length",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    )
+)
+
+#: Headers meant for the one client of the upstream request; they must not be stored
+#: in caches or sent to the clients sharing the response.
+PER_CLIENT_HEADERS = frozenset(("set-cookie", "set-cookie2"))
+
+
+def data_version(name: str | None) -> str:
+    """Return the current version of the entry ``name`` in ``DATA_VERSIONS``.
+
+    Names that are not part of ``DATA_VERSIONS`` are returned as they are.
+    """
+    if name is None:
+        return ""
+    return getattr(DATA_VERSIONS, name, name)
+
+
+def cache_key(
+    upstream: str,
+    path: str,
+    query: str,
+    *,
+    version: str,
+    method: str = "GET",
+    body: bytes = b"",
+    accept_encoding: str = "",
+) -> str:
+    """Build the cache key for a request to an upstream.
+
+    The query parameters are sorted so that their order does not matter and the
+    body is included as a hash.  ``Accept-Encoding`` headers allowing the same
+    codings share their entries.
+    """
+    sorted_query = sorted(parse_qsl(query, keep_blank_values=True))
+    digest = hashlib.sha256()
+    for part in (
+        upstream,
+        version,
+        method,
+        path,
+        json.dumps(sorted_query),
+        hashlib.sha256(body).hexdigest() if body else "",
+        normalize_accept_encoding(accept_encoding),
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def validity_period(now: float | None = None) -> tuple[int, int]:
+    """Return the number of the current period of ``PROXY_CACHE_REDIS_TTL`` seconds
+    and the seconds left in it.
+    """
+    ttl = max(settings.PROXY_CACHE_REDIS_TTL, 1)
+    now = time.time() if now is None else now
+    return int(now // ttl), ttl - int(now % ttl)
+
+
+def entity_tag(
+    upstream: str,
+    path: str,
+    query: str,
+    *,
+    version: str,
+    period: int,
+    accept_encoding: str = "",
+) -> str:
+    """Build the strong ETag for a GET response of a cacheable upstream.
+
+    The tag is derived from the request, the data version of the upstream and the
+    ``period`` from ``validity_period``.  Data updates do not always change the
+    version, so tags are only valid as long as cache entries live.  Requests
+    allowing different content codings get different tags as their
+    representations may differ.
+    """
+    key = cache_key(
+        upstream, path, query, version=f"{version}@{period}", accept_encoding=accept_encoding
+    )
+    return f'"{key[:32]}"'
+
+
+def if_none_match(header: str, etag: str) -> bool:
+    """Return whether the ``If-None-Match`` header matches ``etag`` (weak comparison).
+
+    ``*`` matches any entity tag.
+    """
+    tags = (tag.strip() for tag in header.split(","))
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in tags)
+
+
+class CachedResponse:
+    """A fully buffered response, as stored in the cache or shared by coalesced requests."""
+
+    def __init__(
+        self,
+        status_code: int,
+        headers: list[tuple[str, str]],
+        body: bytes,
+        created: float | None = None,
+    ):
+        #: HTTP status code.
+        self.status_code = status_code
+        #: Headers without hop-by-hop and per-client headers.
+        self.headers = headers
+        #: The (possibly content-encoded) body.
+        self.body = body
+        #: Time when the response was received from the upstream (seconds since epoch).
+        self.created = time.time() if created is None else created
+
+    @property
+    def age(self) -> float:
+        """Seconds since the response was received from the upstream."""
+        return time.time() - self.created
+
+    @classmethod
+    def from_upstream(
+        cls, status_code: int, headers: Iterable[tuple[str, str]], body: bytes
+    ) -> "CachedResponse":
+        """Create from an upstream response, dropping hop-by-hop and per-client headers."""
+        return cls(
+            status_code,
+            [
+                (k, v)
+                for k, v in headers
+                if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in PER_CLIENT_HEADERS
+            ],
+            body,
+        )
+
+    @property
+    def size(self) -> int:
+        """Approximate size in bytes."""
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+    def to_response(self) -> Response:
+        """Create a response to send to the client, keeping repeated headers."""
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = [
+            (key.encode("latin-1"), value.encode("latin-1")) for key, value in self.headers
+        ] + [(b"content-length", str(len(self.body)).encode("latin-1"))]
+        return response
+
+    def to_bytes(self) -> bytes:
+        """Serialize for storing in Redis."""
+        meta = json.dumps(
+            {"status_code": self.status_code, "headers": self.headers, "created": self.created}
+        )
+        return meta.encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedResponse":
+        """Deserialize from Redis."""
+        meta, _, body = data.partition(b"\n")
+        obj = json.loads(meta)
+        return cls(obj["status_code"], [tuple(h) for h in obj["headers"]], body, obj.get("created"))
+
+
+class LruCache:
+    """In-process LRU cache of ``CachedResponse`` with a size budget in bytes.
+
+    Entries older than ``max_age`` seconds (see ``CachedResponse.age``) are dropped
+    on lookup.
+    """
+
+    def __init__(self, max_bytes: int, max_age: float | None = None):
+        #: Size budget in bytes.
+        self.max_bytes = max_bytes
+        #: Maximal age of the entries in seconds, ``None`` for no limit.
+        self.max_age = max_age
+        #: Current size in bytes.
+        self.size = 0
+        #: The entries, least recently used first.
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    def get(self, key: str) -> CachedResponse | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if self.max_age is not None and entry.age > self.max_age:
+            del self.entries[key]
+            self.size -= entry.size
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CachedResponse):
+        if entry.size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old.size
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+class ResponseCache:
+    """Two-tier response cache with hit/miss counters.
+
+    Failures of the Redis tier are logged and the tier is skipped for
+    ``REDIS_BACKOFF_SECONDS`` so that Redis problems do not slow down requests.
+    """
+
+    def __init__(self) -> None:
+        #: The in-process tier.
+        self.memory = LruCache(settings.PROXY_CACHE_MEMORY_BYTES, settings.PROXY_CACHE_REDIS_TTL)
+        #: The Redis tier, if enabled.
+        self.redis: redis.asyncio.Redis | None = None
+        #: Monotonic time until which the Redis tier is skipped.
+        self.redis_backoff_until = 0.0
+        #: Hits in the in-process tier.
+        self.hits_memory = 0
+        #: Hits in the Redis tier.
+        self.hits_redis = 0
+        #: Misses in both tiers.
+        self.misses = 0
+        #: Errors when accessing Redis.
+        self.redis_errors = 0
+
+    def start(self):
+        self.memory = LruCache(settings.PROXY_CACHE_MEMORY_BYTES, settings.PROXY_CACHE_REDIS_TTL)
+        if settings.PROXY_CACHE_REDIS:
+            self.redis = redis.asyncio.from_url(settings.REDIS_URL)
+
+    async def stop(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self.redis_backoff_until
+
+    def _redis_failed(self, e: Exception):
+        self.redis_errors += 1
+        self.redis_backoff_until = time.monotonic() + REDIS_BACKOFF_SECONDS
+        logger.warning("Redis cache tier unavailable, skipping it: %s", e)
+
+    async def get(self, key: str) -> CachedResponse | None:
+        """Look up ``key`` in the in-process tier, then in Redis."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.hits_memory += 1
+            return entry
+        if self._redis_available():
+            assert self.redis is not None
+            try:
+                data = await self.redis.get(REDIS_KEY_PREFIX + key)
+            except (redis.RedisError, OSError) as e:
+                self._redis_failed(e)
+            else:
+                if data is not None:
+                    entry = CachedResponse.from_bytes(data)
+                    self.memory.set(key, entry)
+                    self.hits_redis += 1
+                    return entry
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, entry: CachedResponse):
+        """Store ``entry`` in both tiers."""
+        self.memory.set(key, entry)
+        if self._redis_available():
+            assert self.redis is not None
+            try:
+                await self.redis.set(
+                    REDIS_KEY_PREFIX + key, entry.to_bytes(), ex=settings.PROXY_CACHE_REDIS_TTL
+                )
+            except (redis.RedisError, OSError) as e:
+                self._redis_failed(e)
+
+    def clear(self):
+        """Clear the in-process tier and reset the counters."""
+        self.memory.clear()
+        self.hits_memory = self.hits_redis = self.misses = self.redis_errors = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit/miss counters and the size of the in-process tier."""
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "redis_errors": self.redis_errors,
+            "memory_entries": len(self.memory.entries),
+            "memory_bytes": self.memory.size,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,212 @@
+"""Content negotiation and compression of responses.
+
+Responses are compressed with gzip, which all clients accept and which needs no
+dependencies beyond the standard library.  Responses that already carry a
+``Content-Encoding`` (e.g., compressed upstream bodies passed through by the
+reverse proxy) are sent as they are.
+"""
+
+import zlib
+from typing import Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+#: Content types that are worth compressing (besides ``text/*`` and ``*+json``).
+COMPRESSIBLE_TYPES = frozenset(
+    (
+        "application/json",
+        "application/x-ndjson",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+    )
+)
+
+
+class Compressor(Protocol):
+    """Incremental compressor for one response body."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress ``data``, output may be buffered."""
+
+    def flush(self) -> bytes:
+        """Return all output for the data so far, keeping the stream open."""
+
+    def finish(self) -> bytes:
+        """Return the remaining output and end the stream."""
+
+
+class GzipCompressor:
+    def __init__(self) -> None:
+        self.obj = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.obj.flush()
+
+
+#: The supported content encodings, in order of preference.
+ENCODINGS: dict[str, type[Compressor]] = {"gzip": GzipCompressor}
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Parse an ``Accept-Encoding`` header into a mapping from coding to quality."""
+    result: dict[str, float] = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        result[coding.lower()] = quality
+    return result
+
+
+def normalize_accept_encoding(header: str) -> str:
+    """Return the acceptable codings of an ``Accept-Encoding`` header in canonical form.
+
+    Headers that allow the same codings yield the same string, e.g., for use in
+    cache keys.
+    """
+    return ",".join(sorted(k for k, q in parse_accept_encoding(header).items() if q > 0))
+
+
+def negotiate(header: str, encodings: list[str]) -> str | None:
+    """Select the content encoding for a response.
+
+    :param header: value of the ``Accept-Encoding`` request header
+    :param encodings: the supported encodings in order of preference
+    :return: the encoding with the highest quality, or ``None`` if the response
+        should not be compressed
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best: str | None = None
+    best_quality = 0.0
+    for name in encodings:
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    """Return whether responses of ``content_type`` are worth compressing."""
+    mime_type = content_type.split(";")[0].strip().lower()
+    return (
+        mime_type.startswith("text/")
+        or mime_type.endswith("+json")
+        or mime_type in COMPRESSIBLE_TYPES
+    )
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress ``data`` in one go with ``encoding``."""
+    compressor = ENCODINGS[encoding]()
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress responses below the given path prefixes according to ``Accept-Encoding``.
+
+    Responses sent in one message that are smaller than ``minimum_size``, responses
+    that already have a ``Content-Encoding`` and responses of other than textual
+    content types are sent unchanged.  Streamed responses are compressed
+    incrementally and flushed after each chunk so that, e.g., NDJSON lines are not
+    held back.
+    """
+
+    def __init__(self, app: ASGIApp, *, path_prefixes: list[str], minimum_size: int) -> None:
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), list(ENCODINGS))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(
+            self.app, encoding, ENCODINGS[encoding](), self.minimum_size
+        )
+        await responder(scope, receive, send)
+
+
+class CompressionResponder:
+    """Compresses the response of one request."""
+
+    def __init__(self, app: ASGIApp, encoding: str, compressor: Compressor, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.send: Send
+        #: The ``http.response.start`` message, held back until the first body chunk.
+        self.start_message: Message | None = None
+        #: One of "undecided", "passthrough", "compress".
+        self.mode = "undecided"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or not is_compressible(
+                headers.get("content-type", "")
+            ):
+                self.mode = "passthrough"
+                await self.send(message)
+            else:
+                self.start_message = message
+        elif message["type"] != "http.response.body" or self.mode == "passthrough":
+            await self.send(message)
+        elif self.mode == "compress":
+            await self.send_compressed(message)
+        else:
+            # Decided at the first chunk: streamed bodies are compressed right away,
+            # so that no chunk is held back, and the size threshold only applies to
+            # bodies sent in one message.
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) >= self.minimum_size:
+                self.mode = "compress"
+                await self.send_compressed(message, start=True)
+            else:
+                self.mode = "passthrough"
+                assert self.start_message is not None
+                await self.send(self.start_message)
+                await self.send(message)
+
+    async def send_compressed(self, message: Message, *, start: bool = False):
+        more_body = message.get("more_body", False)
+        body = self.compressor.compress(message.get("body", b""))
+        body += self.compressor.flush() if more_body else self.compressor.finish()
+        if start:
+            assert self.start_message is not None
+            headers = MutableHeaders(raw=list(self.start_message["headers"]))
+            headers["content-encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(body))
+            await self.send({**self.start_message, "headers": headers.raw})
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -35,6 +35,35 @@ class OAuth2ProviderConfig(OAuth2ProviderBase):
     client_secret: str
 
 
+class ProxyUpstreamConfig(BaseModel):
+    """Configuration of an upstream service behind ``/internal/proxy``."""
+
+    #: Name of the upstream, also the first path segment below ``/internal/proxy``.
+    name: str
+    #: Base URLs of the upstream, requests are distributed round-robin.
+    base_urls: list[str]
+    #: Read timeout in seconds, ``PROXY_TIMEOUT_READ`` if not set.
+    timeout: float | None = None
+    #: Whether responses of the upstream may be cached.
+    cacheable: bool = False
+    #: HTTP methods that may be forwarded to the upstream.
+    methods: list[str] = ["GET", "POST"]
+    #: Name of the entry in ``DATA_VERSIONS`` for the data served by the upstream.
+    data_version: str | None = None
+
+
+class DataVersionProbe(BaseModel):
+    """Endpoint of an upstream service that reports the version of its data."""
+
+    #: Name of the upstream in the proxy upstream registry.
+    upstream: str
+    #: Path of the version endpoint below the base URL of the upstream.
+    path: str
+    #: Dot-separated path of the version in the JSON response, e.g.,
+    #: ``version_spec.mehari``; the whole body is used if not set.
+    field: str | None = None
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=True
@@ -131,6 +160,190 @@ class Settings(BaseSettings):
     #: URL to RabbitMQ service.
     RABBITMQ_URL: str = "amqp://guest@rabbitmq:5672"
 
+    # == reverse proxy connection settings ==
+
+    #: Maximal number of connections per upstream service.
+    PROXY_POOL_MAX_CONNECTIONS: int = 100
+    #: Maximal number of idle keep-alive connections per upstream service.
+    PROXY_POOL_MAX_KEEPALIVE: int = 20
+    #: Seconds after which idle keep-alive connections are closed.
+    PROXY_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    #: Whether to use HTTP/2 to upstream services (requires ``httpx[http2]``).
+    PROXY_HTTP2: bool = False
+    #: Timeout for establishing a connection to an upstream service.
+    PROXY_TIMEOUT_CONNECT: float = 5.0
+    #: Timeout for reading a chunk of the upstream response.
+    PROXY_TIMEOUT_READ: float = 60.0
+    #: Timeout for writing a chunk of the request to the upstream.
+    PROXY_TIMEOUT_WRITE: float = 60.0
+    #: Timeout for acquiring a connection from the pool.
+    PROXY_TIMEOUT_POOL: float = 10.0
+    #: Additional upstreams (or overrides of the built-in ones), as JSON list, e.g.
+    #: '[{"name": "pharmgkb", "base_urls": ["http://pharmgkb:8080"], "methods": ["GET"]}]'.
+    PROXY_UPSTREAMS: list[ProxyUpstreamConfig] = []
+
+    # == reverse proxy response cache settings ==
+
+    #: Whether to cache responses of cacheable upstreams.
+    PROXY_CACHE_ENABLED: bool = True
+    #: Size budget of the in-process cache tier in bytes.
+    PROXY_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    #: Responses larger than this are not cached.
+    PROXY_CACHE_MAX_ITEM_BYTES: int = 1024 * 1024
+    #: Whether to use Redis (at ``REDIS_URL``) as the shared cache tier.
+    PROXY_CACHE_REDIS: bool = True
+    #: Time to live of entries in the Redis and in-process cache tiers in seconds.
+    PROXY_CACHE_REDIS_TTL: int = 7 * 24 * 60 * 60
+
+    # == reverse proxy batch settings ==
+
+    #: Maximal number of sub-requests in one ``/internal/proxy/batch`` request.
+    PROXY_BATCH_MAX_ITEMS: int = 64
+    #: Maximal number of sub-requests of one batch that are sent concurrently.
+    PROXY_BATCH_CONCURRENCY: int = 8
+
+    # == upstream bulkhead and circuit breaker settings ==
+
+    #: Maximal number of requests in flight to one upstream or remote service.
+    UPSTREAM_MAX_IN_FLIGHT: int = 32
+    #: Maximal number of requests waiting for a slot, further requests fail with 503.
+    UPSTREAM_MAX_QUEUE: int = 64
+    #: Seconds a request waits for a slot before it fails with 503.
+    UPSTREAM_QUEUE_TIMEOUT: float = 10.0
+    #: Number of consecutive failed or slow calls that open the circuit breaker.
+    UPSTREAM_BREAKER_FAILURES: int = 5
+    #: Calls taking longer than this number of seconds count as failed.
+    UPSTREAM_BREAKER_SLOW_CALL_SECONDS: float = 30.0
+    #: Seconds the circuit breaker stays open before letting a probe call through.
+    UPSTREAM_BREAKER_OPEN_SECONDS: float = 30.0
+
+    # == upstream hedging and retry settings ==
+
+    #: Whether to send a second (hedged) request if an idempotent GET is slow.
+    UPSTREAM_HEDGE_ENABLED: bool = True
+    #: Quantile of the recent latencies after which the hedged request is sent.
+    UPSTREAM_HEDGE_QUANTILE: float = 0.95
+    #: Lower bound of the hedge delay in seconds.
+    UPSTREAM_HEDGE_MIN_DELAY: float = 0.05
+    #: Upper bound of the hedge delay in seconds, also used while latencies are unknown.
+    UPSTREAM_HEDGE_MAX_DELAY: float = 5.0
+    #: Number of latencies needed before the hedge delay is derived from them.
+    UPSTREAM_HEDGE_MIN_SAMPLES: int = 20
+    #: Number of recent latencies tracked per upstream.
+    UPSTREAM_LATENCY_WINDOW: int = 256
+    #: Retry budget tokens deposited per request, i.e., the share of hedges and retries.
+    UPSTREAM_RETRY_BUDGET_RATIO: float = 0.1
+    #: Retry budget tokens added per second, so that low traffic can still retry.
+    UPSTREAM_RETRY_BUDGET_PER_SECOND: float = 1.0
+    #: Maximal number of retry budget tokens.
+    UPSTREAM_RETRY_BUDGET_MAX_TOKENS: float = 10.0
+
+    # == remote service rate limit settings ==
+
+    #: Maximal requests per second to remote services with a per-IP rate limit, by
+    #: host name; shared by all processes through Redis (at ``REDIS_URL``).
+    REMOTE_RATE_LIMITS: dict[str, float] = {
+        "www.ncbi.nlm.nih.gov": 3.0,
+        "rest.variantvalidator.org": 2.0,
+    }
+    #: Number of requests that may be sent at once after a quiet period.
+    REMOTE_RATE_LIMIT_BURST: float = 1.0
+    #: Seconds a request waits for its turn before it fails with 503.
+    REMOTE_RATE_LIMIT_MAX_WAIT: float = 10.0
+    #: Whether to share the rate limits between processes in Redis.
+    REMOTE_RATE_LIMIT_REDIS: bool = True
+
+    # == remote service micro-batching settings ==
+
+    #: Whether to combine concurrent VariantValidator lookups and PubTator 3 exports
+    #: into one call.
+    REMOTE_BATCH_ENABLED: bool = True
+    #: Seconds to wait for further lookups after the first one of a batch.
+    REMOTE_BATCH_WINDOW: float = 0.01
+    #: Maximal number of variants per VariantValidator call; VariantValidator
+    #: processes them one after the other, so large batches delay all callers.
+    REMOTE_BATCH_MAX_VARIANTS: int = 5
+    #: Maximal number of PubMed IDs per PubTator 3 export call.
+    REMOTE_BATCH_MAX_PMIDS: int = 100
+
+    # == remote ACMG batch settings ==
+
+    #: Maximal number of variants in one ``/internal/remote/acmg/batch`` request.
+    REMOTE_ACMG_BATCH_MAX_ITEMS: int = 1000
+    #: Maximal number of variants of one batch classified at the same time.
+    REMOTE_ACMG_BATCH_CONCURRENCY: int = 8
+
+    # == bookmark batch settings ==
+
+    #: Maximal number of bookmarks in one ``/api/v1/bookmarks/*-batch`` request.
+    BOOKMARKS_BATCH_MAX_ITEMS: int = 500
+
+    # == AutoCNV job settings ==
+
+    #: Seconds that pending and failed AutoCNV jobs are kept; a CNV whose job is
+    #: missing or failed is classified again when it is submitted.  Finished jobs
+    #: are kept for ``REMOTE_CACHE_TTLS["autocnv"]``.
+    AUTOCNV_JOB_TIMEOUT: int = 10 * 60
+    #: Maximal number of seconds a poll of an AutoCNV job waits for the result.
+    AUTOCNV_JOB_MAX_WAIT: float = 30.0
+
+    # == remote service cache settings ==
+
+    #: Path of the SQLite database with the responses of the remote services
+    #: (VariantValidator, WinterVar, AutoCNV, PubTator 3); empty to disable.  The
+    #: default is in the ``data`` directory next to ``app`` (``/home/reev/data`` in
+    #: the Docker image), mount a persistent volume there to keep the responses
+    #: across container restarts.
+    REMOTE_CACHE_PATH: str = f"{os.path.dirname(__file__)}/../../data/remote-cache.sqlite3"
+    #: Size budget of the cached bodies in bytes, the least recently used are evicted.
+    REMOTE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    #: Time to live of the cached responses in seconds, by service; services without
+    #: an entry are not cached.
+    REMOTE_CACHE_TTLS: dict[str, int] = {
+        "variantvalidator": 7 * 24 * 60 * 60,
+        "wintervar": 30 * 24 * 60 * 60,
+        "autocnv": 30 * 24 * 60 * 60,
+        "pubtator3": 24 * 60 * 60,
+    }
+    #: Seconds that expired responses are still served while they are refreshed.
+    REMOTE_CACHE_STALE_SECONDS: int = 7 * 24 * 60 * 60
+
+    # == data version settings ==
+
+    #: Version endpoints of the upstream services, by entry of ``DATA_VERSIONS``, as
+    #: JSON, e.g., '{"mehari": {"upstream": "mehari", "path": "/api/v1/version"}}'.
+    #: Entries without a probe keep their built-in value.
+    DATA_VERSION_PROBES: dict[str, DataVersionProbe] = {}
+    #: Seconds between two probes of the data versions, 0 to only probe on startup.
+    DATA_VERSION_REFRESH_INTERVAL: float = 5 * 60.0
+    #: Timeout in seconds for one probe.
+    DATA_VERSION_PROBE_TIMEOUT: float = 5.0
+    #: Whether to publish changed data versions to the other processes through Redis
+    #: (at ``REDIS_URL``).
+    DATA_VERSION_REDIS: bool = True
+
+    # == aggregation settings ==
+
+    #: Timeout in seconds for each section of the aggregation endpoints.
+    AGGREGATE_SECTION_TIMEOUT: float = 15.0
+
+    # == compression settings ==
+
+    #: Whether to compress responses of the API and the internal endpoints.
+    COMPRESSION_ENABLED: bool = True
+    #: Responses smaller than this number of bytes are not compressed; streamed
+    #: responses are always compressed.
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    #: Compression level for gzip (1-9).
+    COMPRESSION_GZIP_LEVEL: int = 6
+
+    # == metrics settings ==
+
+    #: Whether to record database query metrics with SQLAlchemy engine events.
+    METRICS_DB_ENABLED: bool = True
+    #: Interval in seconds for measuring the event loop lag, 0 to disable.
+    METRICS_EVENT_LOOP_INTERVAL: float = 0.5
+
     # -- User-Related Configuration ---------------------------------------------
 
     #: Superuser email, created on startup.
@@ -1,12 +1,16 @@
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import engine
-
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+from app.db import session
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
-        yield session
+    """Yield the database session of the request.
+
+    FastAPI resolves a dependency once per request, so fastapi-users (through
+    ``app.core.auth.get_user_db``) and the endpoints (through
+    ``app.api.deps.get_db``) share this session and at most one pooled connection.
+    """
+    async with session.SessionLocal() as db:
+        yield db
@@ -0,0 +1,256 @@
+"""Persistent, size-bounded cache of the responses of the remote services.
+
+The entries are stored in an SQLite database so that they survive restarts of the
+backend and are shared by the worker processes on one host.  Each entry belongs
+to a service with its own time to live.  Expired entries are still returned for
+``REMOTE_CACHE_STALE_SECONDS`` (marked as stale, so the caller can refresh them
+in the background) and the least recently used entries are evicted when the
+bodies exceed ``REMOTE_CACHE_MAX_BYTES``.  The total size of the bodies is kept
+up to date by triggers in the one-row table ``usage``, so that writes need not
+sum up all entries.
+
+SQLite is blocking, so all accesses run in a worker thread.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.cache import CachedResponse
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+#: Schema of the cache database.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    service TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_service ON entries (service);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE usage SET size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE usage SET size = size + NEW.size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE usage SET size = size - OLD.size;
+END;
+"""
+
+
+class DiskCache:
+    """SQLite-backed cache of ``CachedResponse`` with per-entry expiry and LRU eviction.
+
+    The cache is disabled until ``start()`` is called with ``REMOTE_CACHE_PATH`` set.
+    Database errors are logged and treated as misses so that a broken cache file
+    does not break the requests.
+    """
+
+    def __init__(self) -> None:
+        #: Connection to the database, ``None`` if disabled.
+        self.conn: sqlite3.Connection | None = None
+        #: Serializes the use of the connection by the worker threads.
+        self.lock = threading.Lock()
+        #: Size budget of the bodies in bytes.
+        self.max_bytes = settings.REMOTE_CACHE_MAX_BYTES
+        #: Seconds that expired entries are still returned as stale.
+        self.stale_seconds = settings.REMOTE_CACHE_STALE_SECONDS
+        #: Hits of fresh entries.
+        self.hits = 0
+        #: Hits of stale entries.
+        self.stale_hits = 0
+        #: Misses, including expired entries beyond the stale period.
+        self.misses = 0
+        #: Entries evicted because of the size budget.
+        self.evictions = 0
+        #: Errors when accessing the database.
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.conn is not None
+
+    def start(self):
+        self.stop()
+        self.max_bytes = settings.REMOTE_CACHE_MAX_BYTES
+        self.stale_seconds = settings.REMOTE_CACHE_STALE_SECONDS
+        path = settings.REMOTE_CACHE_PATH
+        if not path:
+            return
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(f"BEGIN IMMEDIATE; {SCHEMA} COMMIT;")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Cannot open remote cache %s, disabling it: %s", path, e)
+            return
+        self.conn = conn
+
+    def stop(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+                self.conn = None
+
+    def _failed(self, e: Exception):
+        self.errors += 1
+        logger.warning("Remote cache unavailable: %s", e)
+
+    def _get(self, key: str, now: float) -> tuple[CachedResponse, bool] | None:
+        assert self.conn is not None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status_code, headers, body, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[3] + self.stale_seconds <= now:
+                return None
+            self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        status_code, headers, body, expires_at = row
+        entry = CachedResponse(status_code, [tuple(h) for h in json.loads(headers)], body)
+        return entry, expires_at > now
+
+    async def get(self, key: str) -> tuple[CachedResponse, bool] | None:
+        """Look up ``key``.
+
+        :return: the entry and whether it is fresh, or ``None`` if missing or expired
+            for longer than the stale period
+        """
+        if self.conn is None:
+            return None
+        try:
+            result = await asyncio.to_thread(self._get, key, time.time())
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+        if result is None:
+            self.misses += 1
+        elif result[1]:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return result
+
+    def _set(self, key: str, service: str, entry: CachedResponse, ttl: float, now: float):
+        assert self.conn is not None
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # An upsert rather than INSERT OR REPLACE, whose implicit delete
+                # would not fire the trigger that keeps ``usage`` up to date.
+                self.conn.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO "
+                    "UPDATE SET service = excluded.service, status_code = excluded.status_code, "
+                    "headers = excluded.headers, body = excluded.body, size = excluded.size, "
+                    "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                    (
+                        key,
+                        service,
+                        entry.status_code,
+                        json.dumps(entry.headers),
+                        entry.body,
+                        entry.size,
+                        now + ttl,
+                        now,
+                    ),
+                )
+                self._evict()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self):
+        """Delete the least recently used entries until the size budget is met."""
+        assert self.conn is not None
+        (excess,) = self.conn.execute("SELECT size FROM usage").fetchone()
+        excess -= self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    async def set(self, key: str, service: str, entry: CachedResponse, ttl: float):
+        """Store ``entry`` for ``ttl`` seconds; entries larger than the budget are skipped."""
+        if self.conn is None or entry.size > self.max_bytes:
+            return
+        try:
+            await asyncio.to_thread(self._set, key, service, entry, ttl, time.time())
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def _purge(self, service: str | None) -> int:
+        assert self.conn is not None
+        with self.lock:
+            if service is None:
+                cursor = self.conn.execute("DELETE FROM entries")
+            else:
+                cursor = self.conn.execute("DELETE FROM entries WHERE service = ?", (service,))
+            return cursor.rowcount
+
+    async def purge(self, service: str | None = None) -> int:
+        """Delete all entries, or those of ``service``, and return their number."""
+        if self.conn is None:
+            return 0
+        try:
+            return await asyncio.to_thread(self._purge, service)
+        except sqlite3.Error as e:
+            self._failed(e)
+            return 0
+
+    def _usage(self) -> dict[str, dict[str, int]]:
+        assert self.conn is not None
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT service, COUNT(*), SUM(size) FROM entries GROUP BY service"
+            ).fetchall()
+        return {service: {"entries": count, "size": size} for service, count, size in rows}
+
+    async def stats(self) -> dict[str, object]:
+        """Return the counters and the entries and size by service."""
+        usage = {}
+        if self.conn is not None:
+            try:
+                usage = await asyncio.to_thread(self._usage)
+            except sqlite3.Error as e:
+                self._failed(e)
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "max_bytes": self.max_bytes,
+            "services": usage,
+        }
+
+
+#: The cache of the remote service responses.
+remote_cache = DiskCache()
@@ -0,0 +1,238 @@
+"""Metrics of the hot paths, exposed in the Prometheus text format at ``/internal/metrics``.
+
+The metrics live in their own ``registry`` and are updated in place, so that
+recording a value costs a few microseconds and no work is done until the
+metrics are scraped.
+
+- requests to the upstream and remote services (latency until the response
+  headers, status codes and response bytes) are recorded by ``send_buffered``
+  and the streaming path of the reverse proxy,
+- database queries and the use of the connection pool are recorded by
+  SQLAlchemy engine and pool events installed with ``instrument_engine``,
+- lookups of access tokens in Redis are recorded by the authentication strategy,
+- waits for the outbound rate limits of the remote services are recorded by
+  ``RateLimiter``,
+- the event loop lag is measured by ``EventLoopMonitor``.
+"""
+
+import asyncio
+import functools
+import time
+from typing import Any
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+#: Registry of the metrics of the application.
+registry = CollectorRegistry()
+
+#: Latency buckets for requests to upstream services (seconds).
+UPSTREAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+#: Latency buckets for database queries and Redis lookups (seconds).
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+#: Buckets for the wait for an outbound rate limit token (seconds).
+RATE_LIMIT_BUCKETS = (0.0, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+#: Buckets for the event loop lag (seconds).
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+upstream_request_duration = Histogram(
+    "reev_upstream_request_duration_seconds",
+    "Time until the response headers of an upstream or remote service arrived.",
+    ["upstream"],
+    buckets=UPSTREAM_BUCKETS,
+    registry=registry,
+)
+upstream_responses = Counter(
+    "reev_upstream_responses",
+    "Responses of upstream and remote services by status code ('error' if the request failed).",
+    ["upstream", "status"],
+    registry=registry,
+)
+upstream_response_bytes = Counter(
+    "reev_upstream_response_bytes",
+    "Bytes of response bodies received from upstream and remote services.",
+    ["upstream"],
+    registry=registry,
+)
+db_query_duration = Histogram(
+    "reev_db_query_duration_seconds",
+    "Duration of database queries by statement type.",
+    ["statement"],
+    buckets=QUERY_BUCKETS,
+    registry=registry,
+)
+db_pool_checked_out = Gauge(
+    "reev_db_pool_checked_out_connections",
+    "Database connections currently checked out of the connection pool.",
+    registry=registry,
+)
+db_pool_checkouts = Counter(
+    "reev_db_pool_checkouts",
+    "Checkouts of database connections from the connection pool.",
+    registry=registry,
+)
+db_pool_hold_duration = Histogram(
+    "reev_db_pool_hold_duration_seconds",
+    "Time database connections were checked out of the connection pool.",
+    buckets=UPSTREAM_BUCKETS,
+    registry=registry,
+)
+redis_auth_duration = Histogram(
+    "reev_redis_auth_lookup_duration_seconds",
+    "Duration of access token lookups in Redis by result ('hit', 'miss' or 'error').",
+    ["result"],
+    buckets=QUERY_BUCKETS,
+    registry=registry,
+)
+rate_limit_wait = Histogram(
+    "reev_rate_limit_wait_seconds",
+    "Time calls waited for an outbound rate limit token by remote host.",
+    ["host"],
+    buckets=RATE_LIMIT_BUCKETS,
+    registry=registry,
+)
+rate_limit_queue = Gauge(
+    "reev_rate_limit_queue_depth",
+    "Calls currently waiting for an outbound rate limit token by remote host.",
+    ["host"],
+    registry=registry,
+)
+rate_limit_rejected = Counter(
+    "reev_rate_limit_rejected",
+    "Calls rejected because the wait for an outbound rate limit token was too long.",
+    ["host"],
+    registry=registry,
+)
+event_loop_lag = Histogram(
+    "reev_event_loop_lag_seconds",
+    "Delay of a timer callback on the event loop beyond its scheduled time.",
+    buckets=LAG_BUCKETS,
+    registry=registry,
+)
+
+
+@functools.cache
+def upstream_children(upstream: str, status: int | str) -> tuple[Any, Any]:
+    """Return the labelled duration and responses metrics of an upstream.
+
+    Looking up labelled metrics is about as expensive as updating them, so the
+    children are cached; the number of upstreams and status codes is small.
+    """
+    return (
+        upstream_request_duration.labels(upstream),
+        upstream_responses.labels(upstream, str(status)),
+    )
+
+
+@functools.cache
+def upstream_bytes_child(upstream: str) -> Any:
+    """Return the labelled response bytes metric of an upstream."""
+    return upstream_response_bytes.labels(upstream)
+
+
+def observe_upstream(upstream: str, status: int | str, seconds: float, size: int = 0):
+    """Record one request to an upstream or remote service.
+
+    :param upstream: name of the upstream or host name of the remote service
+    :param status: HTTP status code of the response, or ``"error"``
+    :param seconds: time until the response headers arrived
+    :param size: number of bytes of the response body, if already known
+    """
+    duration, responses = upstream_children(upstream, status)
+    duration.observe(seconds)
+    responses.inc()
+    if size:
+        upstream_bytes_child(upstream).inc(size)
+
+
+def observe_upstream_bytes(upstream: str, size: int):
+    """Record the number of bytes of a streamed response body once it is complete."""
+    upstream_bytes_child(upstream).inc(size)
+
+
+@functools.cache
+def rate_limit_children(host: str) -> tuple[Any, Any, Any]:
+    """Return the labelled wait, queue depth and rejected metrics of a remote host."""
+    return (
+        rate_limit_wait.labels(host),
+        rate_limit_queue.labels(host),
+        rate_limit_rejected.labels(host),
+    )
+
+
+@functools.cache
+def db_query_child(statement: str) -> Any:
+    """Return the labelled query duration metric for a statement type."""
+    return db_query_duration.labels(statement)
+
+
+def statement_type(statement: str) -> str:
+    """Return the upper-cased first keyword of an SQL statement, e.g., ``SELECT``."""
+    head = statement.lstrip()[:16].split(None, 1)
+    return head[0].upper() if head else "EMPTY"
+
+
+def instrument_engine(engine: Engine):
+    """Record the duration of each query executed by ``engine`` and the use of its pool.
+
+    For an ``AsyncEngine``, pass its ``sync_engine``.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.reev_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.reev_query_start
+        db_query_child(statement_type(statement)).observe(elapsed)
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["reev_checkout_start"] = time.perf_counter()
+        db_pool_checkouts.inc()
+        db_pool_checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        start = connection_record.info.pop("reev_checkout_start", None)
+        if start is not None:
+            db_pool_hold_duration.observe(time.perf_counter() - start)
+            db_pool_checked_out.dec()
+
+
+class EventLoopMonitor:
+    """Measures how late a periodic timer fires on the running event loop.
+
+    A lag well above a few milliseconds means that some code blocks the loop.
+    """
+
+    def __init__(self) -> None:
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self):
+        if settings.METRICS_EVENT_LOOP_INTERVAL > 0:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.METRICS_EVENT_LOOP_INTERVAL
+        while True:
+            scheduled = loop.time() + interval
+            await asyncio.sleep(interval)
+            event_loop_lag.observe(max(0.0, loop.time() - scheduled))
+
+
+event_loop_monitor = EventLoopMonitor()
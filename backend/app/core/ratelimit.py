@@ -0,0 +1,164 @@
+"""Outbound rate limits for remote services, shared between processes in Redis.
+
+PubTator 3 and VariantValidator enforce a per-IP rate limit and answer with
+``429 Too Many Requests`` when it is exceeded.  ``RateLimiter`` keeps a token
+bucket per remote host (``REMOTE_RATE_LIMITS``) in Redis, so that all worker
+processes together stay below the limit.
+
+A call reserves the next token and sleeps until it is due, so concurrent calls
+are queued in order instead of failing.  If the wait would be longer than
+``REMOTE_RATE_LIMIT_MAX_WAIT``, no token is reserved and ``UpstreamUnavailable``
+is raised (answered with 503 and ``Retry-After``).  While Redis is unavailable,
+an in-process bucket with the same rate is used.
+"""
+
+import asyncio
+import logging
+import time
+
+import redis.asyncio
+from redis.commands.core import AsyncScript
+
+from app.core.config import settings
+from app.core.metrics import rate_limit_children
+from app.core.resilience import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+#: Prefix of the keys in Redis.
+REDIS_KEY_PREFIX = "reev:rate-limit:"
+
+#: Seconds to use the in-process buckets after Redis failed.
+REDIS_BACKOFF_SECONDS = 30.0
+
+#: Reserve a token of the bucket at ``KEYS[1]`` given the rate per second, the
+#: bucket size and the maximal wait in seconds.  Returns whether the token was
+#: reserved and the wait until it is due; the wait is returned as a string as
+#: Redis truncates numbers to integers.
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = math.max(0, (1 - tokens) / rate)
+if wait > max_wait then
+    return {0, tostring(wait)}
+end
+tokens = tokens - 1
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return {1, tostring(wait)}
+"""
+
+
+class TokenBucket:
+    """In-process token bucket whose tokens are reserved ahead of time."""
+
+    def __init__(self, rate: float, burst: float):
+        #: Tokens added per second.
+        self.rate = rate
+        #: Maximal number of tokens.
+        self.burst = burst
+        #: Tokens currently available, negative if reserved ahead of time.
+        self.tokens = burst
+        #: Monotonic time of the last update.
+        self.updated = time.monotonic()
+
+    def reserve(self, max_wait: float) -> tuple[bool, float]:
+        """Reserve a token unless the wait for it would exceed ``max_wait``.
+
+        :return: whether the token was reserved and the wait in seconds until it is due
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (1.0 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return False, wait
+        self.tokens -= 1.0
+        return True, wait
+
+
+class RateLimiter:
+    """Token buckets per remote host, in Redis with in-process buckets as fallback."""
+
+    def __init__(self) -> None:
+        #: Redis client, if enabled.
+        self.redis: redis.asyncio.Redis | None = None
+        #: The reservation script registered with ``redis``.
+        self.script: AsyncScript | None = None
+        #: Monotonic time until which Redis is skipped.
+        self.redis_backoff_until = 0.0
+        #: Errors when accessing Redis.
+        self.redis_errors = 0
+        #: In-process buckets, by host name.
+        self.buckets: dict[str, TokenBucket] = {}
+
+    def start(self):
+        if settings.REMOTE_RATE_LIMIT_REDIS:
+            self.redis = redis.asyncio.from_url(settings.REDIS_URL)
+            self.script = self.redis.register_script(RESERVE_SCRIPT)
+
+    async def stop(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+            self.script = None
+
+    def clear(self):
+        self.buckets.clear()
+        self.redis_backoff_until = 0.0
+
+    def _redis_available(self) -> bool:
+        return self.script is not None and time.monotonic() >= self.redis_backoff_until
+
+    async def reserve(self, host: str, rate: float, max_wait: float) -> tuple[bool, float]:
+        """Reserve a token of ``host``, see ``TokenBucket.reserve``."""
+        burst = settings.REMOTE_RATE_LIMIT_BURST
+        if self._redis_available():
+            assert self.script is not None
+            try:
+                reserved, wait = await self.script(
+                    keys=[REDIS_KEY_PREFIX + host], args=[rate, burst, max_wait]
+                )
+                return bool(reserved), float(wait)
+            except (redis.RedisError, OSError) as e:
+                self.redis_errors += 1
+                self.redis_backoff_until = time.monotonic() + REDIS_BACKOFF_SECONDS
+                logger.warning("Redis unavailable, using in-process rate limits: %s", e)
+        bucket = self.buckets.get(host)
+        if bucket is None or bucket.rate != rate or bucket.burst != burst:
+            bucket = self.buckets[host] = TokenBucket(rate, burst)
+        return bucket.reserve(max_wait)
+
+    async def acquire(self, host: str):
+        """Wait until a request may be sent to ``host``.
+
+        Hosts without an entry in ``REMOTE_RATE_LIMITS`` are not limited.
+
+        :raises UpstreamUnavailable: if the wait would exceed ``REMOTE_RATE_LIMIT_MAX_WAIT``
+        """
+        rate = settings.REMOTE_RATE_LIMITS.get(host)
+        if not rate:
+            return
+        wait_metric, queue_metric, rejected_metric = rate_limit_children(host)
+        reserved, wait = await self.reserve(host, rate, settings.REMOTE_RATE_LIMIT_MAX_WAIT)
+        if not reserved:
+            rejected_metric.inc()
+            raise UpstreamUnavailable(host, "outbound rate limit exceeded", wait)
+        wait_metric.observe(wait)
+        if wait > 0:
+            queue_metric.inc()
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                queue_metric.dec()
+
+
+#: The outbound rate limits of the remote services.
+rate_limiter = RateLimiter()
@@ -0,0 +1,371 @@
+"""Bulkheads, circuit breakers and retry budgets for the calls to upstream and remote services.
+
+Each upstream gets a ``Bulkhead`` that limits the number of requests in flight
+and the number of requests waiting for a slot, and a ``CircuitBreaker`` that
+stops sending requests for a while after repeated errors or slow responses.
+Requests that are rejected raise ``UpstreamUnavailable`` which is answered with
+``503 Service Unavailable`` and a ``Retry-After`` header.
+
+The latencies of successful calls are tracked in a ``LatencyWindow`` to derive
+the delay for hedged requests, and hedged or retried requests are limited by a
+``RetryBudget`` so that they cannot multiply the load on a failing upstream.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when a request to an upstream is rejected without sending it."""
+
+    def __init__(self, name: str, reason: str, retry_after: float):
+        super().__init__(f"upstream {name} unavailable: {reason}")
+        #: Name of the upstream.
+        self.name = name
+        #: Why the request was rejected.
+        self.reason = reason
+        #: Seconds after which the client may retry.
+        self.retry_after = retry_after
+
+
+async def upstream_unavailable_handler(request: Request, exc: Exception) -> Response:
+    """Exception handler answering ``UpstreamUnavailable`` with 503 and ``Retry-After``."""
+    _ = request
+    assert isinstance(exc, UpstreamUnavailable)
+    return Response(
+        status_code=503,
+        content=str(exc),
+        headers={"retry-after": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+class Bulkhead:
+    """Limit the requests in flight to one upstream, with a bounded wait queue."""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        #: Name of the upstream.
+        self.name = name
+        #: Maximal number of requests waiting for a slot.
+        self.max_queue = max_queue
+        #: Seconds a request waits for a slot before it is rejected.
+        self.queue_timeout = queue_timeout
+        #: The slots.
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        #: Number of requests in flight.
+        self.in_flight = 0
+        #: Number of requests waiting for a slot.
+        self.waiting = 0
+        #: Number of rejected requests.
+        self.rejected = 0
+
+    async def acquire(self):
+        if self.semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.name, "too many requests in flight", 1.0)
+            self.waiting += 1
+            # Not ``asyncio.wait_for``, which may lose a slot acquired just as the
+            # timeout fires or the caller is cancelled (before Python 3.12).
+            acquiring = asyncio.ensure_future(self.semaphore.acquire())
+            try:
+                await asyncio.wait((acquiring,), timeout=self.queue_timeout)
+            except asyncio.CancelledError:
+                self._abandon(acquiring)
+                raise
+            finally:
+                self.waiting -= 1
+            if not acquiring.done():
+                acquiring.cancel()
+                self.rejected += 1
+                raise UpstreamUnavailable(self.name, "timeout waiting for a slot", 1.0)
+        else:
+            await self.semaphore.acquire()
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def _abandon(self, acquiring: asyncio.Future[bool]):
+        """Stop waiting for a slot, giving it back if ``acquiring`` already got it."""
+        if acquiring.done() and not acquiring.cancelled():
+            self.semaphore.release()
+        else:
+            acquiring.cancel()
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after ``failure_threshold`` consecutive failures.
+
+    A call fails if it raises, returns a server error or takes longer than
+    ``slow_call_seconds``.  The breaker then stays open for ``open_seconds``,
+    after which one probe call is let through ("half-open").  The breaker closes
+    again if the probe succeeds and opens again otherwise.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self, name: str, failure_threshold: int, slow_call_seconds: float, open_seconds: float
+    ):
+        #: Name of the upstream.
+        self.name = name
+        #: Number of consecutive failures that open the breaker.
+        self.failure_threshold = failure_threshold
+        #: Calls taking longer than this count as failures.
+        self.slow_call_seconds = slow_call_seconds
+        #: Seconds to stay open before letting a probe through.
+        self.open_seconds = open_seconds
+        #: Current state.
+        self.state = self.CLOSED
+        #: Number of consecutive failures.
+        self.failures = 0
+        #: Monotonic time until which the breaker stays open.
+        self.open_until = 0.0
+        #: Whether the probe call of the half-open state is in flight.
+        self.probing = False
+        #: Number of calls rejected because the breaker was open.
+        self.rejected = 0
+
+    def before_call(self):
+        """Raise ``UpstreamUnavailable`` if no call may be made now."""
+        if self.state == self.OPEN:
+            remaining = self.open_until - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.name, "circuit breaker open", remaining)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self.probing:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.name, "circuit breaker half-open", 1.0)
+            self.probing = True
+
+    def record(self, duration: float, failed: bool):
+        """Record the outcome of a call."""
+        self.probing = False
+        if failed or duration > self.slow_call_seconds:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("opening circuit breaker of upstream %s", self.name)
+                self.state = self.OPEN
+                self.open_until = time.monotonic() + self.open_seconds
+        else:
+            self.failures = 0
+            self.state = self.CLOSED
+
+
+class LatencyWindow:
+    """The latencies of the most recent successful calls."""
+
+    def __init__(self, size: int):
+        #: Latencies in seconds, oldest first.
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """Return the ``q`` quantile of the latencies, ``None`` if there are none."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RetryBudget:
+    """Token bucket limiting hedged and retried requests.
+
+    Each original request deposits ``ratio`` tokens and the bucket is refilled
+    with ``per_second`` tokens per second, up to ``max_tokens``.  Each hedged or
+    retried request withdraws one token, so their share of the traffic stays
+    bounded even if every request to the upstream is slow or fails.
+    """
+
+    def __init__(self, ratio: float, per_second: float, max_tokens: float):
+        self.ratio = ratio
+        self.per_second = per_second
+        self.max_tokens = max_tokens
+        #: Tokens currently available.
+        self.tokens = max_tokens
+        #: Monotonic time of the last refill.
+        self.refilled = time.monotonic()
+        #: Number of withdrawals refused for lack of tokens.
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one token, return whether one was available."""
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.refilled) * self.per_second)
+        self.refilled = now
+        if self.tokens < 1.0:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class GuardedCall:
+    """One call admitted by an ``UpstreamGuard``.
+
+    ``completed()`` records the outcome in the circuit breaker and ``release()``
+    frees the bulkhead slot.  Both may be called separately, e.g., when the
+    response headers have arrived and when a streamed body has been sent.
+    """
+
+    def __init__(self, guard: "UpstreamGuard"):
+        self.guard = guard
+        self.start = time.monotonic()
+        self.is_completed = False
+        self.is_released = False
+
+    def completed(self, failed: bool):
+        if not self.is_completed:
+            self.is_completed = True
+            duration = time.monotonic() - self.start
+            self.guard.breaker.record(duration, failed)
+            if not failed:
+                self.guard.latency.record(duration)
+
+    def release(self):
+        if not self.is_released:
+            self.is_released = True
+            self.guard.bulkhead.release()
+
+
+class UpstreamGuard:
+    """Bulkhead, circuit breaker, latencies and retry budget of one upstream."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.bulkhead = Bulkhead(
+            name,
+            settings.UPSTREAM_MAX_IN_FLIGHT,
+            settings.UPSTREAM_MAX_QUEUE,
+            settings.UPSTREAM_QUEUE_TIMEOUT,
+        )
+        self.breaker = CircuitBreaker(
+            name,
+            settings.UPSTREAM_BREAKER_FAILURES,
+            settings.UPSTREAM_BREAKER_SLOW_CALL_SECONDS,
+            settings.UPSTREAM_BREAKER_OPEN_SECONDS,
+        )
+        self.latency = LatencyWindow(settings.UPSTREAM_LATENCY_WINDOW)
+        self.retry_budget = RetryBudget(
+            settings.UPSTREAM_RETRY_BUDGET_RATIO,
+            settings.UPSTREAM_RETRY_BUDGET_PER_SECOND,
+            settings.UPSTREAM_RETRY_BUDGET_MAX_TOKENS,
+        )
+        #: Number of hedged requests sent.
+        self.hedges = 0
+        #: Number of hedged requests that answered before the original one.
+        self.hedges_won = 0
+
+    async def acquire(self) -> GuardedCall:
+        """Admit a call or raise ``UpstreamUnavailable``."""
+        self.breaker.before_call()
+        try:
+            await self.bulkhead.acquire()
+        except BaseException:
+            self.breaker.probing = False
+            raise
+        return GuardedCall(self)
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[GuardedCall]:
+        """Admit a call for the duration of the ``async with`` block.
+
+        The call counts as failed if the block raises and as succeeded if the
+        block does not call ``completed()`` itself.  Cancelled calls (e.g., the
+        slower of two hedged requests) are not counted at all.
+        """
+        guarded = await self.acquire()
+        try:
+            yield guarded
+        except asyncio.CancelledError:
+            if not guarded.is_completed:
+                self.breaker.probing = False
+            raise
+        except BaseException:
+            guarded.completed(failed=True)
+            raise
+        else:
+            guarded.completed(failed=False)
+        finally:
+            guarded.release()
+
+    def hedge_delay(self) -> float:
+        """Return the delay after which to send a hedged request.
+
+        This is the ``UPSTREAM_HEDGE_QUANTILE`` of the recent latencies, limited to
+        ``UPSTREAM_HEDGE_MIN_DELAY`` and ``UPSTREAM_HEDGE_MAX_DELAY``.  The maximal
+        delay is used until ``UPSTREAM_HEDGE_MIN_SAMPLES`` latencies are known.
+        """
+        if len(self.latency.samples) < settings.UPSTREAM_HEDGE_MIN_SAMPLES:
+            return settings.UPSTREAM_HEDGE_MAX_DELAY
+        quantile = self.latency.quantile(settings.UPSTREAM_HEDGE_QUANTILE)
+        assert quantile is not None
+        return min(
+            settings.UPSTREAM_HEDGE_MAX_DELAY, max(settings.UPSTREAM_HEDGE_MIN_DELAY, quantile)
+        )
+
+    def state(self) -> dict[str, Any]:
+        """Return the state of the bulkhead, the circuit breaker and the hedging."""
+        retry_after = max(0.0, self.breaker.open_until - time.monotonic())
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retry_after": retry_after if self.breaker.state == CircuitBreaker.OPEN else 0.0,
+            "rejected_open": self.breaker.rejected,
+            "in_flight": self.bulkhead.in_flight,
+            "waiting": self.bulkhead.waiting,
+            "rejected_full": self.bulkhead.rejected,
+            "latency_p50": self.latency.quantile(0.5),
+            "latency_p95": self.latency.quantile(0.95),
+            "hedge_delay": self.hedge_delay(),
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "retry_tokens": self.retry_budget.tokens,
+            "retry_budget_exhausted": self.retry_budget.exhausted,
+        }
+
+
+class UpstreamGuards:
+    """One ``UpstreamGuard`` per upstream, created on first use."""
+
+    def __init__(self) -> None:
+        #: The guards, by upstream name.
+        self.guards: dict[str, UpstreamGuard] = {}
+
+    def __call__(self, name: str) -> UpstreamGuard:
+        guard = self.guards.get(name)
+        if guard is None:
+            guard = self.guards[name] = UpstreamGuard(name)
+        return guard
+
+    def clear(self):
+        self.guards.clear()
+
+    def state(self) -> dict[str, dict[str, Any]]:
+        """Return the state of all guards, by upstream name."""
+        return {name: guard.state() for name, guard in sorted(self.guards.items())}
+
+
+upstream_guards = UpstreamGuards()
@@ -0,0 +1,55 @@
+"""Coalescing of identical concurrent calls."""
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Run at most one call per key at a time and share its result with all callers.
+
+    The call runs in its own task so a caller that is cancelled (e.g., because the
+    client disconnected) does not cancel the call for the other callers.  The task
+    is only cancelled when all of its callers have been cancelled; later callers
+    with the same key then start a new call.
+    """
+
+    def __init__(self) -> None:
+        #: In-flight calls, by key.
+        self.tasks: dict[Hashable, asyncio.Task[T]] = {}
+        #: Number of callers waiting for each in-flight call.
+        self.waiters: dict[Hashable, int] = {}
+        #: Number of calls actually made.
+        self.calls = 0
+        #: Number of callers that shared the result of another caller's call.
+        self.shared = 0
+
+    def _done(self, key: Hashable, task: asyncio.Task[T]):
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+            del self.waiters[key]
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``func()``, shared with concurrent callers using ``key``."""
+        task = self.tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.tasks[key] = task
+            self.waiters[key] = 0
+            task.add_done_callback(lambda task: self._done(key, task))
+            self.calls += 1
+        else:
+            self.shared += 1
+        self.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self.tasks.get(key) is task:
+                self.waiters[key] -= 1
+                if self.waiters[key] == 0:
+                    # Forget the call right away, so a caller joining before the
+                    # task has finished cancelling starts a new call.
+                    self._done(key, task)
+                    task.cancel()
+            raise
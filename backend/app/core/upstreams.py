@@ -0,0 +1,355 @@
+"""Registry of and pooled HTTP clients for the internal upstream services."""
+
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Iterable
+
+import httpx
+
+from app.core.cache import CachedResponse
+from app.core.config import ProxyUpstreamConfig, Settings, settings
+from app.core.metrics import observe_upstream
+from app.core.resilience import UpstreamGuard
+
+
+def proxy_limits() -> httpx.Limits:
+    """Return the connection pool limits for one upstream service."""
+    return httpx.Limits(
+        max_connections=settings.PROXY_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.PROXY_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.PROXY_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def proxy_timeout(read: float | None = None) -> httpx.Timeout:
+    """Return the timeouts for requests to one upstream service."""
+    return httpx.Timeout(
+        connect=settings.PROXY_TIMEOUT_CONNECT,
+        read=settings.PROXY_TIMEOUT_READ if read is None else read,
+        write=settings.PROXY_TIMEOUT_WRITE,
+        pool=settings.PROXY_TIMEOUT_POOL,
+    )
+
+
+class ResponseTooLarge(Exception):
+    """The body of a response exceeds the ``max_size`` of ``send_buffered()``.
+
+    The response is still open.  The caller that ``claim()``s the exception streams
+    the body from ``content()`` and closes the response; the same exception reaches
+    all waiters of a ``SingleFlight``, the others have to send their own request.
+    """
+
+    def __init__(self, response: httpx.Response, head: list[bytes], chunks: AsyncIterator[bytes]):
+        super().__init__("response body larger than the buffer limit")
+        #: The open response.
+        self.response = response
+        #: The chunks of the body read before the limit was exceeded.
+        self.head = head
+        #: The rest of the body.
+        self.chunks = chunks
+        #: Whether a caller took over the response.
+        self.claimed = False
+
+    def claim(self) -> bool:
+        """Return whether the caller is the first to take over the response."""
+        claimed, self.claimed = self.claimed, True
+        return not claimed
+
+    async def content(self) -> AsyncIterator[bytes]:
+        for chunk in self.head:
+            yield chunk
+        async for chunk in self.chunks:
+            yield chunk
+
+
+def declared_length(response: httpx.Response) -> int:
+    """Return the ``Content-Length`` of a response, -1 if it is not known."""
+    try:
+        return int(response.headers.get("content-length", "-1"))
+    except ValueError:
+        return -1
+
+
+async def send_buffered(
+    client: httpx.AsyncClient,
+    request: httpx.Request,
+    *,
+    decode: bool = False,
+    guard: UpstreamGuard | None = None,
+    max_size: int | None = None,
+) -> CachedResponse:
+    """Send ``request`` and read the whole response body.
+
+    :param client: client to send the request with
+    :param request: the request to send
+    :param decode: whether to undo the content encoding of the body, otherwise the body
+        is kept as sent by the upstream
+    :param guard: bulkhead and circuit breaker to send the request through, if any;
+        errors and server errors count as failed calls and the request is recorded in
+        the upstream metrics under the name of the guard
+    :param max_size: maximal number of bytes of the body to buffer, only without ``decode``
+    :return: the buffered response
+    :raises UpstreamUnavailable: if the guard rejects the request
+    :raises ResponseTooLarge: if the body is larger than ``max_size``
+    """
+    assert max_size is None or not decode
+    if guard is not None:
+        async with guard.call() as call:
+            started = time.perf_counter()
+            try:
+                entry = await send_buffered(client, request, decode=decode, max_size=max_size)
+            except ResponseTooLarge as e:
+                status_code = e.response.status_code
+                observe_upstream(guard.name, status_code, time.perf_counter() - started)
+                call.completed(failed=status_code >= 500)
+                raise
+            except Exception:
+                observe_upstream(guard.name, "error", time.perf_counter() - started)
+                raise
+            observe_upstream(
+                guard.name, entry.status_code, time.perf_counter() - started, len(entry.body)
+            )
+            call.completed(failed=entry.status_code >= 500)
+        return entry
+    response = await client.send(request, stream=True)
+    try:
+        chunks = response.aiter_bytes() if decode else response.aiter_raw()
+        parts: list[bytes] = []
+        if max_size is not None and declared_length(response) > max_size:
+            raise ResponseTooLarge(response, parts, chunks)
+        size = 0
+        async for chunk in chunks:
+            parts.append(chunk)
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise ResponseTooLarge(response, parts, chunks)
+    except ResponseTooLarge:
+        raise
+    except BaseException:
+        await response.aclose()
+        raise
+    await response.aclose()
+    headers = response.headers.multi_items()
+    if decode:
+        headers = [(k, v) for k, v in headers if k != "content-encoding"]
+    return CachedResponse.from_upstream(response.status_code, headers, b"".join(parts))
+
+
+async def send_hedged(
+    client: httpx.AsyncClient,
+    build_request: Callable[[], httpx.Request],
+    guard: UpstreamGuard,
+    *,
+    decode: bool = False,
+    max_size: int | None = None,
+) -> CachedResponse:
+    """Send an idempotent request with hedging and retries limited by the retry budget.
+
+    If there is no response after ``guard.hedge_delay()``, a second request is sent
+    and the first response is used; the other request is cancelled.  A request that
+    failed to connect is retried once.  Both need a token from ``guard.retry_budget``.
+
+    :param client: client to send the requests with
+    :param build_request: builds a new request for each attempt
+    :param guard: bulkhead, circuit breaker and retry budget of the upstream
+    :param decode: whether to undo the content encoding of the body
+    :param max_size: maximal number of bytes of the body to buffer, see ``send_buffered()``
+    :return: the buffered response of the first successful attempt
+    :raises UpstreamUnavailable: if the guard rejects the request
+    :raises ResponseTooLarge: if the body of the first response is larger than ``max_size``
+    """
+    guard.retry_budget.deposit()
+    attempts: list[asyncio.Task[CachedResponse]] = []
+
+    def attempt() -> asyncio.Task[CachedResponse]:
+        task = asyncio.ensure_future(
+            send_buffered(client, build_request(), decode=decode, guard=guard, max_size=max_size)
+        )
+        attempts.append(task)
+        return task
+
+    primary = attempt()
+    tasks = {primary}
+    winner: asyncio.Task[CachedResponse] | None = None
+    try:
+        if settings.UPSTREAM_HEDGE_ENABLED:
+            done, _ = await asyncio.wait(tasks, timeout=guard.hedge_delay())
+            if not done and guard.retry_budget.withdraw():
+                guard.hedges += 1
+                tasks.add(attempt())
+        retried = False
+        error: BaseException | None = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None or isinstance(error, ResponseTooLarge):
+                    if task is not primary:
+                        guard.hedges_won += 1
+                    winner = task
+                    return task.result()
+            if (
+                not tasks
+                and not retried
+                and isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+                and guard.retry_budget.withdraw()
+            ):
+                retried = True
+                tasks = {attempt()}
+        assert error is not None
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Another attempt may have completed at the same time with an open response.
+        for task in attempts:
+            if task is not winner and task.done() and not task.cancelled():
+                other = task.exception()
+                if isinstance(other, ResponseTooLarge):
+                    await other.response.aclose()
+
+
+class UpstreamClients:
+    """One pooled ``httpx.AsyncClient`` per upstream service.
+
+    Clients are created on first use after ``start()`` and all of them are closed
+    on ``stop()``.  Using one client per upstream keeps connections alive between
+    requests and prevents one slow service from exhausting the pool of the others.
+    """
+
+    def __init__(self) -> None:
+        #: Whether ``start()`` has been called.
+        self.started: bool = False
+        #: The clients, by upstream name.
+        self.clients: dict[str, httpx.AsyncClient] = {}
+
+    def start(self):
+        self.started = True
+
+    async def stop(self):
+        clients, self.clients = self.clients, {}
+        self.started = False
+        for client in clients.values():
+            await client.aclose()
+
+    def __call__(self, name: str) -> httpx.AsyncClient:
+        assert self.started
+        client = self.clients.get(name)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=proxy_limits(),
+                timeout=proxy_timeout(),
+                http2=settings.PROXY_HTTP2,
+            )
+            self.clients[name] = client
+        return client
+
+
+upstream_clients = UpstreamClients()
+
+
+def builtin_upstreams(settings: Settings) -> list[ProxyUpstreamConfig]:
+    """Return the configuration of the built-in upstreams from the ``BACKEND_PREFIX_*`` settings."""
+    return [
+        ProxyUpstreamConfig(
+            name="annonars",
+            base_urls=[settings.BACKEND_PREFIX_ANNONARS],
+            cacheable=True,
+            data_version="annonars",
+        ),
+        ProxyUpstreamConfig(
+            name="mehari",
+            base_urls=[settings.BACKEND_PREFIX_MEHARI],
+            cacheable=True,
+            data_version="mehari",
+        ),
+        ProxyUpstreamConfig(
+            name="viguno",
+            base_urls=[settings.BACKEND_PREFIX_VIGUNO],
+            cacheable=True,
+            data_version="viguno",
+        ),
+        ProxyUpstreamConfig(name="nginx", base_urls=[settings.BACKEND_PREFIX_NGINX]),
+        ProxyUpstreamConfig(
+            name="dotty",
+            base_urls=[settings.BACKEND_PREFIX_DOTTY],
+            cacheable=True,
+            data_version="dotty",
+        ),
+        ProxyUpstreamConfig(
+            name="cada-prio",
+            base_urls=[settings.BACKEND_PREFIX_CADA_PRIO],
+            cacheable=True,
+            data_version="cada_prio",
+        ),
+        ProxyUpstreamConfig(
+            name="auto-acmg",
+            base_urls=[settings.BACKEND_PREFIX_AUTOACMG],
+            data_version="autoacmg",
+        ),
+    ]
+
+
+class Upstream:
+    """An upstream service compiled from its ``ProxyUpstreamConfig``."""
+
+    def __init__(self, config: ProxyUpstreamConfig):
+        if not config.base_urls:
+            raise ValueError(f"upstream {config.name} has no base URLs")
+        #: The configuration this upstream was compiled from.
+        self.config = config
+        #: Name of the upstream.
+        self.name = config.name
+        #: Base URLs without trailing slashes.
+        self.base_urls = tuple(url.rstrip("/") for url in config.base_urls)
+        #: Timeouts to use for requests.
+        self.timeout = proxy_timeout(config.timeout)
+        #: Whether responses may be cached.
+        self.cacheable = config.cacheable
+        #: Allowed HTTP methods (upper case).
+        self.methods = frozenset(method.upper() for method in config.methods)
+        #: Name of the entry in ``DATA_VERSIONS``, if any.
+        self.data_version = config.data_version
+        #: Index of the next base URL for round-robin distribution.
+        self._next = 0
+
+    def base_url(self) -> str:
+        """Return the base URL for the next request."""
+        if len(self.base_urls) == 1:
+            return self.base_urls[0]
+        base_url = self.base_urls[self._next]
+        self._next = (self._next + 1) % len(self.base_urls)
+        return base_url
+
+
+class UpstreamRegistry:
+    """Lookup table from the first path segment below ``/internal/proxy`` to the upstream."""
+
+    def __init__(self, configs: Iterable[ProxyUpstreamConfig] = ()):
+        #: The upstreams, by name.
+        self.upstreams: dict[str, Upstream] = {}
+        for config in configs:
+            self.upstreams[config.name] = Upstream(config)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "UpstreamRegistry":
+        """Build the registry from the built-in upstreams and ``PROXY_UPSTREAMS``.
+
+        Entries in ``PROXY_UPSTREAMS`` override built-in upstreams of the same name.
+        """
+        return cls([*builtin_upstreams(settings), *settings.PROXY_UPSTREAMS])
+
+    def resolve(self, path: str) -> tuple[Upstream, str] | None:
+        """Resolve a path below ``/internal/proxy/`` to its upstream and the remaining path.
+
+        :param path: path without the ``/internal/proxy/`` prefix, e.g., ``annonars/genes/info``
+        :return: tuple of upstream and remaining path (``"/genes/info"``), ``None`` if not found
+        """
+        name, sep, rest = path.partition("/")
+        upstream = self.upstreams.get(name)
+        if upstream is None:
+            return None
+        return upstream, sep + rest
+
+
+upstream_registry = UpstreamRegistry.from_settings(settings)
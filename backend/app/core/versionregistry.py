@@ -0,0 +1,237 @@
+"""Registry of the data versions actually served by the upstream services.
+
+``DATA_VERSIONS`` starts with the built-in versions.  ``DataVersionRegistry``
+probes the version endpoints of the upstreams (``DATA_VERSION_PROBES``)
+concurrently on startup and every ``DATA_VERSION_REFRESH_INTERVAL`` seconds,
+moves the dated entries to the current date and updates ``DATA_VERSIONS`` in
+place, so that the cache keys and ETags derived from it follow the deployed data.
+
+``/internal/data-versions`` is served from the JSON serialized on each change.
+Changes are published through Redis so that the other processes apply them
+without waiting for their next probe; each process then calls its listeners,
+by default ``invalidate_caches()``.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Coroutine, Iterable
+
+import redis.asyncio
+
+from app.core.cache import response_cache
+from app.core.config import DataVersionProbe, settings
+from app.core.dataversions import DATA_VERSIONS, DATED_ENTRIES, DataVersions, today
+from app.core.upstreams import upstream_clients, upstream_registry
+
+logger = logging.getLogger(__name__)
+
+#: Redis channel the changed versions are published to.
+REDIS_CHANNEL = "reev:data-versions"
+
+#: Seconds to wait before subscribing again after Redis failed.
+REDIS_BACKOFF_SECONDS = 30.0
+
+#: Called with the names of the changed entries.
+Listener = Callable[[set[str]], Awaitable[None]]
+
+
+def extract_version(body: bytes, field: str | None) -> str:
+    """Return the version at the dot-separated ``field`` of the JSON ``body``.
+
+    If ``field`` is not set, the whole body is the version.
+
+    :raises ValueError: if the body is not JSON or has no string or number at ``field``
+    """
+    if field is None:
+        version = body.decode().strip()
+    else:
+        value = json.loads(body)
+        for key in field.split("."):
+            if not isinstance(value, dict) or key not in value:
+                raise ValueError(f"no {field} in the response")
+            value = value[key]
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f"{field} is not a version: {value!r}")
+        version = str(value)
+    if not version:
+        raise ValueError("empty version")
+    return version
+
+
+async def invalidate_caches(changed: set[str]):
+    """Drop the cached responses after a data version changed.
+
+    The keys of the response cache include the data versions, so entries of the
+    old versions are not hit anymore; the in-process tier is cleared to free
+    their memory instead of waiting for their eviction.
+    """
+    _ = changed
+    response_cache.memory.clear()
+
+
+class DataVersionRegistry:
+    """The current data versions, kept up to date by probing the upstreams."""
+
+    def __init__(
+        self,
+        versions: DataVersions = DATA_VERSIONS,
+        listeners: Iterable[Listener] = (invalidate_caches,),
+    ):
+        #: The current versions, updated in place.
+        self.versions = versions
+        #: Called with the names of the changed entries after each change.
+        self.listeners = list(listeners)
+        #: JSON of the current versions, served by ``/internal/data-versions``.
+        self.body = b""
+        #: Identifies the messages published by this process.
+        self.origin = uuid.uuid4().hex
+        #: Redis client, if enabled.
+        self.redis: redis.asyncio.Redis | None = None
+        #: Background tasks for refreshing and subscribing.
+        self.tasks: set[asyncio.Task[None]] = set()
+        #: Error of the last probe, by entry whose probe failed.
+        self.errors: dict[str, str] = {}
+        self.render()
+
+    def render(self):
+        self.body = self.versions.model_dump_json().encode()
+
+    async def start(self):
+        """Probe the versions, then keep them up to date in the background."""
+        if settings.DATA_VERSION_REDIS:
+            self.redis = redis.asyncio.from_url(settings.REDIS_URL)
+            self._spawn(self._subscribe())
+        await self.refresh()
+        if settings.DATA_VERSION_REFRESH_INTERVAL > 0:
+            self._spawn(self._refresh_periodically())
+
+    async def stop(self):
+        tasks, self.tasks = self.tasks, set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    def _spawn(self, coro: Coroutine[None, None, None]):
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def probe(self, probe: DataVersionProbe) -> str:
+        """Return the version reported by the version endpoint of an upstream.
+
+        :raises ValueError: if the upstream is unknown or its response has no version
+        :raises httpx.HTTPError: if the request failed
+        """
+        upstream = upstream_registry.upstreams.get(probe.upstream)
+        if upstream is None:
+            raise ValueError(f"unknown upstream {probe.upstream}")
+        response = await upstream_clients(upstream.name).get(
+            upstream.base_url() + probe.path, timeout=settings.DATA_VERSION_PROBE_TIMEOUT
+        )
+        response.raise_for_status()
+        return extract_version(response.content, probe.field)
+
+    async def refresh(self) -> set[str]:
+        """Probe all upstreams concurrently and apply and publish the changed versions.
+
+        Entries whose probe failed keep their version.
+
+        :return: names of the changed entries
+        """
+        probes = settings.DATA_VERSION_PROBES
+        results = await asyncio.gather(
+            *(self.probe(probe) for probe in probes.values()), return_exceptions=True
+        )
+        values = {name: today() for name in DATED_ENTRIES}
+        for name, result in zip(probes, results):
+            if isinstance(result, str):
+                values[name] = result
+                self.errors.pop(name, None)
+            else:
+                self.errors[name] = repr(result)
+                logger.warning("Probing the data version %s failed: %r", name, result)
+        changed = await self.apply(values)
+        if changed:
+            await self.publish(changed)
+        return changed
+
+    async def apply(self, values: dict[str, str]) -> set[str]:
+        """Update the versions and call the listeners if any changed.
+
+        :return: names of the changed entries
+        """
+        changed = set()
+        for name, value in values.items():
+            if name not in DataVersions.model_fields:
+                logger.warning("Ignoring unknown data version %s", name)
+            elif getattr(self.versions, name) != value:
+                setattr(self.versions, name, value)
+                changed.add(name)
+        if changed:
+            logger.info(
+                "Data versions changed: %s",
+                ", ".join(f"{name}={values[name]}" for name in sorted(changed)),
+            )
+            self.render()
+            for listener in self.listeners:
+                await listener(changed)
+        return changed
+
+    async def publish(self, changed: set[str]):
+        """Publish the changed versions to the other processes."""
+        if self.redis is None:
+            return
+        message = {
+            "origin": self.origin,
+            "versions": {name: getattr(self.versions, name) for name in sorted(changed)},
+        }
+        try:
+            await self.redis.publish(REDIS_CHANNEL, json.dumps(message))
+        except (redis.RedisError, OSError) as e:
+            logger.warning("Cannot publish the changed data versions: %s", e)
+
+    async def handle_message(self, data: bytes | str) -> set[str]:
+        """Apply the versions published by another process.
+
+        :return: names of the changed entries
+        """
+        try:
+            message = json.loads(data)
+            origin, versions = message["origin"], message["versions"]
+            values = {str(name): str(value) for name, value in versions.items()}
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning("Ignoring invalid data version message: %s", e)
+            return set()
+        if origin == self.origin:
+            return set()
+        return await self.apply(values)
+
+    async def _subscribe(self):
+        assert self.redis is not None
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(REDIS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self.handle_message(message["data"])
+            except (redis.RedisError, OSError) as e:
+                logger.warning("Cannot subscribe to the data version changes: %s", e)
+            await asyncio.sleep(REDIS_BACKOFF_SECONDS)
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(settings.DATA_VERSION_REFRESH_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Refreshing the data versions failed")
+
+
+#: The data versions of the upstream services.
+data_version_registry = DataVersionRegistry()
@@ -1,5 +1,6 @@
-from typing import Any, Sequence
+from typing import Any, Sequence, Tuple
 
+from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -9,10 +10,16 @@ from app.schemas.acmgseqvar import AcmgSeqVarCreate, AcmgSeqVarUpdate
 
 
 class CrudAcmgSeqVar(CrudBase[AcmgSeqVar, AcmgSeqVarCreate, AcmgSeqVarUpdate]):
+    def query_by_user(self, *, user_id: Any) -> Select[Tuple[AcmgSeqVar]]:
+        """Return query filtered by user (ordered by variant, as in ``uq_acmgseqvar``)."""
+        return (
+            select(self.model).filter(self.model.user == user_id).order_by(self.model.seqvar_name)
+        )
+
     async def get_multi_by_user(
         self, session: AsyncSession, *, skip: int = 0, limit: int = 100, user_id: Any
     ) -> Sequence[AcmgSeqVar]:
-        query = select(self.model).filter(self.model.user == user_id).offset(skip).limit(limit)
+        query = self.query_by_user(user_id=user_id).offset(skip).limit(limit)
         result = await session.execute(query)
         all_scalars: Sequence[AcmgSeqVar] = result.scalars().all()  # type: ignore[assignment]
         return all_scalars
@@ -1,10 +1,12 @@
-from typing import Any, Generic, Type, TypeVar
+from typing import Any, Generic, Mapping, Sequence, Tuple, Type, TypeVar
 
 from pydantic import BaseModel
+from sqlalchemy import Select, UniqueConstraint, delete, insert, inspect, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.models.utils.helpers import ModelType, sa_model_to_dict
+from app.models.utils.helpers import ModelType
 
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
@@ -21,39 +23,99 @@ class CrudBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         * `schema`: A Pydantic model (schema) class
         """
         self.model = model
+        #: Names of the mapped columns, the fields that ``update`` sets.
+        self.columns = frozenset(inspect(model).column_attrs.keys())
+
+    def unique_columns(self) -> list[str]:
+        """Return the columns of the unique constraint of the table, e.g., for ``upsert``.
+
+        :raises ValueError: if the table does not have exactly one unique constraint
+        """
+        constraints = [
+            c for c in self.model.__table__.constraints if isinstance(c, UniqueConstraint)
+        ]
+        if len(constraints) != 1:
+            raise ValueError(
+                f"{self.model.__tablename__} has {len(constraints)} unique constraints"
+            )
+        return [column.name for column in constraints[0].columns]
 
     async def get(self, session: AsyncSession, id: Any) -> ModelType | None:
         query = select(self.model).filter(self.model.id == id)
         result = await session.execute(query)
         return result.scalars().first()
 
+    def query_multi(self) -> Select[Tuple[ModelType]]:
+        """Return query of all rows (ordered by ID).
+
+        The order is unique, so the query can also be paginated with a keyset cursor,
+        e.g., by ``fastapi_pagination.ext.sqlalchemy.paginate()`` for a ``CursorPage``,
+        which stays fast at any depth unlike ``offset()``.
+        """
+        return select(self.model).order_by(self.model.id)
+
     async def get_multi(
         self, session: AsyncSession, *, skip: int = 0, limit: int = 100
     ) -> list[ModelType]:
-        query = select(self.model).offset(skip).limit(limit)
+        query = self.query_multi().offset(skip).limit(limit)
         result = await session.execute(query)
         all_scalars: list[ModelType] = result.scalars().all()  # type: ignore[assignment]
         return all_scalars
 
-    async def create(self, session: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+    async def create(
+        self, session: AsyncSession, *, obj_in: CreateSchemaType, returning: bool = False
+    ) -> ModelType:
+        """Insert a row.
+
+        With ``returning``, the row is read back with ``INSERT ... RETURNING`` instead
+        of a ``SELECT`` after the commit, saving a round trip.
+        """
         obj_in_data = obj_in.model_dump()
+        if returning:
+            result = await session.scalars(insert(self.model).returning(self.model), [obj_in_data])
+            db_obj = result.one()
+            await session.commit()
+            return db_obj
         db_obj = self.model(**obj_in_data)
         session.add(db_obj)
         await session.commit()
         await session.refresh(db_obj)
         return db_obj
 
-    async def update(
-        self, session: AsyncSession, *, db_obj: ModelType, obj_in: UpdateSchemaType | dict[str, Any]
-    ) -> ModelType:
-        obj_data = sa_model_to_dict(db_obj)
+    def _update_data(self, obj_in: UpdateSchemaType | dict[str, Any]) -> dict[str, Any]:
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.model_dump(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        return {field: value for field, value in update_data.items() if field in self.columns}
+
+    async def update(
+        self,
+        session: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: UpdateSchemaType | dict[str, Any],
+        returning: bool = False,
+    ) -> ModelType:
+        """Update the fields of ``db_obj`` that are set in ``obj_in``.
+
+        With ``returning``, the row is read back with ``UPDATE ... RETURNING`` instead
+        of a ``SELECT`` after the commit, saving a round trip.
+        """
+        update_data = self._update_data(obj_in)
+        if returning and update_data:
+            query = (
+                update(self.model)
+                .where(self.model.id == db_obj.id)
+                .values(**update_data)
+                .returning(self.model)
+                .execution_options(populate_existing=True)
+            )
+            db_obj = (await session.scalars(query)).one()
+            await session.commit()
+            return db_obj
+        for field, value in update_data.items():
+            setattr(db_obj, field, value)
         session.add(db_obj)
         await session.commit()
         await session.refresh(db_obj)
@@ -65,3 +127,118 @@ class CrudBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             await session.delete(obj)
             await session.commit()
         return obj
+
+    async def bulk_create(
+        self, session: AsyncSession, *, objs_in: Sequence[CreateSchemaType], commit: bool = True
+    ) -> list[ModelType]:
+        """Insert rows with one batched ``INSERT ... RETURNING`` in one transaction.
+
+        :param commit: whether to commit, otherwise the caller commits the transaction
+        :return: the inserted rows, in the order of ``objs_in``
+        """
+        if not objs_in:
+            return []
+        query = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        result = await session.scalars(query, [obj_in.model_dump() for obj_in in objs_in])
+        db_objs = list(result.all())
+        if commit:
+            await session.commit()
+        return db_objs
+
+    async def bulk_update(
+        self,
+        session: AsyncSession,
+        *,
+        objs_in: Mapping[Any, UpdateSchemaType | dict[str, Any]],
+        commit: bool = True,
+    ):
+        """Update rows by primary key in one transaction.
+
+        Updates setting the same fields are sent as one ``executemany``.  Rows loaded
+        in ``session`` are not refreshed.
+
+        :param objs_in: the updates, by ID of the row
+        :param commit: whether to commit, otherwise the caller commits the transaction
+        """
+        params = []
+        for id, obj_in in objs_in.items():
+            update_data = self._update_data(obj_in)
+            if update_data:
+                params.append({**update_data, "id": id})
+        if params:
+            await session.execute(
+                update(self.model).execution_options(synchronize_session=False), params
+            )
+        if commit:
+            await session.commit()
+
+    async def bulk_remove(
+        self, session: AsyncSession, *, ids: Sequence[Any], commit: bool = True
+    ) -> int:
+        """Delete rows with one ``DELETE``.
+
+        :param commit: whether to commit, otherwise the caller commits the transaction
+        :return: number of deleted rows
+        """
+        if not ids:
+            return 0
+        query = (
+            delete(self.model)
+            .where(self.model.id.in_(ids))
+            .execution_options(synchronize_session="fetch")
+        )
+        result = await session.execute(query)
+        if commit:
+            await session.commit()
+        return result.rowcount  # type: ignore[attr-defined]
+
+    async def upsert(
+        self,
+        session: AsyncSession,
+        *,
+        obj_in: CreateSchemaType,
+        index_elements: Sequence[str] | None = None,
+        commit: bool = True,
+    ) -> ModelType:
+        """Insert a row or update the row with the same values in ``index_elements``.
+
+        On PostgreSQL and SQLite, this is one ``INSERT ... ON CONFLICT DO UPDATE ...
+        RETURNING``; on other databases, the row is looked up first.
+
+        :param index_elements: columns of the unique constraint to match on, defaults
+            to ``unique_columns()``
+        :param commit: whether to commit, otherwise the caller commits the transaction
+        :return: the inserted or updated row, with the ID of the existing row on update
+        """
+        keys = list(index_elements or self.unique_columns())
+        obj_in_data = obj_in.model_dump()
+        changes = {k: v for k, v in obj_in_data.items() if k not in keys and k != "id"}
+        dialect = session.bind.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = dialect_insert(self.model).values(**obj_in_data)
+            if changes:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=keys, set_={k: stmt.excluded[k] for k in changes}
+                )
+            else:
+                # ``DO NOTHING`` would return no row, so "update" one of the keys.
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=keys, set_={keys[0]: stmt.excluded[keys[0]]}
+                )
+            query = stmt.returning(self.model).execution_options(populate_existing=True)
+            db_obj = (await session.scalars(query)).one()
+        else:
+            lookup = select(self.model).filter_by(**{k: obj_in_data[k] for k in keys})
+            existing = (await session.scalars(lookup)).first()
+            if existing is None:
+                db_obj = self.model(**obj_in_data)
+                session.add(db_obj)
+            else:
+                db_obj = existing
+                for field, value in changes.items():
+                    setattr(db_obj, field, value)
+            await session.flush()
+        if commit:
+            await session.commit()
+        return db_obj
@@ -1,18 +1,36 @@
-from typing import Any, Sequence
+from typing import Any, Iterable, Sequence, Tuple
 
+import sqlakeyset
+from sqlalchemy import Select, delete, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.crud.base import CrudBase
 from app.models.bookmark import Bookmark
-from app.schemas.bookmark import BookmarkCreate, BookmarkUpdate
+from app.schemas.bookmark import BookmarkCreate, BookmarkTypes, BookmarkUpdate
+
+#: Key of a bookmark of a user, ``(obj_type, obj_id)``.
+ObjKey = tuple[Any, Any]
+
+# Allow the object types in the keyset cursors of ``query_by_user()``.
+sqlakeyset.custom_bookmark_type(BookmarkTypes, "bookmarktype", serializer=lambda value: value.value)
 
 
 class CrudBookmark(CrudBase[Bookmark, BookmarkCreate, BookmarkUpdate]):
+    def query_by_user(self, *, user_id: Any) -> Select[Tuple[Bookmark]]:
+        """Return query filtered by user (ordered by object, as in ``uq_bookmark``)."""
+        columns = self.model.__table__.c
+        return (
+            select(self.model)
+            .filter(columns.user == user_id)
+            .order_by(columns.obj_type, columns.obj_id)
+        )
+
     async def get_multi_by_user(
         self, session: AsyncSession, *, user_id: Any, skip: int = 0, limit: int = 100
     ) -> Sequence[Bookmark]:
-        query = select(self.model).filter(self.model.user == user_id).offset(skip).limit(limit)
+        query = self.query_by_user(user_id=user_id).offset(skip).limit(limit)
         result = await session.execute(query)
         return result.scalars().all()
 
@@ -24,3 +42,81 @@ class CrudBookmark(CrudBase[Bookmark, BookmarkCreate, BookmarkUpdate]):
         )
         result = await session.execute(query)
         return result.scalars().first()
+
+    def _filter_by_user_and_objs(self, user_id: Any, objs: Sequence[ObjKey]):
+        columns = self.model.__table__.c
+        return (columns.user == user_id, tuple_(columns.obj_type, columns.obj_id).in_(objs))
+
+    async def get_multi_by_user_and_objs(
+        self, session: AsyncSession, *, user_id: Any, objs: Iterable[ObjKey]
+    ) -> Sequence[Bookmark]:
+        """Return the bookmarks of ``user_id`` on any of ``objs`` with one query.
+
+        :param objs: ``(obj_type, obj_id)`` of the bookmarks
+        :return: the existing bookmarks, in no particular order
+        """
+        objs = list(dict.fromkeys(objs))
+        if not objs:
+            return []
+        query = select(self.model).filter(*self._filter_by_user_and_objs(user_id, objs))
+        result = await session.execute(query)
+        return result.scalars().all()
+
+    async def bulk_create_for_user(
+        self, session: AsyncSession, *, user_id: Any, objs_in: Sequence[BookmarkCreate]
+    ) -> list[Bookmark]:
+        """Bookmark ``objs_in`` for ``user_id`` in one transaction.
+
+        Objects that are bookmarked already are kept.  If a concurrent request created
+        one of the bookmarks in between, ``uq_bookmark`` rejects the insert and the
+        bookmarks are looked up again.
+
+        :return: the bookmarks of all ``objs_in``, in their order and without duplicates
+        """
+        keys = list(dict.fromkeys((obj_in.obj_type, obj_in.obj_id) for obj_in in objs_in))
+        for attempt in range(2):
+            existing = {
+                (db_obj.obj_type, db_obj.obj_id): db_obj
+                for db_obj in await self.get_multi_by_user_and_objs(
+                    session, user_id=user_id, objs=keys
+                )
+            }
+            missing = [
+                BookmarkCreate(user=user_id, obj_type=obj_type, obj_id=obj_id)
+                for obj_type, obj_id in keys
+                if (obj_type, obj_id) not in existing
+            ]
+            try:
+                created = await self.bulk_create(session, objs_in=missing, commit=False)
+            except IntegrityError:
+                await session.rollback()
+                if attempt:
+                    raise
+                continue
+            await session.commit()
+            break
+        for db_obj in created:
+            existing[(db_obj.obj_type, db_obj.obj_id)] = db_obj
+        return [existing[key] for key in keys]
+
+    async def bulk_remove_for_user(
+        self, session: AsyncSession, *, user_id: Any, objs: Iterable[ObjKey]
+    ) -> Sequence[Bookmark]:
+        """Delete the bookmarks of ``user_id`` on any of ``objs`` with one ``DELETE``.
+
+        :param objs: ``(obj_type, obj_id)`` of the bookmarks
+        :return: the deleted bookmarks, in no particular order
+        """
+        objs = list(dict.fromkeys(objs))
+        if not objs:
+            return []
+        query = (
+            delete(self.model)
+            .where(*self._filter_by_user_and_objs(user_id, objs))
+            .returning(self.model)
+            .execution_options(synchronize_session="fetch")
+        )
+        result = await session.scalars(query)
+        db_objs = result.all()
+        await session.commit()
+        return db_objs
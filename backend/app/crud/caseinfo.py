@@ -1,5 +1,6 @@
-from typing import Any, Sequence
+from typing import Any, Sequence, Tuple
 
+from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -9,8 +10,12 @@ from app.schemas.caseinfo import CaseInfoCreate, CaseInfoUpdate
 
 
 class CrudCaseInfo(CrudBase[CaseInfo, CaseInfoCreate, CaseInfoUpdate]):
+    def query_by_user(self, *, user_id: Any) -> Select[Tuple[CaseInfo]]:
+        """Return query filtered by user (ordered by pseudonym, as in ``uq_caseinfo``)."""
+        return select(self.model).filter(self.model.user == user_id).order_by(self.model.pseudonym)
+
     async def get_multi_by_user(self, session: AsyncSession, *, user_id: Any) -> Sequence[CaseInfo]:
-        query = select(self.model).filter(self.model.user == user_id)
+        query = self.query_by_user(user_id=user_id)
         result = await session.execute(query)
         return result.scalars().all()
 
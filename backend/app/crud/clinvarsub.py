@@ -32,7 +32,8 @@ class CrudClinvarSubmittingOrg(CrudBase[SubmittingOrg, SubmittingOrgCreate, Subm
         session: AsyncSession,
         *,
         db_obj: SubmittingOrg,
-        obj_in: SubmittingOrgUpdate | dict[str, Any]
+        obj_in: SubmittingOrgUpdate | dict[str, Any],
+        returning: bool = False
     ) -> SubmittingOrg:
         """Override to prevent updating token if not set."""
         if isinstance(obj_in, dict):
@@ -41,7 +42,7 @@ class CrudClinvarSubmittingOrg(CrudBase[SubmittingOrg, SubmittingOrgCreate, Subm
             update_data = obj_in.model_dump(exclude_unset=True)
         if "token" in update_data and not update_data.get("token"):
             update_data.pop("token")
-        return await super().update(session, db_obj=db_obj, obj_in=update_data)
+        return await super().update(session, db_obj=db_obj, obj_in=update_data, returning=returning)
 
 
 class CrudSubmissionThread(
@@ -12,8 +12,16 @@ from starlette.responses import FileResponse
 
 from app.api.api_v1.api import api_router as api_v1_router
 from app.api.internal.api import api_router as internal_router
-from app.api.internal.endpoints.remote import httpx_client_wrapper
+from app.api.internal.endpoints.remote import autocnv_jobs, httpx_client_wrapper
+from app.core.cache import response_cache
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.diskcache import remote_cache
+from app.core.metrics import event_loop_monitor, instrument_engine
+from app.core.ratelimit import rate_limiter
+from app.core.resilience import UpstreamUnavailable, upstream_unavailable_handler
+from app.core.upstreams import upstream_clients
+from app.core.versionregistry import data_version_registry
 from app.db.init_db import create_superuser
 from app.db.session import engine
 
@@ -35,11 +43,28 @@ if settings.SENTRY_DSN:  # pragma: no cover
         traces_sample_rate=1.0,
     )
 
+if settings.METRICS_DB_ENABLED:
+    instrument_engine(engine.sync_engine)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     httpx_client_wrapper.start()
+    upstream_clients.start()
+    response_cache.start()
+    remote_cache.start()
+    rate_limiter.start()
+    autocnv_jobs.start()
+    await data_version_registry.start()
+    event_loop_monitor.start()
     yield
+    await event_loop_monitor.stop()
+    await data_version_registry.stop()
+    await autocnv_jobs.stop()
+    await rate_limiter.stop()
+    remote_cache.stop()
+    await response_cache.stop()
+    await upstream_clients.stop()
     await httpx_client_wrapper.stop()
     await engine.dispose()
 
@@ -69,6 +94,17 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Fail fast with 503 when upstream services are overloaded or failing
+app.add_exception_handler(UpstreamUnavailable, upstream_unavailable_handler)
+
+# Compress API responses and passed-through upstream responses
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        path_prefixes=[settings.API_V1_STR, settings.INTERNAL_STR],
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    )
+
 # Add internal API to router but excluded from docs
 app.include_router(internal_router, prefix=settings.INTERNAL_STR, include_in_schema=settings.DEBUG)
 # Add V1 API to router
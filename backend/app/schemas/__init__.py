@@ -1,6 +1,16 @@
 from app.schemas.acmgseqvar import AcmgSeqVarCreate, AcmgSeqVarRead, AcmgSeqVarUpdate  # noqa
 from app.schemas.adminmsg import AdminMessageCreate, AdminMessageRead, AdminMessageUpdate  # noqa
-from app.schemas.bookmark import BookmarkCreate, BookmarkRead, BookmarkUpdate  # noqa
+from app.schemas.aggregate import (  # noqa
+    AggregateSection,
+    GeneAggregateSection,
+    VariantAggregate,
+)
+from app.schemas.bookmark import (  # noqa
+    BookmarkBatch,
+    BookmarkCreate,
+    BookmarkRead,
+    BookmarkUpdate,
+)
 from app.schemas.caseinfo import CaseInfoCreate, CaseInfoRead, CaseInfoUpdate  # noqa
 from app.schemas.clinvarsub import (  # noqa
     SubmissionActivityCreate,
@@ -22,4 +32,13 @@ from app.schemas.clinvarsub import (  # noqa
 )
 from app.schemas.common import RE_HGNCID, RE_SEQVAR, RE_STRUCVAR  # noqa
 from app.schemas.msg import Msg  # noqa
+from app.schemas.proxy import BatchRequest, BatchResult, BatchSubRequest  # noqa
+from app.schemas.remote import (  # noqa
+    AcmgBatchRequest,
+    AcmgBatchResult,
+    AcmgBatchVariant,
+    AutoCnvJob,
+    AutoCnvJobCreate,
+    AutoCnvJobStatus,
+)
 from app.schemas.user import UserCreate, UserRead, UserUpdate  # noqa
@@ -0,0 +1,30 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class AggregateSection(BaseModel):
+    """One section of an aggregated document, the result of one upstream call."""
+
+    #: HTTP status code of the upstream response (or of the error).
+    status: int
+    #: Parsed JSON body or the body as text, ``None`` on errors.
+    data: Any | None = None
+    #: Description of the error if the section could not be retrieved.
+    error: str | None = None
+
+
+class VariantAggregate(BaseModel):
+    """Data shown on the page of a sequence or structural variant."""
+
+    #: The variant name, e.g., ``grch37-1-55516888-G-GA``.
+    name: str
+    #: The sections by name.
+    sections: dict[str, AggregateSection]
+
+
+class GeneAggregateSection(AggregateSection):
+    """One section of the gene aggregate, as sent in one NDJSON line."""
+
+    #: Name of the section.
+    section: str
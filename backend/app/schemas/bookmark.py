@@ -2,8 +2,9 @@ import re
 from enum import Enum
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
+from app.core.config import settings
 from app.schemas import common
 from app.schemas.common import BookmarkableId
 
@@ -52,3 +53,9 @@ class BookmarkRead(BookmarkInDbBase):
 
 class BookmarkInDb(BookmarkInDbBase):
     pass
+
+
+class BookmarkBatch(BaseModel):
+    """Bookmarks of the current user to look up, create or delete at once."""
+
+    bookmarks: list[BookmarkCreate] = Field(max_length=settings.BOOKMARKS_BATCH_MAX_ITEMS)
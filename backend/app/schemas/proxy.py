@@ -0,0 +1,37 @@
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+
+
+class BatchSubRequest(BaseModel):
+    """One request to an upstream behind ``/internal/proxy``."""
+
+    #: Identifier chosen by the client to match the result, defaults to the index.
+    id: str | None = None
+    #: HTTP method.
+    method: Literal["GET", "POST"] = "GET"
+    #: Path below ``/internal/proxy/``, starting with the upstream name, may include a query.
+    path: str = Field(min_length=1)
+    #: JSON body for POST requests.
+    body: Any | None = None
+
+
+class BatchRequest(BaseModel):
+    """Sub-requests to execute concurrently."""
+
+    requests: list[BatchSubRequest] = Field(max_length=settings.PROXY_BATCH_MAX_ITEMS)
+
+
+class BatchResult(BaseModel):
+    """Result of one sub-request, as sent in one NDJSON line."""
+
+    #: Identifier of the sub-request.
+    id: str
+    #: HTTP status code of the upstream response (or of the proxy error).
+    status: int
+    #: Content type of the upstream response.
+    content_type: str | None = None
+    #: Parsed JSON body or the body as text.
+    body: Any | None = None
@@ -0,0 +1,79 @@
+from enum import Enum
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+
+
+class AcmgBatchVariant(BaseModel):
+    """One sequence variant to classify with WinterVar."""
+
+    #: Identifier chosen by the client to match the result, defaults to the index.
+    id: str | None = None
+    #: Chromosome name, e.g., ``1`` or ``X``.
+    chromosome: str = Field(min_length=1)
+    #: 1-based position.
+    position: int = Field(ge=1)
+    #: Reference allele.
+    reference: str = Field(min_length=1)
+    #: Alternative allele.
+    alternative: str = Field(min_length=1)
+    #: Genome release.
+    release: Literal["hg19", "hg38"] = "hg19"
+
+
+class AcmgBatchRequest(BaseModel):
+    """Sequence variants to classify."""
+
+    variants: list[AcmgBatchVariant] = Field(max_length=settings.REMOTE_ACMG_BATCH_MAX_ITEMS)
+
+
+class AcmgBatchResult(BaseModel):
+    """ACMG rating of one variant, as sent in one NDJSON line."""
+
+    #: Identifier of the variant.
+    id: str
+    #: HTTP status code of the WinterVar response (or of the error).
+    status: int
+    #: The ACMG rating, see ``default_acmg_rating()``, if successful.
+    rating: dict[str, bool] | None = None
+    #: Error message otherwise.
+    error: str | None = None
+
+
+class AutoCnvJobCreate(BaseModel):
+    """A CNV to classify with AutoCNV."""
+
+    #: Chromosome name, e.g., ``1`` or ``X``.
+    chromosome: str = Field(min_length=1)
+    #: 1-based start position.
+    start: int = Field(ge=1)
+    #: 1-based end position.
+    end: int = Field(ge=1)
+    #: Type of the CNV as expected by AutoCNV, e.g., ``del`` or ``dup``.
+    func: str = Field(min_length=1)
+
+
+class AutoCnvJobStatus(str, Enum):
+    """Status of an AutoCNV job."""
+
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class AutoCnvJob(AutoCnvJobCreate):
+    """An AutoCNV classification job and its result."""
+
+    #: Job ID, derived from the CNV.
+    id: str
+    #: Status of the job.
+    status: AutoCnvJobStatus = AutoCnvJobStatus.pending
+    #: HTTP status code of the AutoCNV response, once available.
+    status_code: int | None = None
+    #: The AutoCNV result if the job is done.
+    result: Any | None = None
+    #: Error message if the job failed.
+    error: str | None = None
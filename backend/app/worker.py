@@ -98,6 +98,36 @@ def process_old_clinvarsub_jobs():
     logger.debug("process_old_clinvarsub_retrieval_jobs - END")
 
 
+@celery_app.task(acks_late=True)
+def run_autocnv_job(job_id: str):
+    """Classify the CNV of an AutoCNV job.
+
+    :param job_id: ID of the job, see ``app.autocnv.job_id``.
+    """
+    logger.debug("run_autocnv_job(%s) - START", job_id)
+
+    # We must import the handler locally here to prevent circular imports.
+    from app.autocnv import AutoCnvJobStore, run_job
+
+    async def inner():
+        """Inner async function with its own Redis client in the local event loop."""
+        store = AutoCnvJobStore()
+        store.start()
+        try:
+            await run_job(job_id, store)
+        except Exception as e:
+            # ``run_job`` has marked the job as failed; fail the Celery task as well.
+            logger.error("Caught exception of type %s: %s", type(e), e)
+            raise
+        finally:
+            await store.stop()
+
+    # Run the inner async function and block until this is done.
+    asyncio.run(inner())
+
+    logger.debug("run_autocnv_job(%s) - END", job_id)
+
+
 @celery_app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
     """Setup periodic tasks."""
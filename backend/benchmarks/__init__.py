@@ -0,0 +1,4 @@
+"""Benchmarks for the REEV backend.
+
+Run them from the ``backend`` directory, e.g., ``pipenv run python -m benchmarks.proxy_pool``.
+"""
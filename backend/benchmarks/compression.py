@@ -0,0 +1,110 @@
+"""Benchmark of bytes on the wire and CPU cost of the response compression.
+
+Sends synthetic JSON payloads resembling annonars gene info and ClinVar records
+through ``CompressionMiddleware`` with and without gzip and
+reports the size of the response body on the wire and the CPU time spent per
+request (compression in the server and decompression in the client).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.core.compression import ENCODINGS, CompressionMiddleware
+from app.core.config import settings
+
+
+def gene_info(rng: random.Random) -> bytes:
+    """Return a payload resembling an annonars gene info response."""
+    genes = {
+        f"HGNC:{i}": {
+            "hgnc": {"hgnc_id": f"HGNC:{i}", "symbol": f"GENE{i}", "locus_type": "gene"},
+            "ncbi": {
+                "summary": " ".join(
+                    rng.choice(("protein", "binding", "cell", "regulation", "DNA", "repair"))
+                    for _ in range(120)
+                )
+            },
+            "gnomad_constraints": {"pli": rng.random(), "oe_lof": rng.random()},
+        }
+        for i in range(50)
+    }
+    return json.dumps({"genes": genes}).encode()
+
+
+def clinvar_records(rng: random.Random) -> bytes:
+    """Return a payload resembling a list of ClinVar records."""
+    records = [
+        {
+            "accession": f"VCV{rng.randrange(10**9):09d}",
+            "clinical_significance": rng.choice(("Pathogenic", "Benign", "Uncertain significance")),
+            "review_status": "criteria provided, multiple submitters, no conflicts",
+            "conditions": [f"MONDO:{rng.randrange(10**7):07d}" for _ in range(3)],
+            "position": rng.randrange(10**8),
+        }
+        for _ in range(2000)
+    ]
+    return json.dumps(records).encode()
+
+
+def make_app(payloads: dict[str, bytes]) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware,
+        path_prefixes=["/"],
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    )
+
+    @app.get("/{name}")
+    async def payload(name: str):
+        return Response(payloads[name], media_type="application/json")
+
+    return app
+
+
+async def measure(app: FastAPI, name: str, encoding: str, number: int) -> dict[str, float]:
+    """Fetch payload ``name`` ``number`` times with ``encoding``."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://reev") as client:
+        start = time.process_time()
+        for _ in range(number):
+            response = await client.get(f"/{name}", headers={"accept-encoding": encoding})
+            assert len(response.content) > 0
+        cpu_seconds = time.process_time() - start
+    return {
+        "wire_bytes": int(response.headers["content-length"]),
+        "cpu_ms_per_request": cpu_seconds / number * 1e3,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    rng = random.Random(42)
+    payloads = {"small": b'{"status": "ok"}', "gene_info": gene_info(rng)}
+    payloads["clinvar"] = clinvar_records(rng)
+    app = make_app(payloads)
+    results = {}
+    for name, body in payloads.items():
+        for encoding in ["identity", *ENCODINGS]:
+            result = await measure(app, name, encoding, args.number)
+            result["ratio"] = result["wire_bytes"] / len(body)
+            results[f"{name}_{encoding}"] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
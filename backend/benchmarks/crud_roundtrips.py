@@ -0,0 +1,176 @@
+"""Benchmark of the database round trips of the CRUD operations.
+
+Writes bookmarks with the single-row operations of ``CrudBase`` (with a refresh
+or with ``RETURNING``), with the bulk operations and with ``upsert``, and looks
+them up one by one and in a batch, on a SQLite database in a temporary directory.  Reports the statements sent to the
+database (counted with the ``before_cursor_execute`` engine event, an
+``executemany`` counts once), the commits and the time, per row.
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import crud
+from app.db.base import Base
+from app.models.bookmark import Bookmark
+from app.schemas.bookmark import BookmarkCreate, BookmarkTypes
+
+
+class RoundTrips:
+    """Counts the statements and commits of an engine."""
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+    def statement(self, *args):
+        self.statements += 1
+
+    def commit(self, *args):
+        self.commits += 1
+
+
+def bookmarks(rows: int) -> list[BookmarkCreate]:
+    user = uuid.uuid4()
+    return [
+        BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=f"HGNC:{i}", user=user)
+        for i in range(rows)
+    ]
+
+
+async def create_each(session: AsyncSession, rows: int):
+    for obj_in in bookmarks(rows):
+        await crud.bookmark.create(session, obj_in=obj_in)
+
+
+async def create_each_returning(session: AsyncSession, rows: int):
+    for obj_in in bookmarks(rows):
+        await crud.bookmark.create(session, obj_in=obj_in, returning=True)
+
+
+async def bulk_create(session: AsyncSession, rows: int):
+    await crud.bookmark.bulk_create(session, objs_in=bookmarks(rows))
+
+
+async def update_each(session: AsyncSession, db_objs: list[Bookmark]):
+    for db_obj in db_objs:
+        await crud.bookmark.update(session, db_obj=db_obj, obj_in={"obj_id": f"{db_obj.obj_id}-"})
+
+
+async def bulk_update(session: AsyncSession, db_objs: list[Bookmark]):
+    updates = {db_obj.id: {"obj_id": f"{db_obj.obj_id}-"} for db_obj in db_objs}
+    await crud.bookmark.bulk_update(session, objs_in=updates)
+
+
+async def remove_each(session: AsyncSession, db_objs: list[Bookmark]):
+    for db_obj in db_objs:
+        await crud.bookmark.remove(session, id=db_obj.id)
+
+
+async def bulk_remove(session: AsyncSession, db_objs: list[Bookmark]):
+    await crud.bookmark.bulk_remove(session, ids=[db_obj.id for db_obj in db_objs])
+
+
+async def lookup_then_write(session: AsyncSession, objs_in: list[BookmarkCreate]):
+    for obj_in in objs_in:
+        db_obj = await crud.bookmark.get_by_user_and_obj(
+            session, user_id=obj_in.user, obj_type=obj_in.obj_type, obj_id=obj_in.obj_id
+        )
+        if db_obj is None:
+            await crud.bookmark.create(session, obj_in=obj_in)
+        else:
+            await crud.bookmark.update(session, db_obj=db_obj, obj_in=obj_in.model_dump())
+
+
+async def upsert(session: AsyncSession, objs_in: list[BookmarkCreate]):
+    for obj_in in objs_in:
+        await crud.bookmark.upsert(session, obj_in=obj_in)
+
+
+async def get_each(session: AsyncSession, db_objs: list[Bookmark]):
+    for db_obj in db_objs:
+        await crud.bookmark.get_by_user_and_obj(
+            session, user_id=db_obj.user, obj_type=db_obj.obj_type, obj_id=db_obj.obj_id
+        )
+
+
+async def get_batch(session: AsyncSession, db_objs: list[Bookmark]):
+    await crud.bookmark.get_multi_by_user_and_objs(
+        session,
+        user_id=db_objs[0].user,
+        objs=[(db_obj.obj_type, db_obj.obj_id) for db_obj in db_objs],
+    )
+
+
+async def main_async(rows: int) -> dict[str, dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmpdir}/db.sqlite3")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_local = async_sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+        )
+        trips = RoundTrips()
+        event.listen(engine.sync_engine, "before_cursor_execute", trips.statement)
+        event.listen(engine.sync_engine, "commit", trips.commit)
+        results = {}
+
+        async def measure(name: str, operation: Callable[[AsyncSession], Awaitable[None]]):
+            async with session_local() as session:
+                statements, commits = trips.statements, trips.commits
+                start = time.perf_counter()
+                await operation(session)
+                elapsed = time.perf_counter() - start
+            results[name] = {
+                "statements_per_row": (trips.statements - statements) / rows,
+                "commits_per_row": (trips.commits - commits) / rows,
+                "ms_per_row": elapsed / rows * 1e3,
+            }
+
+        async def created() -> list[Bookmark]:
+            async with session_local() as session:
+                return await crud.bookmark.bulk_create(session, objs_in=bookmarks(rows))
+
+        try:
+            await measure("create", lambda session: create_each(session, rows))
+            await measure("create_returning", lambda session: create_each_returning(session, rows))
+            await measure("bulk_create", lambda session: bulk_create(session, rows))
+            db_objs = await created()
+            await measure("update", lambda session: update_each(session, db_objs))
+            await measure("bulk_update", lambda session: bulk_update(session, db_objs))
+            await measure("get_each", lambda session: get_each(session, db_objs))
+            await measure("get_batch", lambda session: get_batch(session, db_objs))
+            await measure("remove", lambda session: remove_each(session, db_objs))
+            db_objs = await created()
+            await measure("bulk_remove", lambda session: bulk_remove(session, db_objs))
+            # Half of the rows exist, half are new.
+            objs_in = bookmarks(rows)
+            async with session_local() as session:
+                await crud.bookmark.bulk_create(session, objs_in=objs_in[: rows // 2])
+            await measure("lookup_then_write", lambda session: lookup_then_write(session, objs_in))
+            objs_in = bookmarks(rows)
+            async with session_local() as session:
+                await crud.bookmark.bulk_create(session, objs_in=objs_in[: rows // 2])
+            await measure("upsert", lambda session: upsert(session, objs_in))
+        finally:
+            await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args.rows)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
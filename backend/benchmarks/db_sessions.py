@@ -0,0 +1,150 @@
+"""Benchmark of the database connections used per authenticated request.
+
+Sends concurrent requests to an endpoint that looks up the user through the
+user database of fastapi-users (as ``current_active_user`` does) and lists
+bookmarks through ``deps.get_db``, on a SQLite database in a temporary
+directory.  The "shared" mode uses the request-scoped session for both, the
+"separate" mode emulates the previous behaviour of a second session for the
+user lookup.  Reports the pool checkouts per request (from the
+``reev_db_pool_checkouts_total`` metric), the peak number of checked-out
+connections and the requests per second.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+import uuid
+from typing import AsyncGenerator
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app import crud
+from app.api import deps
+from app.core.auth import get_user_db
+from app.core.metrics import instrument_engine, registry
+from app.db import session
+from app.db.base import Base
+from app.models.user import OAuthAccount, User
+
+
+class PoolPeak:
+    """Tracks the peak number of connections checked out of a pool."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.current = 0
+        self.peak = 0
+        event.listen(engine.sync_engine, "checkout", self.checkout)
+        event.listen(engine.sync_engine, "checkin", self.checkin)
+
+    def checkout(self, *args):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def checkin(self, *args):
+        self.current -= 1
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    user_id = uuid.uuid4()
+
+    @app.get("/bookmarks")
+    async def bookmarks(
+        user_db: SQLAlchemyUserDatabase = Depends(get_user_db),
+        db: AsyncSession = Depends(deps.get_db),
+    ):
+        await user_db.get(user_id)
+        return len(await crud.bookmark.get_multi(db, limit=10))
+
+    return app
+
+
+async def separate_session() -> AsyncGenerator[AsyncSession, None]:
+    async with session.SessionLocal() as db:
+        yield db
+
+
+async def separate_user_db(db: AsyncSession = Depends(separate_session)):
+    yield SQLAlchemyUserDatabase(db, User, OAuthAccount)
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> float:
+    """Send ``requests`` requests with ``concurrency`` workers, return RPS."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://reev") as client:
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                response = await client.get("/bookmarks")
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def measure(app: FastAPI, engine: AsyncEngine, args: argparse.Namespace) -> dict[str, float]:
+    await run(app, args.warmup, args.concurrency)
+    peak = PoolPeak(engine)
+    before = registry.get_sample_value("reev_db_pool_checkouts_total") or 0
+    rps = await run(app, args.requests, args.concurrency)
+    checkouts = (registry.get_sample_value("reev_db_pool_checkouts_total") or 0) - before
+    return {
+        "rps": rps,
+        "checkouts_per_request": checkouts / args.requests,
+        "peak_checked_out": peak.peak,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Large enough for the separate sessions of all workers, so that no mode waits.
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmpdir}/db.sqlite3",
+            pool_size=2 * args.concurrency,
+            max_overflow=0,
+        )
+        instrument_engine(engine.sync_engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session.SessionLocal = async_sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+        )
+        app = build_app()
+        try:
+            results = {"shared": await measure(app, engine, args)}
+            app.dependency_overrides[get_user_db] = separate_user_db
+            results["separate"] = await measure(app, engine, args)
+        finally:
+            await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Local stand-in for the upstream and remote services used by the benchmarks.
+
+Without ``profiles``, every request is answered at once with the same payload.
+With ``profiles``, the first path segment selects an ``UpstreamProfile`` that
+determines the latency distribution, the payload size and the error rate of
+the responses, so that one stand-in can replace all ``BACKEND_PREFIX_*``
+services (``http://<host>:<port>/annonars`` etc.) and the remote services
+(``http://<host>:<port>/rest.variantvalidator.org`` etc.).
+"""
+
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+from contextlib import contextmanager
+from typing import Iterator, Literal
+
+import httpx
+import uvicorn
+from pydantic import BaseModel
+
+#: Default payload returned by the stand-in upstream.
+DEFAULT_PAYLOAD = b'{"result": "' + b"x" * 1024 + b'"}'
+
+
+class LatencyDistribution(BaseModel):
+    """Distribution of the time until a stand-in upstream responds."""
+
+    #: Kind of the distribution.
+    kind: Literal["constant", "uniform", "exponential", "lognormal"] = "constant"
+    #: Mean latency in seconds (median for ``lognormal``).
+    mean: float = 0.0
+    #: Half-width of the interval for ``uniform``, sigma for ``lognormal``.
+    spread: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency in seconds."""
+        if self.kind == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        elif self.kind == "exponential":
+            return rng.expovariate(1.0 / self.mean) if self.mean > 0 else 0.0
+        elif self.kind == "lognormal":
+            return self.mean * rng.lognormvariate(0.0, self.spread) if self.mean > 0 else 0.0
+        return self.mean
+
+
+class UpstreamProfile(BaseModel):
+    """Behaviour of one stand-in upstream."""
+
+    #: Latency of the responses.
+    latency: LatencyDistribution = LatencyDistribution()
+    #: Size of the JSON payload of successful responses in bytes.
+    payload_bytes: int = 1024
+    #: Fraction of requests answered with ``error_status``.
+    error_rate: float = 0.0
+    #: Status code of failed responses.
+    error_status: int = 503
+
+
+def json_payload(size: int) -> bytes:
+    """Return a JSON document of about ``size`` bytes."""
+    return json.dumps({"result": "x" * max(0, size - 14)}).encode()
+
+
+async def read_body(receive):
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+
+
+async def send_response(send, status: int, body: bytes):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def make_app(
+    payload: bytes = DEFAULT_PAYLOAD,
+    profiles: dict[str, UpstreamProfile] | None = None,
+    seed: int = 0,
+):
+    """Create a minimal ASGI app answering every request with ``payload``.
+
+    :param payload: response body if ``profiles`` is not given
+    :param profiles: behaviour by first path segment; the profile ``"*"``, if any,
+        is used for all other paths
+    :param seed: seed of the random numbers for latencies and errors
+    """
+    if profiles is None:
+
+        async def app(scope, receive, send):
+            await read_body(receive)
+            await send_response(send, 200, payload)
+
+        return app
+
+    rng = random.Random(seed)
+    payloads = {name: json_payload(profile.payload_bytes) for name, profile in profiles.items()}
+
+    async def profiled_app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await read_body(receive)
+        name = scope["path"].lstrip("/").split("/", 1)[0]
+        if name not in profiles:
+            name = "*"
+        profile = profiles.get(name)
+        if profile is None:
+            await send_response(send, 404, b'{"error": "unknown upstream"}')
+            return
+        latency = profile.latency.sample(rng)
+        failed = rng.random() < profile.error_rate
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if failed:
+            await send_response(send, profile.error_status, b'{"error": "injected"}')
+        else:
+            await send_response(send, 200, payloads[name])
+
+    return profiled_app
+
+
+def _run(
+    sock: socket.socket, payload: bytes, profiles: dict[str, UpstreamProfile] | None, seed: int
+):
+    """Entry point of the server process."""
+    server = uvicorn.Server(
+        uvicorn.Config(
+            make_app(payload, profiles, seed), log_level="warning", access_log=False, lifespan="off"
+        )
+    )
+    server.run(sockets=[sock])
+
+
+def listen(host: str) -> socket.socket:
+    """Return a socket bound to a free port of ``host``."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Accepted connections inherit this; asyncio only sets it for ``IPPROTO_TCP`` sockets.
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((host, 0))
+    return sock
+
+
+def wait_until_up(url: str):
+    """Wait until the server at ``url`` accepts requests."""
+    while True:
+        try:
+            httpx.get(url)
+            break
+        except httpx.TransportError:
+            time.sleep(0.05)
+
+
+@contextmanager
+def serve(
+    payload: bytes = DEFAULT_PAYLOAD,
+    host: str = "127.0.0.1",
+    profiles: dict[str, UpstreamProfile] | None = None,
+    seed: int = 0,
+) -> Iterator[str]:
+    """Serve the stand-in upstream in a separate process and yield its base URL.
+
+    A separate process is used so that the upstream does not compete with the
+    benchmarked code for the GIL.
+    """
+    sock = listen(host)
+    port = sock.getsockname()[1]
+    process = multiprocessing.get_context("fork").Process(
+        target=_run, args=(sock, payload, profiles, seed), daemon=True
+    )
+    process.start()
+    base_url = f"http://{host}:{port}"
+    wait_until_up(base_url)
+    try:
+        yield base_url
+    finally:
+        process.terminate()
+        process.join()
+        sock.close()
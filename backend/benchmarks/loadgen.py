@@ -0,0 +1,324 @@
+"""Load test of ``app.main:app`` end to end against stand-in upstream services.
+
+Starts the stand-in upstreams (``benchmarks.fake_upstream``) with one profile
+for each ``BACKEND_PREFIX_*`` service and each remote service, and the app with
+uvicorn in a separate process.  A fixed number of concurrent clients sends a
+mix of requests from the scenario and the script reports the requests per
+second, latency percentiles, status codes and the memory of the app process.
+
+The scenario can be given as a JSON file with the structure of
+``DEFAULT_SCENARIO``.  The sequence of requests only depends on the scenario
+and the seed, and the results are written as JSON with sorted keys, so runs
+of different releases can be compared with ``diff`` or ``jq``.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Literal
+
+import httpx
+import uvicorn
+from pydantic import BaseModel
+
+from benchmarks.fake_upstream import (
+    LatencyDistribution,
+    UpstreamProfile,
+    listen,
+    serve,
+    wait_until_up,
+)
+
+#: Settings with the base URL of each built-in upstream, by upstream name.
+PREFIX_SETTINGS = {
+    "annonars": "BACKEND_PREFIX_ANNONARS",
+    "mehari": "BACKEND_PREFIX_MEHARI",
+    "viguno": "BACKEND_PREFIX_VIGUNO",
+    "nginx": "BACKEND_PREFIX_NGINX",
+    "dotty": "BACKEND_PREFIX_DOTTY",
+    "cada-prio": "BACKEND_PREFIX_CADA_PRIO",
+    "auto-acmg": "BACKEND_PREFIX_AUTOACMG",
+}
+
+#: Hosts of the remote services.
+REMOTE_HOSTS = (
+    "rest.variantvalidator.org",
+    "wintervar.wglab.org",
+    "phoenix.bgi.com",
+    "www.ncbi.nlm.nih.gov",
+)
+
+
+class RequestTemplate(BaseModel):
+    """One kind of request sent to the app."""
+
+    #: HTTP method.
+    method: Literal["GET", "POST"] = "GET"
+    #: Path and query; ``{n}`` is replaced by a number below ``distinct``.
+    path: str
+    #: Number of distinct requests, controls the cache hit rate.
+    distinct: int = 1
+    #: Relative frequency of the request.
+    weight: float = 1.0
+    #: JSON body for POST requests.
+    body: Any | None = None
+
+
+class Scenario(BaseModel):
+    """Behaviour of the stand-in upstreams and the mix of requests."""
+
+    #: Profiles by upstream name or remote host name, ``"*"`` for all others.
+    upstreams: dict[str, UpstreamProfile]
+    #: The requests to send.
+    requests: list[RequestTemplate]
+
+
+#: Scenario used without ``--scenario``.
+DEFAULT_SCENARIO = Scenario(
+    upstreams={
+        "*": UpstreamProfile(
+            latency=LatencyDistribution(kind="lognormal", mean=0.005, spread=0.5),
+            payload_bytes=8 * 1024,
+        ),
+        **{
+            host: UpstreamProfile(
+                latency=LatencyDistribution(kind="lognormal", mean=0.2, spread=0.5),
+                payload_bytes=4 * 1024,
+                error_rate=0.01,
+            )
+            for host in REMOTE_HOSTS
+        },
+    },
+    requests=[
+        RequestTemplate(path="/internal/proxy/annonars/genes/info?hgnc_id=HGNC:{n}", distinct=1000),
+        RequestTemplate(
+            path=(
+                "/internal/proxy/mehari/seqvars/csq?genome_release=grch37"
+                "&chromosome=1&position={n}&reference=A&alternative=G"
+            ),
+            distinct=1000,
+        ),
+        RequestTemplate(path="/internal/proxy/viguno/hpo/genes?gene_id=HGNC:{n}", distinct=200),
+        RequestTemplate(
+            method="POST",
+            path="/internal/proxy/auto-acmg/api/v1/predict/seqvar",
+            body={"variant_name": "grch37-1-55516888-G-GA"},
+            weight=0.5,
+        ),
+        RequestTemplate(
+            path="/internal/remote/variantvalidator/grch37/1-{n}-A-G/all", distinct=100, weight=0.5
+        ),
+        RequestTemplate(path="/internal/aggregate/seqvar/grch37-1-{n}-A-G", distinct=100),
+    ],
+)
+
+
+class RedirectTransport(httpx.AsyncHTTPTransport):
+    """Transport sending all requests to ``base_url``, prefixing the path with the host."""
+
+    def __init__(self, base_url: str, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.base_url = httpx.URL(base_url)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = self.base_url.copy_with(
+            path=f"/{request.url.host}{request.url.path}", query=request.url.query
+        )
+        return await super().handle_async_request(request)
+
+
+def _run_app(sock: socket.socket, upstream_url: str, cache_redis: bool, remote_cache_path: str):
+    """Entry point of the app server process, pointing all upstreams to ``upstream_url``."""
+    from app.core.config import settings
+
+    for name, setting in PREFIX_SETTINGS.items():
+        setattr(settings, setting, f"{upstream_url}/{name}")
+    settings.PROXY_CACHE_REDIS = cache_redis
+    settings.DATA_VERSION_REDIS = cache_redis
+    settings.REMOTE_CACHE_PATH = remote_cache_path
+    # The stand-ins have no rate limit, the results would only show the configured one.
+    settings.REMOTE_RATE_LIMITS = {}
+
+    from app.api.internal.endpoints import proxy, remote
+    from app.core.upstreams import UpstreamRegistry
+
+    proxy.upstream_registry = UpstreamRegistry.from_settings(settings)
+    wrapper = remote.httpx_client_wrapper
+
+    def start_redirected():
+        wrapper.transport = RedirectTransport(upstream_url, retries=0)
+        wrapper.async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0), transport=wrapper.transport
+        )
+
+    wrapper.start = start_redirected  # type: ignore[method-assign]
+
+    server = uvicorn.Server(uvicorn.Config("app.main:app", log_level="warning", access_log=False))
+    server.run(sockets=[sock])
+
+
+def memory_mib(pid: int) -> dict[str, float] | None:
+    """Return the resident and peak resident memory of process ``pid`` (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as inputf:
+            fields = dict(line.split(":", 1) for line in inputf if ":" in line)
+    except OSError:
+        return None
+    return {
+        "rss_mib": int(fields["VmRSS"].split()[0]) / 1024,
+        "peak_rss_mib": int(fields["VmHWM"].split()[0]) / 1024,
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Return the ``q`` quantile of the sorted ``values`` (nearest rank)."""
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def latency_stats(latencies: list[float]) -> dict[str, float]:
+    """Summarize latencies in seconds as milliseconds."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.5) * 1e3,
+        "p90_ms": percentile(values, 0.9) * 1e3,
+        "p99_ms": percentile(values, 0.99) * 1e3,
+        "max_ms": values[-1] * 1e3,
+    }
+
+
+def plan_requests(
+    scenario: Scenario, number: int, rng: random.Random
+) -> list[tuple[RequestTemplate, str]]:
+    """Draw ``number`` requests from the scenario."""
+    weights = [template.weight for template in scenario.requests]
+    templates = rng.choices(scenario.requests, weights, k=number)
+    return [(t, t.path.format(n=rng.randrange(t.distinct))) for t in templates]
+
+
+async def send_all(
+    client: httpx.AsyncClient, plan: list[tuple[RequestTemplate, str]], concurrency: int
+) -> list[tuple[RequestTemplate, int | str, float]]:
+    """Send the planned requests with ``concurrency`` clients, return status and latency."""
+    results: list[tuple[RequestTemplate, int | str, float]] = []
+    requests = iter(plan)
+
+    async def worker():
+        for template, path in requests:
+            start = time.perf_counter()
+            try:
+                response = await client.request(template.method, path, json=template.body)
+                status: int | str = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            results.append((template, status, time.perf_counter() - start))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def run_load(app_url: str, pid: int, args: argparse.Namespace, scenario: Scenario):
+    rng = random.Random(args.seed)
+    warmup = plan_requests(scenario, args.warmup, rng)
+    plan = plan_requests(scenario, args.requests, rng)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=60.0) as client:
+        await send_all(client, warmup, args.concurrency)
+        memory_before = memory_mib(pid)
+        start = time.perf_counter()
+        results = await send_all(client, plan, args.concurrency)
+        elapsed = time.perf_counter() - start
+        memory_after = memory_mib(pid)
+
+    by_request: dict[str, Any] = {}
+    for template in scenario.requests:
+        latencies = [latency for t, _, latency in results if t is template]
+        if latencies:
+            by_request[f"{template.method} {template.path}"] = latency_stats(latencies)
+    statuses = Counter(str(status) for _, status, _ in results)
+    return {
+        "rps": len(results) / elapsed,
+        "elapsed_s": elapsed,
+        "latency": latency_stats([latency for _, _, latency in results]),
+        "by_request": by_request,
+        "status": dict(statuses),
+        "memory_before": memory_before,
+        "memory_after": memory_after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario", help="JSON file with the scenario")
+    parser.add_argument("--redis", action="store_true", help="use the Redis cache tier")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.scenario:
+        with open(args.scenario) as inputf:
+            scenario = Scenario.model_validate_json(inputf.read())
+    else:
+        scenario = DEFAULT_SCENARIO
+
+    with (
+        serve(profiles=scenario.upstreams, seed=args.seed) as upstream_url,
+        tempfile.TemporaryDirectory() as tmpdir,
+    ):
+        sock = listen("127.0.0.1")
+        app_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        # Start with an empty remote service cache so that runs can be compared.
+        remote_cache_path = os.path.join(tmpdir, "remote-cache.sqlite3")
+        process = multiprocessing.get_context("fork").Process(
+            target=_run_app, args=(sock, upstream_url, args.redis, remote_cache_path), daemon=True
+        )
+        process.start()
+        try:
+            wait_until_up(f"{app_url}/internal/frontend-settings")
+            assert process.pid is not None
+            results = asyncio.run(run_load(app_url, process.pid, args, scenario))
+        finally:
+            process.terminate()
+            process.join()
+            sock.close()
+
+    from app import __version__
+
+    report = {
+        "parameters": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "redis": args.redis,
+        },
+        "scenario": scenario.model_dump(mode="json"),
+        "environment": {
+            "reev_version": __version__,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "wt") as outputf:
+            print(output, file=outputf)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
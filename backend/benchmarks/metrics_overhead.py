@@ -0,0 +1,78 @@
+"""Benchmark of the overhead of recording metrics on the hot paths.
+
+Reports the time in microseconds that recording costs per proxied request
+(``observe_upstream`` and ``observe_upstream_bytes``), per database
+query (the SQLAlchemy engine events, measured on an in-memory SQLite database
+without listeners, with no-op listeners and with ``instrument_engine``, so that
+the cost of the event dispatch in SQLAlchemy and of the recording can be told
+apart) and for rendering the text format on a scrape.
+"""
+
+import argparse
+import json
+import time
+import timeit
+
+from prometheus_client import generate_latest
+from sqlalchemy import create_engine, event, text
+
+from app.core.metrics import (
+    instrument_engine,
+    observe_upstream,
+    observe_upstream_bytes,
+    registry,
+)
+
+
+def noop(*args):
+    pass
+
+
+def query_seconds(number: int, listeners: str) -> float:
+    """Return the time for executing ``number`` trivial queries.
+
+    :param listeners: one of "none", "noop" or "metrics"
+    """
+    engine = create_engine("sqlite://")
+    if listeners == "noop":
+        event.listen(engine, "before_cursor_execute", noop)
+        event.listen(engine, "after_cursor_execute", noop)
+    elif listeners == "metrics":
+        instrument_engine(engine)
+    with engine.connect() as conn:
+        statement = text("SELECT 1")
+        start = time.perf_counter()
+        for _ in range(number):
+            conn.execute(statement)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+    number = args.number
+
+    observe = timeit.timeit(lambda: observe_upstream("bench", 200, 0.01, 1024), number=number)
+    observe_bytes = timeit.timeit(lambda: observe_upstream_bytes("bench", 1024), number=number)
+    plain_query = query_seconds(number, "none")
+    noop_query = query_seconds(number, "noop")
+    instrumented_query = query_seconds(number, "metrics")
+    scrape = timeit.timeit(lambda: generate_latest(registry), number=100)
+
+    results = {
+        "observe_upstream_us": observe / number * 1e6,
+        "observe_upstream_bytes_us": observe_bytes / number * 1e6,
+        "proxy_request_overhead_us": (observe + observe_bytes) / number * 1e6,
+        "db_query_plain_us": plain_query / number * 1e6,
+        "db_query_instrumented_us": instrumented_query / number * 1e6,
+        "db_query_overhead_us": (instrumented_query - plain_query) / number * 1e6,
+        "db_event_dispatch_us": (noop_query - plain_query) / number * 1e6,
+        "db_recording_us": (instrumented_query - noop_query) / number * 1e6,
+        "scrape_ms": scrape / 100 * 1e3,
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
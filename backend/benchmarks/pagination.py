@@ -0,0 +1,126 @@
+"""Benchmark of offset vs. keyset pagination of the list endpoints.
+
+Fills a SQLite database in a temporary directory with ``--rows`` bookmarks and
+fetches pages of ``--size`` bookmarks in the order of ``CrudBase.query_multi()``
+(as ``/list-all`` and ``/list-all-cursor`` do) at increasing depths, once with
+``get_multi(skip=...)`` and once with the keyset cursor of ``KeysetCursorParams``
+(walking all pages from the start).  Reports the milliseconds per page by depth.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+import uuid
+import warnings
+
+from fastapi_pagination.ext.sqlalchemy import paginate
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import crud
+from app.api.pagination import KeysetCursorParams
+from app.db.base import Base
+from app.models.bookmark import Bookmark
+from app.schemas.bookmark import BookmarkTypes
+
+#: Rows inserted per statement when filling the database.
+CHUNK_SIZE = 50_000
+
+
+async def fill(session: AsyncSession, rows: int):
+    users = [uuid.uuid4() for _ in range(max(1, rows // 1000))]
+    for start in range(0, rows, CHUNK_SIZE):
+        await session.execute(
+            insert(Bookmark),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "user": users[i % len(users)],
+                    "obj_type": BookmarkTypes.gene,
+                    "obj_id": f"HGNC:{i}",
+                }
+                for i in range(start, min(rows, start + CHUNK_SIZE))
+            ],
+        )
+    await session.commit()
+
+
+def depths(rows: int, size: int) -> list[int]:
+    """Return the depths to measure, from the first to the last page."""
+    result = [0]
+    depth = 1000
+    while depth < rows - size:
+        result.append(depth)
+        depth *= 10
+    result.append(rows - size)
+    return sorted(set(result))
+
+
+async def offset_pages(
+    session: AsyncSession, measured: list[int], size: int, repeat: int
+) -> dict[int, float]:
+    result = {}
+    for depth in measured:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            page = await crud.bookmark.get_multi(session, skip=depth, limit=size)
+            times.append(time.perf_counter() - start)
+            assert len(page) == size
+        result[depth] = statistics.median(times) * 1e3
+    return result
+
+
+async def keyset_pages(session: AsyncSession, measured: list[int], size: int) -> dict[int, float]:
+    result = {}
+    query = crud.bookmark.query_multi()
+    cursor = None
+    depth = 0
+    while True:
+        start = time.perf_counter()
+        page = await paginate(session, query, params=KeysetCursorParams(cursor=cursor, size=size))
+        elapsed = time.perf_counter() - start
+        if depth in measured:
+            result[depth] = elapsed * 1e3
+        depth += len(page.items)
+        cursor = page.next_page
+        if not cursor:
+            return result
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, dict[int, float]]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmpdir}/db.sqlite3")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_local = async_sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+        )
+        measured = depths(args.rows, args.size)
+        try:
+            async with session_local() as session:
+                await fill(session, args.rows)
+            async with session_local() as session:
+                offset = await offset_pages(session, measured, args.size, args.repeat)
+            async with session_local() as session:
+                keyset = await keyset_pages(session, measured, args.size)
+        finally:
+            await engine.dispose()
+    return {"offset_ms_per_page": offset, "keyset_ms_per_page": keyset}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark of the peak memory used for proxying large request bodies.
+
+POSTs bodies of increasing size through ``/internal/proxy/auto-acmg`` to a local
+stand-in upstream and reports the peak of the memory allocated by Python during
+each request (measured with ``tracemalloc``).  The "buffered" mode emulates the
+previous behaviour of reading the whole body with ``await request.body()``
+before forwarding it.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tracemalloc
+from typing import AsyncIterator
+
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.internal.endpoints import proxy
+from app.core.config import settings
+from app.core.upstreams import UpstreamRegistry, upstream_clients
+from app.main import app
+from benchmarks.fake_upstream import serve
+
+#: Size of the chunks the client sends.
+CHUNK_SIZE = 64 * 1024
+
+
+class BufferBody:
+    """ASGI wrapper that reads the whole request body before calling the app."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+        del chunks
+
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, send)
+
+
+async def body_chunks(size: int) -> AsyncIterator[bytes]:
+    chunk = b"x" * CHUNK_SIZE
+    for _ in range(size // CHUNK_SIZE):
+        yield chunk
+
+
+async def peak_bytes(asgi_app: ASGIApp, size: int) -> int:
+    """POST a body of ``size`` bytes through the proxy and return the peak allocation."""
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://reev") as client:
+        tracemalloc.start()
+        response = await client.post("/internal/proxy/auto-acmg/predict", content=body_chunks(size))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert response.status_code == 200
+    return peak
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, float]:
+    results = {}
+    upstream_clients.start()
+    try:
+        for size_mib in args.sizes:
+            for label, asgi_app in (("streamed", app), ("buffered", BufferBody(app))):
+                peak = await peak_bytes(asgi_app, size_mib * 1024 * 1024)
+                results[f"{size_mib}mib_{label}_peak_mib"] = peak / 1024 / 1024
+    finally:
+        await upstream_clients.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 16, 64])
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with serve() as base_url:
+        settings.BACKEND_PREFIX_AUTOACMG = base_url
+        proxy.upstream_registry = UpstreamRegistry.from_settings(settings)
+        results = asyncio.run(main_async(args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
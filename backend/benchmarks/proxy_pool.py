@@ -0,0 +1,84 @@
+"""Benchmark of pooled vs. per-request upstream clients in the reverse proxy.
+
+Proxies requests through ``/internal/proxy/annonars`` to a local stand-in upstream.
+The "per-request" mode emulates the previous behaviour of creating a fresh
+``httpx.AsyncClient`` (and thus a fresh TCP connection) for every request.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+
+from app.api.internal.endpoints import proxy
+from app.core.config import settings
+from app.core.upstreams import UpstreamRegistry, upstream_clients
+from app.main import app
+from benchmarks.fake_upstream import serve
+
+
+class PerRequestClients:
+    """Drop-in for ``upstream_clients`` that creates a new client on each call."""
+
+    def __call__(self, name: str) -> httpx.AsyncClient:
+        _ = name
+        return httpx.AsyncClient()
+
+
+async def run(requests: int, concurrency: int) -> float:
+    """Send ``requests`` proxied requests with ``concurrency`` workers, return RPS."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://reev") as client:
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+
+        async def worker():
+            while not queue.empty():
+                i = queue.get_nowait()
+                response = await client.get(f"/internal/proxy/annonars/genes/info?i={i}")
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, float]:
+    results = {}
+    upstream_clients.start()
+    try:
+        await run(args.warmup, args.concurrency)
+        results["pooled_rps"] = await run(args.requests, args.concurrency)
+        proxy.upstream_clients = PerRequestClients()  # type: ignore[assignment]
+        await run(args.warmup, args.concurrency)
+        results["per_request_rps"] = await run(args.requests, args.concurrency)
+    finally:
+        proxy.upstream_clients = upstream_clients
+        await upstream_clients.stop()
+    results["speedup"] = results["pooled_rps"] / results["per_request_rps"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with serve() as base_url:
+        settings.BACKEND_PREFIX_ANNONARS = base_url
+        # Both modes send the same requests, the second one must not be served from the cache.
+        settings.PROXY_CACHE_ENABLED = False
+        proxy.upstream_registry = UpstreamRegistry.from_settings(settings)
+        results = asyncio.run(main_async(args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
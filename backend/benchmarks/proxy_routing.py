@@ -0,0 +1,68 @@
+"""Microbenchmark of the upstream resolution step of the reverse proxy.
+
+Compares the previous chain of ``str.startswith`` / ``str.replace`` branches with
+the dict lookup in ``UpstreamRegistry.resolve``.
+"""
+
+import argparse
+import json
+import timeit
+
+from app.core.config import settings
+from app.core.upstreams import UpstreamRegistry
+
+#: Paths to resolve, covering the first and the last upstream of the previous chain.
+PATHS = (
+    "/internal/proxy/annonars/genes/info",
+    "/internal/proxy/mehari/seqvars/csq",
+    "/internal/proxy/auto-acmg/api/v1/predict/seqvar",
+)
+
+
+def legacy_resolve(path: str) -> str | None:
+    """Resolution as implemented before the upstream registry."""
+    if path.startswith(f"{settings.INTERNAL_STR}/proxy/annonars"):
+        return settings.BACKEND_PREFIX_ANNONARS + path.replace("/internal/proxy/annonars", "")
+    elif path.startswith(f"{settings.INTERNAL_STR}/proxy/mehari"):
+        return settings.BACKEND_PREFIX_MEHARI + path.replace("/internal/proxy/mehari", "")
+    elif path.startswith(f"{settings.INTERNAL_STR}/proxy/viguno"):
+        return settings.BACKEND_PREFIX_VIGUNO + path.replace("/internal/proxy/viguno", "")
+    elif path.startswith(f"{settings.INTERNAL_STR}/proxy/nginx"):
+        return settings.BACKEND_PREFIX_NGINX + path.replace("/internal/proxy/nginx", "")
+    elif path.startswith(f"{settings.INTERNAL_STR}/proxy/dotty"):
+        return settings.BACKEND_PREFIX_DOTTY + path.replace("/internal/proxy/dotty", "")
+    elif path.startswith(f"{settings.INTERNAL_STR}/proxy/cada-prio"):
+        return settings.BACKEND_PREFIX_CADA_PRIO + path.replace("/internal/proxy/cada-prio", "")
+    elif path.startswith(f"{settings.INTERNAL_STR}/proxy/auto-acmg"):
+        return settings.BACKEND_PREFIX_AUTOACMG + path.replace("/internal/proxy/auto-acmg", "")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200_000)
+    args = parser.parse_args()
+
+    registry = UpstreamRegistry.from_settings(settings)
+    # The route parameter passed to the endpoint already has the prefix stripped.
+    prefix_len = len(f"{settings.INTERNAL_STR}/proxy/")
+
+    def registry_resolve(path: str) -> str | None:
+        resolved = registry.resolve(path[prefix_len:])
+        if resolved is None:
+            return None
+        upstream, rest = resolved
+        return upstream.base_url() + rest
+
+    results = {}
+    for path in PATHS:
+        assert legacy_resolve(path) == registry_resolve(path)
+        name = path[prefix_len:].split("/")[0]
+        for label, func in (("legacy", legacy_resolve), ("registry", registry_resolve)):
+            seconds = min(timeit.repeat(lambda: func(path), number=args.number, repeat=5))
+            results[f"{name}_{label}_ns"] = seconds / args.number * 1e9
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -726,6 +726,83 @@ async def test_update_acmgseqvar_invalid_enum(
     assert response_update.status_code == 422
 
 
+# ------------------------------------------------------------------------------
+# /api/v1/acmgseqvar/upsert
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL), (SUPER, SUPER)], indirect=True)
+async def test_upsert_acmgseqvar(
+    db_session: AsyncSession,
+    client_user: TestClient,
+    test_user: User,
+    acmgseqvar_post_data: dict[str, Any],
+    acmgseqvar_update_data: dict[str, Any],
+):
+    """Test creating and then replacing a acmgseqvar with upsert."""
+    _ = db_session
+    # act:
+    response_insert = client_user.put(
+        f"{settings.API_V1_STR}/acmgseqvar/upsert",
+        json=acmgseqvar_post_data,
+    )
+    response_update = client_user.put(
+        f"{settings.API_V1_STR}/acmgseqvar/upsert",
+        json=acmgseqvar_update_data,
+    )
+    response_list = client_user.get(f"{settings.API_V1_STR}/acmgseqvar/list")
+    # assert:
+    assert response_insert.status_code == 200
+    assert response_insert.json()["acmg_rank"] == acmgseqvar_post_data["acmg_rank"]
+    assert response_insert.json()["user"] == str(test_user.id)
+    assert response_update.status_code == 200
+    assert response_update.json()["id"] == response_insert.json()["id"]
+    assert response_update.json()["seqvar_name"] == acmgseqvar_update_data["seqvar_name"]
+    assert response_update.json()["acmg_rank"] == acmgseqvar_update_data["acmg_rank"]
+    assert response_update.json()["user"] == str(test_user.id)
+    assert response_list.status_code == 200
+    assert [item["id"] for item in response_list.json()] == [response_insert.json()["id"]]
+
+
+@pytest.mark.anyio
+async def test_upsert_acmgseqvar_anon(
+    db_session: AsyncSession, client: TestClient, acmgseqvar_post_data: dict[str, Any]
+):
+    """Test upserting a acmgseqvar as anonymous user."""
+    _ = db_session
+    # act:
+    response = client.put(
+        f"{settings.API_V1_STR}/acmgseqvar/upsert",
+        json=acmgseqvar_post_data,
+    )
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL)], indirect=True)
+async def test_upsert_acmgseqvar_invalid_enum(
+    db_session: AsyncSession,
+    client_user: TestClient,
+    test_user: User,
+    acmgseqvar_post_data: dict[str, Any],
+):
+    """Test upserting a acmgseqvar with invalid enums."""
+    _ = db_session
+    _ = test_user
+    # act:
+    post_data = acmgseqvar_post_data.copy()
+    post_data["acmg_rank"]["criterias"][0]["criteria"] = "Pppm4"
+    response = client_user.put(
+        f"{settings.API_V1_STR}/acmgseqvar/upsert",
+        json=post_data,
+    )
+    # assert:
+    assert response.status_code == 422
+
+
 # ------------------------------------------------------------------------------
 # /api/v1/acmgseqvar/delete-by-id
 # ------------------------------------------------------------------------------
@@ -941,3 +1018,102 @@ async def test_delete_acmgseqvar_no_acmgseqvar_with_browser_header(
     # assert:
     # Status code is 204 because we use browser header
     assert response.status_code == 204
+
+
+# ------------------------------------------------------------------------------
+# api/v1/acmgseqvar/list-cursor, api/v1/acmgseqvar/list-all-cursor
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL), (SUPER, SUPER)], indirect=True)
+async def test_list_acmgseqvars_cursor(
+    db_session: AsyncSession, client_user: TestClient, test_user: User, obj_names: ObjNames
+):
+    """Test listing the acmgseqvars of the current user page by page."""
+    _ = db_session
+    # arrange:
+    for seqvar_name in reversed(obj_names.seqvar):
+        response_upsert = client_user.put(
+            f"{settings.API_V1_STR}/acmgseqvar/upsert",
+            json={"seqvar_name": seqvar_name, "acmg_rank": {"comment": "", "criterias": []}},
+        )
+        assert response_upsert.status_code == 200
+    # act:
+    pages = [client_user.get(f"{settings.API_V1_STR}/acmgseqvar/list-cursor?size=2")]
+    while pages[-1].status_code == 200 and pages[-1].json()["next_page"]:
+        pages.append(
+            client_user.get(
+                f"{settings.API_V1_STR}/acmgseqvar/list-cursor",
+                params={"size": 2, "cursor": pages[-1].json()["next_page"]},
+            )
+        )
+    # assert:
+    assert [page.status_code for page in pages] == [200, 200]
+    assert [page.json()["total"] for page in pages] == [None, None]
+    items = [item for page in pages for item in page.json()["items"]]
+    assert [len(page.json()["items"]) for page in pages] == [2, 1]
+    assert [item["seqvar_name"] for item in items] == sorted(obj_names.seqvar)
+    assert {item["user"] for item in items} == {str(test_user.id)}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(SUPER, SUPER)], indirect=True)
+async def test_list_all_acmgseqvars_cursor_superuser(
+    db_session: AsyncSession, client_user: TestClient, test_user: User, obj_names: ObjNames
+):
+    """Test listing all acmgseqvars page by page as superuser."""
+    _ = db_session
+    _ = test_user
+    # arrange:
+    for seqvar_name in reversed(obj_names.seqvar):
+        response_upsert = client_user.put(
+            f"{settings.API_V1_STR}/acmgseqvar/upsert",
+            json={"seqvar_name": seqvar_name, "acmg_rank": {"comment": "", "criterias": []}},
+        )
+        assert response_upsert.status_code == 200
+    # act:
+    response_list = client_user.get(f"{settings.API_V1_STR}/acmgseqvar/list")
+    pages = [client_user.get(f"{settings.API_V1_STR}/acmgseqvar/list-all-cursor?size=2")]
+    while pages[-1].status_code == 200 and pages[-1].json()["next_page"]:
+        pages.append(
+            client_user.get(
+                f"{settings.API_V1_STR}/acmgseqvar/list-all-cursor",
+                params={"size": 2, "cursor": pages[-1].json()["next_page"]},
+            )
+        )
+    # assert:
+    assert [page.status_code for page in pages] == [200, 200]
+    assert [page.json()["total"] for page in pages] == [None, None]
+    ids = [item["id"] for page in pages for item in page.json()["items"]]
+    assert ids == sorted(ids)
+    assert set(ids) == {item["id"] for item in response_list.json()}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL)], indirect=True)
+async def test_list_all_acmgseqvars_cursor(
+    db_session: AsyncSession, client_user: TestClient, test_user: User
+):
+    """Test listing all acmgseqvars page by page as regular user."""
+    _ = db_session
+    _ = test_user
+    # act:
+    response = client_user.get(f"{settings.API_V1_STR}/acmgseqvar/list-all-cursor")
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", ["list-cursor", "list-all-cursor"])
+async def test_list_acmgseqvars_cursor_anon(
+    db_session: AsyncSession, client: TestClient, path: str
+):
+    """Test listing acmgseqvars page by page as anonymous user."""
+    _ = db_session
+    # act:
+    response = client.get(f"{settings.API_V1_STR}/acmgseqvar/{path}")
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
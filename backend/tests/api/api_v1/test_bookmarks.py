@@ -635,3 +635,195 @@ async def test_delete_no_bookmark_with_browser_header(
     # assert:
     # Status code is 204 because we use browser agent
     assert response.status_code == 204
+
+
+# ------------------------------------------------------------------------------
+# /api/v1/bookmarks/*-batch
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL), (SUPER, SUPER)], indirect=True)
+async def test_bookmarks_batch(
+    db_session: AsyncSession, client_user: TestClient, test_user: User, obj_names: ObjNames
+):
+    """Test creating, getting and deleting bookmarks in batches."""
+    _ = db_session
+    genes = [{"obj_type": "gene", "obj_id": obj_id} for obj_id in obj_names.gene]
+    seqvar = {"obj_type": "seqvar", "obj_id": obj_names.seqvar[0]}
+    # act:
+    response_create = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/create-batch", json={"bookmarks": genes[:2]}
+    )
+    response_create_again = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/create-batch", json={"bookmarks": genes}
+    )
+    response_get = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/get-batch", json={"bookmarks": genes[1:] + [seqvar]}
+    )
+    response_delete = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/delete-batch", json={"bookmarks": genes[:2] + [seqvar]}
+    )
+    response_list = client_user.get(f"{settings.API_V1_STR}/bookmarks/list")
+    # assert:
+    assert response_create.status_code == 200
+    created = response_create.json()
+    assert [item["obj_id"] for item in created] == obj_names.gene[:2]
+    assert {item["user"] for item in created} == {str(test_user.id)}
+    assert response_create_again.status_code == 200
+    created_again = response_create_again.json()
+    assert [item["obj_id"] for item in created_again] == obj_names.gene
+    assert [item["id"] for item in created_again[:2]] == [item["id"] for item in created]
+    assert response_get.status_code == 200
+    assert sorted(item["obj_id"] for item in response_get.json()) == obj_names.gene[1:]
+    assert response_delete.status_code == 200
+    assert sorted(item["id"] for item in response_delete.json()) == sorted(
+        item["id"] for item in created
+    )
+    assert response_list.status_code == 200
+    assert [item["id"] for item in response_list.json()] == [created_again[2]["id"]]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL)], indirect=True)
+async def test_bookmarks_batch_invalid(
+    db_session: AsyncSession, client_user: TestClient, test_user: User, obj_names: ObjNames
+):
+    """Test batches with an invalid bookmark or too many bookmarks."""
+    _ = db_session
+    _ = test_user
+    bookmark = {"obj_type": "gene", "obj_id": obj_names.gene[0]}
+    # act:
+    response_invalid = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/create-batch",
+        json={"bookmarks": [bookmark, {"obj_type": "seqvar", "obj_id": obj_names.gene[0]}]},
+    )
+    response_too_many = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/get-batch",
+        json={"bookmarks": [bookmark] * (settings.BOOKMARKS_BATCH_MAX_ITEMS + 1)},
+    )
+    response_list = client_user.get(f"{settings.API_V1_STR}/bookmarks/list")
+    # assert:
+    assert response_invalid.status_code == 422
+    assert response_too_many.status_code == 422
+    assert response_list.json() == []
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", ["get-batch", "create-batch", "delete-batch"])
+async def test_bookmarks_batch_anon(
+    db_session: AsyncSession, client: TestClient, obj_names: ObjNames, path: str
+):
+    """Test the batch endpoints as anonymous user."""
+    _ = db_session
+    # act:
+    response = client.post(
+        f"{settings.API_V1_STR}/bookmarks/{path}",
+        json={"bookmarks": [{"obj_type": "gene", "obj_id": obj_names.gene[0]}]},
+    )
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
+
+
+# ------------------------------------------------------------------------------
+# api/v1/bookmarks/list-cursor, api/v1/bookmarks/list-all-cursor
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL), (SUPER, SUPER)], indirect=True)
+async def test_list_bookmarks_cursor(
+    db_session: AsyncSession, client_user: TestClient, test_user: User, obj_names: ObjNames
+):
+    """Test listing the bookmarks of the current user page by page."""
+    _ = db_session
+    # arrange:
+    response_create = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/create-batch",
+        json={
+            "bookmarks": [
+                {"obj_type": "gene", "obj_id": obj_id} for obj_id in reversed(obj_names.gene)
+            ]
+        },
+    )
+    assert response_create.status_code == 200
+    # act:
+    pages = [client_user.get(f"{settings.API_V1_STR}/bookmarks/list-cursor?size=2")]
+    while pages[-1].status_code == 200 and pages[-1].json()["next_page"]:
+        pages.append(
+            client_user.get(
+                f"{settings.API_V1_STR}/bookmarks/list-cursor",
+                params={"size": 2, "cursor": pages[-1].json()["next_page"]},
+            )
+        )
+    # assert:
+    assert [page.status_code for page in pages] == [200, 200]
+    assert [page.json()["total"] for page in pages] == [None, None]
+    items = [item for page in pages for item in page.json()["items"]]
+    assert [len(page.json()["items"]) for page in pages] == [2, 1]
+    assert [item["obj_id"] for item in items] == sorted(obj_names.gene)
+    assert {item["user"] for item in items} == {str(test_user.id)}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(SUPER, SUPER)], indirect=True)
+async def test_list_all_bookmarks_cursor_superuser(
+    db_session: AsyncSession, client_user: TestClient, test_user: User, obj_names: ObjNames
+):
+    """Test listing all bookmarks page by page as superuser."""
+    _ = db_session
+    _ = test_user
+    # arrange:
+    response_create = client_user.post(
+        f"{settings.API_V1_STR}/bookmarks/create-batch",
+        json={
+            "bookmarks": [
+                {"obj_type": "gene", "obj_id": obj_id} for obj_id in reversed(obj_names.gene)
+            ]
+        },
+    )
+    assert response_create.status_code == 200
+    # act:
+    response_list = client_user.get(f"{settings.API_V1_STR}/bookmarks/list")
+    pages = [client_user.get(f"{settings.API_V1_STR}/bookmarks/list-all-cursor?size=2")]
+    while pages[-1].status_code == 200 and pages[-1].json()["next_page"]:
+        pages.append(
+            client_user.get(
+                f"{settings.API_V1_STR}/bookmarks/list-all-cursor",
+                params={"size": 2, "cursor": pages[-1].json()["next_page"]},
+            )
+        )
+    # assert:
+    assert [page.status_code for page in pages] == [200, 200]
+    assert [page.json()["total"] for page in pages] == [None, None]
+    ids = [item["id"] for page in pages for item in page.json()["items"]]
+    assert ids == sorted(ids)
+    assert set(ids) == {item["id"] for item in response_list.json()}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL)], indirect=True)
+async def test_list_all_bookmarks_cursor(
+    db_session: AsyncSession, client_user: TestClient, test_user: User
+):
+    """Test listing all bookmarks page by page as regular user."""
+    _ = db_session
+    _ = test_user
+    # act:
+    response = client_user.get(f"{settings.API_V1_STR}/bookmarks/list-all-cursor")
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", ["list-cursor", "list-all-cursor"])
+async def test_list_bookmarks_cursor_anon(db_session: AsyncSession, client: TestClient, path: str):
+    """Test listing bookmarks page by page as anonymous user."""
+    _ = db_session
+    # act:
+    response = client.get(f"{settings.API_V1_STR}/bookmarks/{path}")
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
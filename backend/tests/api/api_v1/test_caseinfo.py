@@ -733,6 +733,84 @@ async def test_update_caseinfo_invalid_terms(
     assert response_update.status_code == 422
 
 
+# ------------------------------------------------------------------------------
+# api/v1/caseinfo/upsert
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL), (SUPER, SUPER)], indirect=True)
+async def test_upsert_caseinfo(
+    db_session: AsyncSession,
+    client_user: TestClient,
+    test_user: User,
+):
+    """Test creating and then replacing a caseinfo with upsert."""
+    _ = db_session
+    # act:
+    response_insert = client_user.put(
+        f"{settings.API_V1_STR}/caseinfo/upsert",
+        json={"pseudonym": "test1", "age_of_onset_month": 20},
+    )
+    response_update = client_user.put(
+        f"{settings.API_V1_STR}/caseinfo/upsert",
+        json={"pseudonym": "test1", "age_of_onset_month": 30},
+    )
+    response_get = client_user.get(f"{settings.API_V1_STR}/caseinfo/get")
+    # assert:
+    assert response_insert.status_code == 200
+    assert response_insert.json()["age_of_onset_month"] == 20
+    assert response_insert.json()["user"] == str(test_user.id)
+    assert response_update.status_code == 200
+    assert response_update.json()["id"] == response_insert.json()["id"]
+    assert response_update.json()["pseudonym"] == "test1"
+    assert response_update.json()["age_of_onset_month"] == 30
+    assert response_get.status_code == 200
+    assert response_get.json()["id"] == response_insert.json()["id"]
+    assert response_get.json()["age_of_onset_month"] == 30
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL)], indirect=True)
+async def test_upsert_caseinfo_no_pseudonym(
+    db_session: AsyncSession,
+    client_user: TestClient,
+    test_user: User,
+):
+    """Test upserting a caseinfo without pseudonym."""
+    _ = db_session
+    _ = test_user
+    # act:
+    response_insert = client_user.put(
+        f"{settings.API_V1_STR}/caseinfo/upsert",
+        json={"age_of_onset_month": 20},
+    )
+    response_update = client_user.put(
+        f"{settings.API_V1_STR}/caseinfo/upsert",
+        json={"pseudonym": "", "age_of_onset_month": 30},
+    )
+    # assert:
+    assert response_insert.status_code == 200
+    assert response_insert.json()["pseudonym"] == ""
+    assert response_update.status_code == 200
+    assert response_update.json()["id"] == response_insert.json()["id"]
+    assert response_update.json()["age_of_onset_month"] == 30
+
+
+@pytest.mark.anyio
+async def test_upsert_caseinfo_anon(db_session: AsyncSession, client: TestClient):
+    """Test upserting a caseinfo as anonymous user."""
+    _ = db_session
+    # act:
+    response = client.put(
+        f"{settings.API_V1_STR}/caseinfo/upsert",
+        json={"pseudonym": "test1", "age_of_onset_month": 20},
+    )
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
+
+
 # ------------------------------------------------------------------------------
 # api/v1/caseinfo/delete
 # ------------------------------------------------------------------------------
@@ -815,3 +893,98 @@ async def test_delete_no_caseinfo(
     # assert:
     assert response.status_code == 404
     assert response.json() == {"detail": "Case Information not found"}
+
+
+# ------------------------------------------------------------------------------
+# api/v1/caseinfo/list-cursor, api/v1/caseinfo/list-all-cursor
+# ------------------------------------------------------------------------------
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL), (SUPER, SUPER)], indirect=True)
+async def test_list_caseinfos_cursor(
+    db_session: AsyncSession, client_user: TestClient, test_user: User
+):
+    """Test listing the caseinfos of the current user page by page."""
+    _ = db_session
+    # arrange:
+    for pseudonym in ["test3", "test2", "test1"]:
+        response_upsert = client_user.put(
+            f"{settings.API_V1_STR}/caseinfo/upsert", json={"pseudonym": pseudonym}
+        )
+        assert response_upsert.status_code == 200
+    # act:
+    pages = [client_user.get(f"{settings.API_V1_STR}/caseinfo/list-cursor?size=2")]
+    while pages[-1].status_code == 200 and pages[-1].json()["next_page"]:
+        pages.append(
+            client_user.get(
+                f"{settings.API_V1_STR}/caseinfo/list-cursor",
+                params={"size": 2, "cursor": pages[-1].json()["next_page"]},
+            )
+        )
+    # assert:
+    assert [page.status_code for page in pages] == [200, 200]
+    assert [page.json()["total"] for page in pages] == [None, None]
+    items = [item for page in pages for item in page.json()["items"]]
+    assert [len(page.json()["items"]) for page in pages] == [2, 1]
+    assert [item["pseudonym"] for item in items] == ["test1", "test2", "test3"]
+    assert {item["user"] for item in items} == {str(test_user.id)}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(SUPER, SUPER)], indirect=True)
+async def test_list_all_caseinfos_cursor_superuser(
+    db_session: AsyncSession, client_user: TestClient, test_user: User
+):
+    """Test listing all caseinfos page by page as superuser."""
+    _ = db_session
+    _ = test_user
+    # arrange:
+    for pseudonym in ["test3", "test2", "test1"]:
+        response_upsert = client_user.put(
+            f"{settings.API_V1_STR}/caseinfo/upsert", json={"pseudonym": pseudonym}
+        )
+        assert response_upsert.status_code == 200
+    # act:
+    response_list = client_user.get(f"{settings.API_V1_STR}/caseinfo/list")
+    pages = [client_user.get(f"{settings.API_V1_STR}/caseinfo/list-all-cursor?size=2")]
+    while pages[-1].status_code == 200 and pages[-1].json()["next_page"]:
+        pages.append(
+            client_user.get(
+                f"{settings.API_V1_STR}/caseinfo/list-all-cursor",
+                params={"size": 2, "cursor": pages[-1].json()["next_page"]},
+            )
+        )
+    # assert:
+    assert [page.status_code for page in pages] == [200, 200]
+    assert [page.json()["total"] for page in pages] == [None, None]
+    ids = [item["id"] for page in pages for item in page.json()["items"]]
+    assert ids == sorted(ids)
+    assert set(ids) == {item["id"] for item in response_list.json()}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("test_user, client_user", [(REGUL, REGUL)], indirect=True)
+async def test_list_all_caseinfos_cursor(
+    db_session: AsyncSession, client_user: TestClient, test_user: User
+):
+    """Test listing all caseinfos page by page as regular user."""
+    _ = db_session
+    _ = test_user
+    # act:
+    response = client_user.get(f"{settings.API_V1_STR}/caseinfo/list-all-cursor")
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", ["list-cursor", "list-all-cursor"])
+async def test_list_caseinfos_cursor_anon(db_session: AsyncSession, client: TestClient, path: str):
+    """Test listing caseinfos page by page as anonymous user."""
+    _ = db_session
+    # act:
+    response = client.get(f"{settings.API_V1_STR}/caseinfo/{path}")
+    # assert:
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Unauthorized"}
@@ -0,0 +1,47 @@
+from typing import Iterator
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.diskcache import remote_cache
+from app.core.ratelimit import rate_limiter
+from app.core.resilience import upstream_guards
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache(monkeypatch: MonkeyPatch) -> Iterator[None]:
+    """Start each test with an empty in-process response cache and no Redis tier."""
+    monkeypatch.setattr(response_cache, "redis", None)
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def fresh_upstream_guards() -> Iterator[None]:
+    """Start each test with closed circuit breakers and empty bulkheads."""
+    upstream_guards.clear()
+    yield
+    upstream_guards.clear()
+
+
+@pytest.fixture(autouse=True)
+def empty_remote_cache(tmp_path, monkeypatch: MonkeyPatch) -> Iterator[None]:
+    """Start each test with an empty remote service cache and zero counters."""
+    monkeypatch.setattr(settings, "REMOTE_CACHE_PATH", str(tmp_path / "remote-cache.sqlite3"))
+    for counter in ("hits", "stale_hits", "misses", "evictions", "errors"):
+        monkeypatch.setattr(remote_cache, counter, 0)
+    remote_cache.start()
+    yield
+    remote_cache.stop()
+
+
+@pytest.fixture(autouse=True)
+def local_rate_limits(monkeypatch: MonkeyPatch) -> Iterator[None]:
+    """Start each test with full in-process rate limit buckets and no Redis."""
+    monkeypatch.setattr(rate_limiter, "script", None)
+    rate_limiter.clear()
+    yield
+    rate_limiter.clear()
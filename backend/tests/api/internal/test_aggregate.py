@@ -0,0 +1,304 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi.testclient import TestClient
+from pytest_httpx._httpx_mock import HTTPXMock
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.api.internal.endpoints import proxy
+from app.core.config import settings
+from app.core.upstreams import UpstreamRegistry
+from app.models.user import User
+from app.schemas.bookmark import BookmarkCreate, BookmarkTypes
+from tests.conftest import UserChoice
+
+#: Host name to use for the mocked backend.
+MOCKED_BACKEND_HOST = "mocked-backend"
+
+#: Sequence variant to aggregate.
+SEQVAR = "grch37-1-55516888-G-GA"
+
+#: Structural variant to aggregate.
+STRUCVAR = "DEL-grch37-17-41176312-41277500"
+
+#: URL of the mocked annonars variant endpoint.
+ANNONARS_VARIANT_URL = httpx.URL(
+    f"http://{MOCKED_BACKEND_HOST}/annonars/annos/variant",
+    params={
+        "genome_release": "grch37",
+        "pos": "55516888",
+        "chromosome": "1",
+        "reference": "G",
+        "alternative": "GA",
+    },
+)
+
+#: URL of the mocked mehari seqvar consequence endpoint.
+MEHARI_SEQVAR_URL = httpx.URL(
+    f"http://{MOCKED_BACKEND_HOST}/mehari/seqvars/csq",
+    params={
+        "genome_release": "grch37",
+        "position": "55516888",
+        "chromosome": "1",
+        "reference": "G",
+        "alternative": "GA",
+    },
+)
+
+#: URL of the mocked VariantValidator endpoint.
+VARIANTVALIDATOR_URL = (
+    "https://rest.variantvalidator.org/VariantValidator/variantvalidator/"
+    "GRCh37/1-55516888-G-GA/all?content-type=application/json"
+)
+
+#: URL of the mocked WinterVar endpoint.
+WINTERVAR_URL = (
+    "http://wintervar.wglab.org/api_new.php"
+    "?queryType=position&chr=1&pos=55516888&ref=G&alt=GA&build=hg19"
+)
+
+
+#: Gene to aggregate.
+HGNC_ID = "HGNC:1100"
+
+#: Gene info as returned by annonars.
+GENE_INFO = {"genes": {HGNC_ID: {"hgnc": {"hgnc_id": HGNC_ID, "symbol": "BRCA1"}}}}
+
+
+@pytest.fixture
+def mocked_upstreams(monkeypatch: MonkeyPatch):
+    """Point annonars and mehari to the mocked backend."""
+    monkeypatch.setattr(
+        settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}/annonars"
+    )
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_MEHARI", f"http://{MOCKED_BACKEND_HOST}/mehari")
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_VIGUNO", f"http://{MOCKED_BACKEND_HOST}/viguno")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+
+
+@pytest.mark.anyio
+async def test_aggregate_seqvar(mocked_upstreams, httpx_mock: HTTPXMock, client: TestClient):
+    """Test aggregating the sections of a sequence variant."""
+    # arrange:
+    httpx_mock.add_response(url=ANNONARS_VARIANT_URL, json={"result": "annonars"})
+    httpx_mock.add_response(url=MEHARI_SEQVAR_URL, json={"result": "mehari"})
+    httpx_mock.add_response(url=VARIANTVALIDATOR_URL, json={"flag": "gene_variant"})
+    httpx_mock.add_response(url=WINTERVAR_URL, json={"PVS1": 1})
+    # act:
+    response = client.get(f"/internal/aggregate/seqvar/{SEQVAR}")
+    # assert:
+    assert response.status_code == 200
+    result = response.json()
+    assert result["name"] == SEQVAR
+    sections = result["sections"]
+    assert sections["variant"] == {"status": 200, "data": {"result": "annonars"}, "error": None}
+    assert sections["consequences"]["data"] == {"result": "mehari"}
+    assert sections["variantvalidator"]["data"] == {"flag": "gene_variant"}
+    assert sections["acmg"]["status"] == 200
+    assert sections["acmg"]["data"]["pvs1"] is True
+    assert sections["bookmark"]["status"] == 401
+
+
+@pytest.mark.anyio
+async def test_aggregate_seqvar_partial(
+    mocked_upstreams, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that failed sections are marked while the others are returned."""
+    # arrange:
+    httpx_mock.add_response(url=ANNONARS_VARIANT_URL, json={"result": "annonars"})
+    httpx_mock.add_response(url=MEHARI_SEQVAR_URL, status_code=500, text="mehari failed")
+    httpx_mock.add_response(url=VARIANTVALIDATOR_URL, json={"flag": "gene_variant"})
+    httpx_mock.add_exception(httpx.ReadTimeout("timeout"), url=WINTERVAR_URL)
+    # act:
+    response = client.get(f"/internal/aggregate/seqvar/{SEQVAR}")
+    # assert:
+    assert response.status_code == 200
+    sections = response.json()["sections"]
+    assert sections["variant"]["data"] == {"result": "annonars"}
+    assert sections["consequences"] == {"status": 500, "data": None, "error": "mehari failed"}
+    assert sections["acmg"]["status"] == 502
+    assert "ReadTimeout" in sections["acmg"]["error"]
+
+
+@pytest.mark.anyio
+async def test_aggregate_seqvar_timeout(
+    mocked_upstreams, monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a slow upstream only delays the response by the section timeout."""
+    # arrange:
+    monkeypatch.setattr(settings, "AGGREGATE_SECTION_TIMEOUT", 0.2)
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(2.0)
+        return httpx.Response(200, json={})
+
+    httpx_mock.add_response(url=ANNONARS_VARIANT_URL, json={"result": "annonars"})
+    httpx_mock.add_response(url=MEHARI_SEQVAR_URL, json={"result": "mehari"})
+    httpx_mock.add_callback(slow, url=VARIANTVALIDATOR_URL, is_reusable=True)
+    httpx_mock.add_response(url=WINTERVAR_URL, json={})
+    # act:
+    response = client.get(f"/internal/aggregate/seqvar/{SEQVAR}")
+    # assert:
+    assert response.status_code == 200
+    sections = response.json()["sections"]
+    assert sections["variantvalidator"]["status"] == 504
+    assert sections["variant"]["status"] == 200
+
+
+@pytest.mark.anyio
+async def test_aggregate_seqvar_invalid(client: TestClient):
+    """Test that invalid variant names are rejected."""
+    # act:
+    response = client.get("/internal/aggregate/seqvar/grch37-1-55516888-G")
+    # assert:
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "test_user, client_user", [(UserChoice.REGULAR, UserChoice.REGULAR)], indirect=True
+)
+async def test_aggregate_strucvar(
+    mocked_upstreams,
+    httpx_mock: HTTPXMock,
+    db_session: AsyncSession,
+    test_user: User,
+    client_user: TestClient,
+):
+    """Test aggregating the sections of a structural variant with a bookmark."""
+    # arrange:
+    region = {
+        "genome_release": "grch37",
+        "chromosome": "17",
+        "start": "41176312",
+        "stop": "41277500",
+    }
+    httpx_mock.add_response(
+        url=httpx.URL(
+            f"http://{MOCKED_BACKEND_HOST}/mehari/strucvars/csq",
+            params={"sv_type": "DEL", **region},
+        ),
+        json={"result": "mehari"},
+    )
+    httpx_mock.add_response(
+        url=httpx.URL(f"http://{MOCKED_BACKEND_HOST}/annonars/clinvar-sv/query", params=region),
+        json={"records": []},
+    )
+    await crud.bookmark.create(
+        db_session,
+        obj_in=BookmarkCreate(user=test_user.id, obj_type=BookmarkTypes.strucvar, obj_id=STRUCVAR),
+    )
+    # act:
+    response = client_user.get(f"/internal/aggregate/strucvar/{STRUCVAR}")
+    # assert:
+    assert response.status_code == 200
+    sections = response.json()["sections"]
+    assert sections["consequences"]["data"] == {"result": "mehari"}
+    assert sections["clinvar"]["data"] == {"records": []}
+    assert sections["bookmark"]["status"] == 200
+    assert sections["bookmark"]["data"]["obj_id"] == STRUCVAR
+
+
+def add_gene_responses(httpx_mock: HTTPXMock, info_status: int = 200):
+    """Add the mocked responses for the sections of the gene aggregate."""
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/annonars/genes/info?hgnc_id={HGNC_ID}",
+        status_code=info_status,
+        json=GENE_INFO if info_status == 200 else {},
+    )
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/annonars/genes/clinvar?hgnc_id={HGNC_ID}",
+        json={"genes": {}},
+    )
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/viguno/hpo/genes?gene_id={HGNC_ID}&hpo_terms=true",
+        json=[{"gene_symbol": "BRCA1"}],
+    )
+    if info_status == 200:
+        httpx_mock.add_response(
+            url=(
+                "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/search/"
+                "?text=@GENE_BRCA1&sort=score%20desc"
+            ),
+            json={"results": []},
+        )
+
+
+@pytest.mark.anyio
+async def test_aggregate_gene(mocked_upstreams, httpx_mock: HTTPXMock, client: TestClient):
+    """Test streaming the sections of a gene and serving them from the cache."""
+    # arrange:
+    add_gene_responses(httpx_mock)
+    # act:
+    response = client.get(f"/internal/aggregate/gene/{HGNC_ID}")
+    cached = client.get(f"/internal/aggregate/gene/{HGNC_ID}")
+    # assert:
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    sections = {line["section"]: line for line in map(json.loads, response.text.splitlines())}
+    assert set(sections) == {"info", "clinvar", "hpo", "literature"}
+    assert sections["info"]["data"] == GENE_INFO
+    assert sections["hpo"]["data"] == [{"gene_symbol": "BRCA1"}]
+    assert sections["literature"]["data"] == {"results": []}
+    assert cached.status_code == 200
+    assert sorted(cached.text.splitlines()) == sorted(response.text.splitlines())
+
+
+@pytest.mark.anyio
+async def test_aggregate_gene_literature_not_cached(
+    mocked_upstreams, httpx_mock: HTTPXMock, client: TestClient, monkeypatch: MonkeyPatch
+):
+    """Test that the literature is searched again when the other sections are cached."""
+    # arrange:
+    monkeypatch.setattr(settings, "REMOTE_CACHE_TTLS", {})
+    add_gene_responses(httpx_mock)
+    httpx_mock.add_response(
+        url=(
+            "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/search/"
+            "?text=@GENE_BRCA1&sort=score%20desc"
+        ),
+        json={"results": [{"pmid": 1}]},
+    )
+    # act:
+    client.get(f"/internal/aggregate/gene/{HGNC_ID}")
+    cached = client.get(f"/internal/aggregate/gene/{HGNC_ID}")
+    # assert:
+    sections = {line["section"]: line for line in map(json.loads, cached.text.splitlines())}
+    assert set(sections) == {"info", "clinvar", "hpo", "literature"}
+    assert sections["info"]["data"] == GENE_INFO
+    assert sections["literature"]["data"] == {"results": [{"pmid": 1}]}
+
+
+@pytest.mark.anyio
+async def test_aggregate_gene_info_failed(
+    mocked_upstreams, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a failed gene info marks the dependent section and is not cached."""
+    # arrange:
+    add_gene_responses(httpx_mock, info_status=500)
+    # The other sections are served from the proxy cache on the second request.
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/annonars/genes/info?hgnc_id={HGNC_ID}", status_code=500
+    )
+    # act:
+    response = client.get(f"/internal/aggregate/gene/{HGNC_ID}")
+    second = client.get(f"/internal/aggregate/gene/{HGNC_ID}")
+    # assert:
+    sections = {line["section"]: line for line in map(json.loads, response.text.splitlines())}
+    assert sections["info"]["status"] == 500
+    assert sections["literature"]["status"] == 424
+    assert sections["clinvar"]["status"] == 200
+    assert second.text.count("\n") == 4
+
+
+@pytest.mark.anyio
+async def test_aggregate_gene_invalid(client: TestClient):
+    """Test that invalid HGNC IDs are rejected."""
+    # act:
+    response = client.get("/internal/aggregate/gene/BRCA1")
+    # assert:
+    assert response.status_code == 422
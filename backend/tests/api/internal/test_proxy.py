@@ -1,9 +1,22 @@
+import asyncio
+import json
+import zlib
+
+import httpx
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
 from fastapi.testclient import TestClient
+from prometheus_client import generate_latest
+from pytest_httpx import IteratorStream
 from pytest_httpx._httpx_mock import HTTPXMock
 
-from app.core.config import settings
+from app.api.internal.endpoints import proxy
+from app.core.cache import response_cache
+from app.core.config import ProxyUpstreamConfig, settings
+from app.core.dataversions import DATA_VERSIONS
+from app.core.metrics import registry
+from app.core.resilience import upstream_guards
+from app.core.upstreams import UpstreamRegistry
 
 #: Host name to use for the mocked backend.
 MOCKED_BACKEND_HOST = "mocked-backend"
@@ -11,12 +24,16 @@ MOCKED_BACKEND_HOST = "mocked-backend"
 #: A "token" to be used in test URLs, does not carry a meaning as it is mocked.
 MOCKED_URL_TOKEN = "xXTeStXxx"
 
+#: A JSON body that is large enough to be compressed.
+LARGE_JSON_BODY = json.dumps({"genes": [{"hgnc_id": f"HGNC:{i}"} for i in range(200)]})
+
 
 @pytest.mark.anyio
 async def test_proxy_annonars(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient):
     """Test proxying to annonars backend."""
     # arrange:
     monkeypatch.setattr(settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
     httpx_mock.add_response(
         url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
         method="GET",
@@ -34,6 +51,7 @@ async def test_proxy_mehari(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, cli
     """Test proxying to mehari backend."""
     # arrange:
     monkeypatch.setattr(settings, "BACKEND_PREFIX_MEHARI", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
     httpx_mock.add_response(
         url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
         method="GET",
@@ -51,6 +69,7 @@ async def test_proxy_viguno(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, cli
     """Test proxying to viguno backend."""
     # arrange:
     monkeypatch.setattr(settings, "BACKEND_PREFIX_VIGUNO", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
     httpx_mock.add_response(
         url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
         method="GET",
@@ -68,6 +87,7 @@ async def test_proxy_nginx(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, clie
     """Test proxying to nginx backend."""
     # arrange:
     monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
     httpx_mock.add_response(
         url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
         method="GET",
@@ -85,6 +105,7 @@ async def test_proxy_dotty(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, clie
     """Test proxying to dotty backend."""
     # arrange:
     monkeypatch.setattr(settings, "BACKEND_PREFIX_DOTTY", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
     httpx_mock.add_response(
         url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
         method="GET",
@@ -102,6 +123,7 @@ async def test_proxy_cada_prio(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock,
     """Test proxying to cada-prio backend."""
     # arrange:
     monkeypatch.setattr(settings, "BACKEND_PREFIX_CADA_PRIO", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
     httpx_mock.add_response(
         url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
         method="GET",
@@ -122,3 +144,664 @@ async def test_invalid_proxy_route(client: TestClient):
     # assert:
     assert response.status_code == 404
     assert response.text == "Reverse proxy route not found"
+
+
+@pytest.mark.anyio
+async def test_proxy_configured_upstream(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test proxying to an upstream configured in ``PROXY_UPSTREAMS``."""
+    # arrange:
+    monkeypatch.setattr(
+        settings,
+        "PROXY_UPSTREAMS",
+        [ProxyUpstreamConfig(name="pharmgkb", base_urls=[f"http://{MOCKED_BACKEND_HOST}/api/"])],
+    )
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/api/{MOCKED_URL_TOKEN}?q=1",
+        method="GET",
+        text="Mocked response",
+    )
+    # act:
+    response = client.get(f"/internal/proxy/pharmgkb/{MOCKED_URL_TOKEN}?q=1")
+    # assert:
+    assert response.status_code == 200
+    assert response.text == "Mocked response"
+
+
+@pytest.mark.anyio
+async def test_proxy_method_not_allowed(monkeypatch: MonkeyPatch, client: TestClient):
+    """Test that methods not allowed for an upstream are rejected."""
+    # arrange:
+    monkeypatch.setattr(
+        settings,
+        "PROXY_UPSTREAMS",
+        [
+            ProxyUpstreamConfig(
+                name="pharmgkb", base_urls=[f"http://{MOCKED_BACKEND_HOST}"], methods=["GET"]
+            )
+        ],
+    )
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    # act:
+    response = client.post(f"/internal/proxy/pharmgkb/{MOCKED_URL_TOKEN}")
+    # assert:
+    assert response.status_code == 405
+
+
+@pytest.mark.anyio
+async def test_proxy_cache_hit(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient):
+    """Test that a repeated request to a cacheable upstream is served from the cache."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}?a=1&b=2",
+        method="GET",
+        text="Mocked response",
+        headers={"x-upstream": "annonars"},
+    )
+    # act:
+    response_1 = client.get(f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}?a=1&b=2")
+    response_2 = client.get(f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}?b=2&a=1")
+    # assert:
+    assert len(httpx_mock.get_requests()) == 1
+    assert response_1.text == response_2.text == "Mocked response"
+    assert response_2.headers["x-upstream"] == "annonars"
+    assert response_cache.stats()["hits_memory"] == 1
+    assert response_cache.stats()["misses"] == 1
+
+
+@pytest.mark.anyio
+async def test_proxy_cache_post_body(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that POST requests with different bodies are cached separately."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_CADA_PRIO", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="POST",
+        match_content=b'{"hpo": ["HP:1"]}',
+        text="one",
+    )
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="POST",
+        match_content=b'{"hpo": ["HP:2"]}',
+        text="two",
+    )
+    # act:
+    responses = [
+        client.post(f"/internal/proxy/cada-prio/{MOCKED_URL_TOKEN}", content=body)
+        for body in (b'{"hpo": ["HP:1"]}', b'{"hpo": ["HP:2"]}', b'{"hpo": ["HP:1"]}')
+    ]
+    # assert:
+    assert [r.text for r in responses] == ["one", "two", "one"]
+    assert len(httpx_mock.get_requests()) == 2
+
+
+@pytest.mark.anyio
+async def test_proxy_streams_request_body(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that request bodies of unknown length are streamed to the upstream."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_AUTOACMG", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="POST",
+        match_content=b"x" * 3 * 65536,
+        text="Mocked response",
+    )
+
+    def chunks():
+        for _ in range(3):
+            yield b"x" * 65536
+
+    # act:
+    response = client.post(f"/internal/proxy/auto-acmg/{MOCKED_URL_TOKEN}", content=chunks())
+    # assert:
+    assert response.status_code == 200
+    assert response.text == "Mocked response"
+    assert httpx_mock.get_requests()[0].headers["transfer-encoding"] == "chunked"
+
+
+@pytest.mark.anyio
+async def test_proxy_cache_streamed_body_not_cached(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that POST requests to cacheable upstreams with bodies of unknown length bypass the cache."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_CADA_PRIO", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="POST",
+        match_content=b'{"hpo": ["HP:1"]}',
+        text="one",
+        is_reusable=True,
+    )
+    # act:
+    for _ in range(2):
+        client.post(
+            f"/internal/proxy/cada-prio/{MOCKED_URL_TOKEN}", content=iter([b'{"hpo": ["HP:1"]}'])
+        )
+    # assert:
+    assert len(httpx_mock.get_requests()) == 2
+    assert response_cache.stats()["memory_entries"] == 0
+
+
+@pytest.mark.anyio
+async def test_proxy_cache_data_version(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a new data version invalidates cached responses."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_MEHARI", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="GET",
+        text="Mocked response",
+        is_reusable=True,
+    )
+    # act:
+    client.get(f"/internal/proxy/mehari/{MOCKED_URL_TOKEN}")
+    monkeypatch.setattr(DATA_VERSIONS, "mehari", "99.0.0")
+    client.get(f"/internal/proxy/mehari/{MOCKED_URL_TOKEN}")
+    # assert:
+    assert len(httpx_mock.get_requests()) == 2
+
+
+@pytest.mark.anyio
+async def test_proxy_etag_not_modified(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a matching ``If-None-Match`` is answered without contacting the upstream."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "PROXY_CACHE_ENABLED", False)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="GET",
+        text="Mocked response",
+        headers={"etag": '"upstream"'},
+    )
+    # act:
+    response = client.get(f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}")
+    etag = response.headers["etag"]
+    response_revalidated = client.get(
+        f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}", headers={"if-none-match": etag}
+    )
+    # assert:
+    assert etag != '"upstream"'
+    assert response_revalidated.status_code == 304
+    assert response_revalidated.headers["etag"] == etag
+    assert response_revalidated.content == b""
+    assert len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.anyio
+async def test_proxy_etag_not_modified_any(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that ``If-None-Match: *`` is answered with 304 without contacting the upstream."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    # act:
+    response = client.get(
+        f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}", headers={"if-none-match": "*"}
+    )
+    # assert:
+    assert response.status_code == 304
+    assert response.headers["etag"].startswith('"')
+    assert len(httpx_mock.get_requests()) == 0
+
+
+@pytest.mark.anyio
+async def test_proxy_etag_data_version(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a new data version changes the ETag."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_MEHARI", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="GET",
+        text="Mocked response",
+        is_reusable=True,
+    )
+    etag = client.get(f"/internal/proxy/mehari/{MOCKED_URL_TOKEN}").headers["etag"]
+    # act:
+    monkeypatch.setattr(DATA_VERSIONS, "mehari", "99.0.0")
+    response = client.get(
+        f"/internal/proxy/mehari/{MOCKED_URL_TOKEN}", headers={"if-none-match": etag}
+    )
+    # assert:
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_proxy_etag_expires(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that ETags are sent with a bounded max age and change with the period."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "PROXY_CACHE_ENABLED", False)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="GET",
+        text="Mocked response",
+        is_reusable=True,
+    )
+    monkeypatch.setattr(proxy, "validity_period", lambda: (1, 60))
+    response = client.get(f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}")
+    etag = response.headers["etag"]
+    # act:
+    monkeypatch.setattr(proxy, "validity_period", lambda: (2, 3600))
+    response_revalidated = client.get(
+        f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}", headers={"if-none-match": etag}
+    )
+    # assert:
+    assert response.headers["cache-control"] == "max-age=60"
+    assert response_revalidated.status_code == 200
+    assert response_revalidated.headers["etag"] != etag
+    assert response_revalidated.headers["cache-control"] == "max-age=3600"
+    assert len(httpx_mock.get_requests()) == 2
+
+
+@pytest.mark.anyio
+async def test_proxy_no_etag_for_uncacheable(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that responses of non-cacheable upstreams get no ETag."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}", method="GET", text="Mocked"
+    )
+    # act:
+    response = client.get(f"/internal/proxy/nginx/{MOCKED_URL_TOKEN}")
+    # assert:
+    assert "etag" not in response.headers
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("status_code,body_size", [(404, 10), (200, 2048)])
+async def test_proxy_cache_not_stored(
+    status_code: int,
+    body_size: int,
+    monkeypatch: MonkeyPatch,
+    httpx_mock: HTTPXMock,
+    client: TestClient,
+):
+    """Test that errors and responses above the size limit are not cached."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_VIGUNO", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "PROXY_CACHE_MAX_ITEM_BYTES", 1024)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="GET",
+        status_code=status_code,
+        content=b"x" * body_size,
+        is_reusable=True,
+    )
+    # act:
+    for _ in range(2):
+        response = client.get(f"/internal/proxy/viguno/{MOCKED_URL_TOKEN}")
+        assert response.status_code == status_code
+    # assert:
+    assert len(httpx_mock.get_requests()) == 2
+    assert response_cache.stats()["memory_entries"] == 0
+
+
+@pytest.mark.anyio
+async def test_proxy_cache_large_response_streamed(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that responses above the size limit are streamed through with one upstream call."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_VIGUNO", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "PROXY_CACHE_MAX_ITEM_BYTES", 1024)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="GET",
+        stream=IteratorStream([b"x" * 1000, b"y" * 1000, b"z" * 1000]),
+    )
+    # act:
+    response = client.get(f"/internal/proxy/viguno/{MOCKED_URL_TOKEN}")
+    # assert:
+    assert response.status_code == 200
+    assert response.content == b"x" * 1000 + b"y" * 1000 + b"z" * 1000
+    assert "etag" in response.headers
+    # streamed, not buffered into a response of known length
+    assert "content-length" not in response.headers
+    assert len(httpx_mock.get_requests()) == 1
+    assert response_cache.stats()["memory_entries"] == 0
+
+
+@pytest.mark.anyio
+async def test_proxy_not_cacheable(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that responses of non-cacheable upstreams are not cached."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}",
+        method="GET",
+        text="Mocked response",
+        is_reusable=True,
+    )
+    # act:
+    for _ in range(2):
+        client.get(f"/internal/proxy/nginx/{MOCKED_URL_TOKEN}")
+    # assert:
+    assert len(httpx_mock.get_requests()) == 2
+    assert response_cache.stats()["misses"] == 0
+
+
+@pytest.mark.anyio
+async def test_proxy_coalesces_concurrent_requests(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that identical concurrent GET requests result in one upstream call."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+
+    async def slow_upstream(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, text="Mocked response")
+
+    httpx_mock.add_callback(
+        slow_upstream, url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}", method="GET"
+    )
+    transport = httpx.ASGITransport(app=client.app)
+    # act:
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(
+            *(async_client.get(f"/internal/proxy/annonars/{MOCKED_URL_TOKEN}") for _ in range(20))
+        )
+    # assert:
+    assert [r.text for r in responses] == ["Mocked response"] * 20
+    assert len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.anyio
+async def test_proxy_batch(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient):
+    """Test batch endpoint with mixed results."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_ANNONARS", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_MEHARI", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/annos?q=1", method="GET", json={"res": "annos"}
+    )
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/tx",
+        method="POST",
+        match_json={"hgnc_id": "HGNC:1100"},
+        text="tx",
+    )
+    httpx_mock.add_response(url=f"http://{MOCKED_BACKEND_HOST}/missing", status_code=404)
+    # act:
+    response = client.post(
+        "/internal/proxy/batch",
+        json={
+            "requests": [
+                {"id": "annos", "path": "annonars/annos?q=1"},
+                {
+                    "id": "tx",
+                    "method": "POST",
+                    "path": "mehari/tx",
+                    "body": {"hgnc_id": "HGNC:1100"},
+                },
+                {"path": "annonars/missing"},
+                {"id": "unknown", "path": "unknown/foo"},
+            ]
+        },
+    )
+    # assert:
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = {r["id"]: r for r in map(json.loads, response.text.splitlines())}
+    assert results["annos"]["status"] == 200
+    assert results["annos"]["body"] == {"res": "annos"}
+    assert results["tx"]["status"] == 200
+    assert results["tx"]["body"] == "tx"
+    assert results["2"]["status"] == 404
+    assert results["unknown"]["status"] == 404
+    assert results["unknown"]["body"] == "Reverse proxy route not found"
+
+
+@pytest.mark.anyio
+async def test_proxy_batch_upstream_error(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a failing upstream only fails its own sub-request."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_exception(
+        httpx.ConnectError("refused"), url=f"http://{MOCKED_BACKEND_HOST}/a", is_reusable=True
+    )
+    httpx_mock.add_response(url=f"http://{MOCKED_BACKEND_HOST}/b", text="b")
+    # act:
+    response = client.post(
+        "/internal/proxy/batch",
+        json={"requests": [{"id": "a", "path": "nginx/a"}, {"id": "b", "path": "nginx/b"}]},
+    )
+    # assert:
+    results = {r["id"]: r for r in map(json.loads, response.text.splitlines())}
+    assert results["a"]["status"] == 502
+    assert results["b"]["status"] == 200
+
+
+@pytest.mark.anyio
+async def test_proxy_batch_streams_in_completion_order(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that results are streamed as they complete with bounded concurrency."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "PROXY_BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    in_flight = 0
+    max_in_flight = 0
+
+    async def slow_upstream(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(float(request.url.params["delay"]))
+        in_flight -= 1
+        return httpx.Response(200, text="Mocked response")
+
+    httpx_mock.add_callback(slow_upstream, is_reusable=True)
+    delays = [0.3, 0.1, 0.05, 0.0]
+    # act:
+    response = client.post(
+        "/internal/proxy/batch",
+        json={"requests": [{"path": f"nginx/x?delay={delay}"} for delay in delays]},
+    )
+    # assert:
+    ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert ids == ["1", "2", "3", "0"]
+    assert max_in_flight == 2
+
+
+@pytest.mark.anyio
+async def test_proxy_batch_too_many_items(client: TestClient):
+    """Test that the number of sub-requests is limited."""
+    # act:
+    response = client.post(
+        "/internal/proxy/batch",
+        json={"requests": [{"path": "nginx/x"}] * (settings.PROXY_BATCH_MAX_ITEMS + 1)},
+    )
+    # assert:
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_proxy_compresses_identity_upstream(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that uncompressed upstream responses are compressed by the proxy."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/large",
+        text=LARGE_JSON_BODY,
+        headers={"content-type": "application/json"},
+    )
+    # act:
+    response = client.get("/internal/proxy/nginx/large", headers={"accept-encoding": "gzip"})
+    # assert:
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == LARGE_JSON_BODY
+
+
+@pytest.mark.anyio
+async def test_proxy_passes_through_compressed_upstream(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that compressed upstream responses are passed through without re-encoding."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    compressed = zlib.compress(LARGE_JSON_BODY.encode())
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/large",
+        content=compressed,
+        headers={"content-type": "application/json", "content-encoding": "deflate"},
+    )
+    # act:
+    with client.stream(
+        "GET", "/internal/proxy/nginx/large", headers={"accept-encoding": "gzip, deflate"}
+    ) as response:
+        raw = b"".join(response.iter_raw())
+    # assert:
+    assert response.headers["content-encoding"] == "deflate"
+    assert raw == compressed
+
+
+@pytest.mark.anyio
+async def test_proxy_circuit_breaker(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a failing upstream opens the breaker and is then not contacted."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "UPSTREAM_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(settings, "UPSTREAM_BREAKER_OPEN_SECONDS", 0.2)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    healthy = False
+
+    async def faulty_upstream(request: httpx.Request) -> httpx.Response:
+        if not healthy:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, text="Mocked response")
+
+    httpx_mock.add_callback(faulty_upstream, is_reusable=True)
+    # act:
+    for _ in range(3):
+        with pytest.raises(httpx.ConnectError):
+            client.get(f"/internal/proxy/nginx/{MOCKED_URL_TOKEN}")
+    response_open = client.get(f"/internal/proxy/nginx/{MOCKED_URL_TOKEN}")
+    state = upstream_guards.state()["nginx"]
+    healthy = True
+    await asyncio.sleep(0.3)
+    response_probe = client.get(f"/internal/proxy/nginx/{MOCKED_URL_TOKEN}")
+    # assert:
+    assert response_open.status_code == 503
+    assert response_open.headers["retry-after"] == "1"
+    assert state["state"] == "open"
+    assert len(httpx_mock.get_requests()) == 4
+    assert response_probe.status_code == 200
+    assert upstream_guards.state()["nginx"]["state"] == "closed"
+
+
+@pytest.mark.anyio
+async def test_proxy_circuit_breaker_server_errors(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that server errors of a cacheable upstream open the breaker."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_MEHARI", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "UPSTREAM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(status_code=500, is_reusable=True)
+    # act:
+    responses = [client.get(f"/internal/proxy/mehari/{MOCKED_URL_TOKEN}") for _ in range(3)]
+    # assert:
+    assert [r.status_code for r in responses] == [500, 500, 503]
+    assert len(httpx_mock.get_requests()) == 2
+
+
+@pytest.mark.anyio
+async def test_proxy_bulkhead(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient):
+    """Test that requests beyond the in-flight limit and the wait queue fail fast."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_IN_FLIGHT", 2)
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_QUEUE", 1)
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+
+    async def slow_upstream(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, text="Mocked response")
+
+    httpx_mock.add_callback(slow_upstream, is_reusable=True)
+    transport = httpx.ASGITransport(app=client.app)
+    # act:
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(
+            *(async_client.get(f"/internal/proxy/nginx/{i}") for i in range(5))
+        )
+    # assert:
+    assert sorted(r.status_code for r in responses) == [200, 200, 200, 503, 503]
+    assert len(httpx_mock.get_requests()) == 3
+
+
+@pytest.mark.anyio
+async def test_proxy_metrics(monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient):
+    """Test that status code and bytes of proxied responses are recorded in the metrics."""
+    # arrange:
+    monkeypatch.setattr(settings, "BACKEND_PREFIX_NGINX", f"http://{MOCKED_BACKEND_HOST}")
+    monkeypatch.setattr(proxy, "upstream_registry", UpstreamRegistry.from_settings(settings))
+    httpx_mock.add_response(
+        url=f"http://{MOCKED_BACKEND_HOST}/{MOCKED_URL_TOKEN}", status_code=404, text="x" * 10
+    )
+    labels = {"upstream": "nginx", "status": "404"}
+    responses_before = registry.get_sample_value("reev_upstream_responses_total", labels) or 0
+    bytes_before = (
+        registry.get_sample_value("reev_upstream_response_bytes_total", {"upstream": "nginx"}) or 0
+    )
+    # act:
+    response = client.get(f"/internal/proxy/nginx/{MOCKED_URL_TOKEN}")
+    # assert:
+    assert response.status_code == 404
+    assert registry.get_sample_value("reev_upstream_responses_total", labels) == (
+        responses_before + 1
+    )
+    assert registry.get_sample_value(
+        "reev_upstream_response_bytes_total", {"upstream": "nginx"}
+    ) == (bytes_before + 10)
+    metrics = generate_latest(registry).decode()
+    assert 'reev_upstream_request_duration_seconds_count{upstream="nginx"}' in metrics
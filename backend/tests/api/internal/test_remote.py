@@ -1,8 +1,25 @@
+import asyncio
+import contextlib
+import json
+
+import httpx
 import pytest
+from _pytest.monkeypatch import MonkeyPatch
 from fastapi.testclient import TestClient
+from kombu.exceptions import OperationalError
+from prometheus_client import generate_latest
 from pytest_httpx._httpx_mock import HTTPXMock
+from pytest_mock import MockerFixture
 
+from app import autocnv
+from app.api.internal.endpoints import remote
 from app.api.internal.endpoints.remote import default_acmg_rating
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.resilience import upstream_guards
+from app.schemas.remote import AutoCnvJob, AutoCnvJobCreate, AutoCnvJobStatus
+from tests.conftest import UserChoice
+from tests.utils import FakeRedis
 
 #: Host name to use for the mocked backend.
 MOCKED_BACKEND_HOST = "mocked-backend"
@@ -86,3 +103,400 @@ async def test_pubtator3_api(httpx_mock: HTTPXMock, client: TestClient):
     # assert:
     assert response.status_code == 200
     assert response.json() == {"res": "Mocked response"}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "path,upstream_url",
+    [
+        (
+            f"/internal/remote/variantvalidator/{MOCKED_URL_TOKEN}",
+            f"https://rest.variantvalidator.org/VariantValidator/variantvalidator/{MOCKED_URL_TOKEN}",
+        ),
+        (
+            "/internal/remote/pubtator3-api/foo",
+            "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/foo",
+        ),
+        (
+            "/internal/remote/cnv/acmg/?chromosome=1&start=123&end=456&func=foo",
+            "https://phoenix.bgi.com/api/acit/jobs/",
+        ),
+    ],
+)
+async def test_remote_coalesces_concurrent_requests(
+    path: str, upstream_url: str, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that identical concurrent requests result in one call to the remote service."""
+
+    # arrange:
+    async def slow_upstream(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json={"res": "Mocked response"})
+
+    httpx_mock.add_callback(slow_upstream, url=upstream_url)
+    transport = httpx.ASGITransport(app=client.app)
+    # act:
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*(async_client.get(path) for _ in range(20)))
+    # assert:
+    assert [r.json() for r in responses] == [{"res": "Mocked response"}] * 20
+    assert len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.anyio
+async def test_remote_circuit_breaker(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a failing remote service opens its breaker and fails fast with 503."""
+    # arrange:
+    monkeypatch.setattr(settings, "UPSTREAM_BREAKER_FAILURES", 2)
+    httpx_mock.add_response(
+        url="https://www.ncbi.nlm.nih.gov/research/pubtator3-api/foo",
+        status_code=502,
+        is_reusable=True,
+    )
+    # act:
+    responses = [client.get("/internal/remote/pubtator3-api/foo") for _ in range(3)]
+    # assert:
+    assert [r.status_code for r in responses] == [502, 502, 503]
+    assert "retry-after" in responses[2].headers
+    assert upstream_guards.state()["www.ncbi.nlm.nih.gov"]["state"] == "open"
+
+
+@pytest.mark.anyio
+async def test_remote_hedged_request(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that a slow GET to a remote service without rate limit is hedged."""
+    # arrange:
+    monkeypatch.setattr(settings, "UPSTREAM_HEDGE_MAX_DELAY", 0.05)
+    monkeypatch.delitem(settings.REMOTE_RATE_LIMITS, "www.ncbi.nlm.nih.gov")
+    calls = 0
+
+    async def slow_then_fast(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1.0)
+        return httpx.Response(200, json={"call": calls})
+
+    httpx_mock.add_callback(
+        slow_then_fast,
+        url="https://www.ncbi.nlm.nih.gov/research/pubtator3-api/foo",
+        is_reusable=True,
+    )
+    # act:
+    response = client.get("/internal/remote/pubtator3-api/foo")
+    # assert:
+    assert response.status_code == 200
+    assert response.json() == {"call": 2}
+    state = upstream_guards.state()["www.ncbi.nlm.nih.gov"]
+    assert state["hedges_won"] == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "test_user, client_user", [(UserChoice.SUPERUSER, UserChoice.SUPERUSER)], indirect=True
+)
+async def test_remote_cache(httpx_mock: HTTPXMock, client_user: TestClient):
+    """Test that remote responses are cached until they are purged."""
+    # arrange:
+    httpx_mock.add_response(
+        url="https://www.ncbi.nlm.nih.gov/research/pubtator3-api/foo",
+        json={"res": "Mocked response"},
+        is_reusable=True,
+    )
+    # act:
+    first = client_user.get("/internal/remote/pubtator3-api/foo")
+    cached = client_user.get("/internal/remote/pubtator3-api/foo")
+    stats = client_user.get("/internal/remote-cache/stats").json()
+    purged = client_user.delete("/internal/remote-cache?service=pubtator3")
+    after_purge = client_user.get("/internal/remote/pubtator3-api/foo")
+    # assert:
+    assert first.json() == cached.json() == after_purge.json() == {"res": "Mocked response"}
+    assert stats["hits"] == 1
+    assert stats["services"]["pubtator3"]["entries"] == 1
+    assert purged.json() == {"purged": 1}
+    assert len(httpx_mock.get_requests()) == 2
+
+
+@pytest.mark.anyio
+async def test_remote_cache_purge_requires_superuser(client: TestClient):
+    """Test that anonymous users cannot purge the remote service cache."""
+    # act:
+    response = client.delete("/internal/remote-cache")
+    # assert:
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_remote_cache_stale_while_revalidate(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that stale responses are returned at once and refreshed in the background."""
+    # arrange:
+    monkeypatch.setitem(settings.REMOTE_CACHE_TTLS, "pubtator3", -1)
+    calls = 0
+
+    async def counting(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json={"call": calls})
+
+    httpx_mock.add_callback(
+        counting, url="https://www.ncbi.nlm.nih.gov/research/pubtator3-api/foo", is_reusable=True
+    )
+    transport = httpx.ASGITransport(app=client.app)
+    # act:
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        first = await async_client.get("/internal/remote/pubtator3-api/foo")
+        stale = await async_client.get("/internal/remote/pubtator3-api/foo")
+        await asyncio.gather(*remote.revalidations)
+        refreshed = await async_client.get("/internal/remote/pubtator3-api/foo")
+        await asyncio.gather(*remote.revalidations)
+    # assert:
+    assert first.json() == stale.json() == {"call": 1}
+    assert refreshed.json() == {"call": 2}
+
+
+@pytest.mark.anyio
+async def test_remote_rate_limit(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, client: TestClient
+):
+    """Test that requests beyond the outbound rate limit fail fast with 503."""
+    # arrange:
+    monkeypatch.setitem(settings.REMOTE_RATE_LIMITS, "www.ncbi.nlm.nih.gov", 0.1)
+    monkeypatch.setattr(settings, "REMOTE_RATE_LIMIT_MAX_WAIT", 1.0)
+    httpx_mock.add_response(
+        url="https://www.ncbi.nlm.nih.gov/research/pubtator3-api/foo", json={"res": "foo"}
+    )
+    # act:
+    first = client.get("/internal/remote/pubtator3-api/foo")
+    limited = client.get("/internal/remote/pubtator3-api/bar")
+    metrics = generate_latest(registry).decode()
+    # assert:
+    assert first.status_code == 200
+    assert limited.status_code == 503
+    assert limited.headers["retry-after"] == "10"
+    assert 'reev_rate_limit_rejected_total{host="www.ncbi.nlm.nih.gov"}' in metrics
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("failure", ["slow", "connect_error"])
+async def test_remote_rate_limit_one_request_per_token(
+    failure: str,
+    monkeypatch: MonkeyPatch,
+    httpx_mock: HTTPXMock,
+    mocker: MockerFixture,
+    client: TestClient,
+):
+    """Test that rate limited hosts get no hedged or retried requests beyond their tokens."""
+    # arrange:
+    monkeypatch.setitem(settings.REMOTE_RATE_LIMITS, "www.ncbi.nlm.nih.gov", 100.0)
+    monkeypatch.setattr(settings, "UPSTREAM_HEDGE_MAX_DELAY", 0.01)
+    acquire = mocker.spy(remote.rate_limiter, "acquire")
+    url = "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/foo"
+    if failure == "slow":
+
+        async def slow_response(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.1)
+            return httpx.Response(200, json={"res": "foo"})
+
+        httpx_mock.add_callback(slow_response, url=url, is_reusable=True)
+    else:
+        httpx_mock.add_exception(httpx.ConnectError("refused"), url=url, is_reusable=True)
+    # act:
+    with contextlib.suppress(httpx.ConnectError):
+        client.get("/internal/remote/pubtator3-api/foo")
+    # assert:
+    assert len(httpx_mock.get_requests()) == acquire.call_count == 1
+
+
+@pytest.mark.anyio
+async def test_variantvalidator_batch(httpx_mock: HTTPXMock, client: TestClient):
+    """Test that concurrent VariantValidator lookups are sent as one call and split."""
+
+    # arrange:
+    async def batch_upstream(request: httpx.Request) -> httpx.Response:
+        description = request.url.path.split("/")[-2]
+        return httpx.Response(
+            200,
+            json={
+                "flag": "gene_variant",
+                "metadata": {"variantvalidator_version": "1"},
+                "NM_1.1:c.1A>G": {"submitted_variant": "1-100-A-G"},
+                "intergenic_variant_1": {"submitted_variant": "1-200-C-T"},
+                "ignored": description,
+            },
+        )
+
+    httpx_mock.add_callback(batch_upstream)
+    transport = httpx.ASGITransport(app=client.app)
+    paths = [
+        f"/internal/remote/variantvalidator/grch37/{variant}/all?content-type=application/json"
+        for variant in ("1-100-A-G", "1-200-C-T")
+    ]
+    # act:
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*(async_client.get(path) for path in paths))
+    # assert:
+    requests = httpx_mock.get_requests()
+    assert len(requests) == 1
+    assert requests[0].url.path.endswith("/GRCh37/1-100-A-G|1-200-C-T/all")
+    assert responses[0].json() == {
+        "NM_1.1:c.1A>G": {"submitted_variant": "1-100-A-G"},
+        "flag": "gene_variant",
+        "metadata": {"variantvalidator_version": "1"},
+    }
+    assert responses[1].json()["flag"] == "intergenic"
+    assert list(responses[1].json()) == ["intergenic_variant_1", "flag", "metadata"]
+
+
+@pytest.mark.anyio
+async def test_pubtator3_export_batch(httpx_mock: HTTPXMock, client: TestClient):
+    """Test that concurrent PubTator 3 exports are sent as one call and split."""
+
+    # arrange:
+    async def batch_upstream(request: httpx.Request) -> httpx.Response:
+        pmids = request.url.params["pmids"].split(",")
+        return httpx.Response(
+            200, json={"PubTator3": [{"id": pmid, "pmid": int(pmid)} for pmid in pmids]}
+        )
+
+    httpx_mock.add_callback(batch_upstream)
+    transport = httpx.ASGITransport(app=client.app)
+    path = "/internal/remote/pubtator3-api/publications/export/biocjson?pmids="
+    # act:
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(
+            async_client.get(f"{path}1,2"), async_client.get(f"{path}2,3")
+        )
+    # assert:
+    requests = httpx_mock.get_requests()
+    assert len(requests) == 1
+    assert sorted(requests[0].url.params["pmids"].split(",")) == ["1", "2", "3"]
+    assert [doc["pmid"] for doc in responses[0].json()["PubTator3"]] == [1, 2]
+    assert [doc["pmid"] for doc in responses[1].json()["PubTator3"]] == [2, 3]
+
+
+@pytest.mark.anyio
+async def test_acmg_batch(httpx_mock: HTTPXMock, client: TestClient):
+    """Test classifying several variants, with the results cached for a second run."""
+    # arrange:
+    acmg_url = "http://wintervar.wglab.org/api_new.php?queryType=position"
+    httpx_mock.add_response(
+        url=f"{acmg_url}&chr=1&pos=100&ref=A&alt=G&build=hg19", json={"PVS1": 1, "PM2": 1}
+    )
+    httpx_mock.add_response(url=f"{acmg_url}&chr=2&pos=200&ref=C&alt=T&build=hg38", text="")
+    httpx_mock.add_exception(
+        httpx.ReadTimeout("timeout"), url=f"{acmg_url}&chr=3&pos=300&ref=G&alt=A&build=hg19"
+    )
+    variants = [
+        {"id": "a", "chromosome": "1", "position": 100, "reference": "A", "alternative": "G"},
+        {
+            "chromosome": "2",
+            "position": 200,
+            "reference": "C",
+            "alternative": "T",
+            "release": "hg38",
+        },
+        {"chromosome": "3", "position": 300, "reference": "G", "alternative": "A"},
+    ]
+    # act:
+    response = client.post("/internal/remote/acmg/batch", json={"variants": variants})
+    rerun = client.post("/internal/remote/acmg/batch", json={"variants": variants[:1]})
+    # assert:
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = {line["id"]: line for line in map(json.loads, response.text.splitlines())}
+    assert results["a"]["rating"] == {**default_acmg_rating(), "pvs1": True, "pm2": True}
+    assert results["1"] == {
+        "id": "1",
+        "status": 404,
+        "rating": None,
+        "error": "Variant not found in WinterVar",
+    }
+    assert results["2"]["status"] == 502
+    assert json.loads(rerun.text)["rating"] == results["a"]["rating"]
+    assert len(httpx_mock.get_requests()) == 3
+
+
+@pytest.mark.anyio
+async def test_acmg_batch_invalid(client: TestClient):
+    """Test that invalid variants are rejected."""
+    # act:
+    response = client.post(
+        "/internal/remote/acmg/batch",
+        json={"variants": [{"chromosome": "1", "position": 0, "reference": "A"}]},
+    )
+    # assert:
+    assert response.status_code == 422
+
+
+@pytest.fixture
+def autocnv_store(monkeypatch: MonkeyPatch) -> FakeRedis:
+    """Keep the AutoCNV jobs in memory."""
+    fake = FakeRedis()
+    monkeypatch.setattr(remote.autocnv_jobs, "redis", fake)
+    return fake
+
+
+@pytest.mark.anyio
+async def test_cnv_acmg_jobs(autocnv_store: FakeRedis, mocker: MockerFixture, client: TestClient):
+    """Test submitting an AutoCNV job and polling for its result."""
+    # arrange:
+    delay = mocker.patch("app.worker.run_autocnv_job.delay")
+    cnv = {"chromosome": "1", "start": 123, "end": 456, "func": "del"}
+    # act:
+    submitted = client.post("/internal/remote/cnv/acmg/jobs", json=cnv)
+    resubmitted = client.post("/internal/remote/cnv/acmg/jobs", json=cnv)
+    job_id = submitted.json()["id"]
+    pending = client.get(f"/internal/remote/cnv/acmg/jobs/{job_id}")
+    job = AutoCnvJob.model_validate(pending.json())
+    job.status = AutoCnvJobStatus.done
+    job.result = {"res": "Mocked response"}
+    await remote.autocnv_jobs.put(job)
+    done = client.get(f"/internal/remote/cnv/acmg/jobs/{job_id}?wait=1")
+    cached = client.post("/internal/remote/cnv/acmg/jobs", json=cnv)
+    # assert:
+    assert submitted.status_code == 202
+    assert submitted.json()["status"] == "pending"
+    assert resubmitted.json()["id"] == job_id
+    delay.assert_called_once_with(job_id)
+    assert pending.json()["status"] == "pending"
+    assert done.json()["result"] == {"res": "Mocked response"}
+    assert cached.status_code == 200
+    assert cached.json()["status"] == "done"
+
+
+@pytest.mark.anyio
+async def test_cnv_acmg_job_broker_unavailable(
+    autocnv_store: FakeRedis, mocker: MockerFixture, client: TestClient
+):
+    """Test that a job that cannot be queued fails and is queued again on resubmission."""
+    # arrange:
+    delay = mocker.patch(
+        "app.worker.run_autocnv_job.delay",
+        side_effect=[OperationalError("broker unavailable"), None],
+    )
+    cnv = {"chromosome": "1", "start": 123, "end": 456, "func": "del"}
+    # act:
+    failed = client.post("/internal/remote/cnv/acmg/jobs", json=cnv)
+    stored = await remote.autocnv_jobs.get(autocnv.job_id(AutoCnvJobCreate.model_validate(cnv)))
+    resubmitted = client.post("/internal/remote/cnv/acmg/jobs", json=cnv)
+    # assert:
+    assert failed.status_code == 503
+    assert stored is not None
+    assert stored.status == AutoCnvJobStatus.failed
+    assert resubmitted.status_code == 202
+    assert resubmitted.json()["status"] == "pending"
+    assert delay.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_cnv_acmg_job_not_found(autocnv_store: FakeRedis, client: TestClient):
+    """Test polling for an unknown AutoCNV job."""
+    # act:
+    response = client.get("/internal/remote/cnv/acmg/jobs/unknown")
+    # assert:
+    assert response.status_code == 404
@@ -0,0 +1,107 @@
+import pytest
+from pytest_httpx._httpx_mock import HTTPXMock
+from pytest_mock import MockerFixture
+
+from app import worker
+from app.autocnv import AUTOCNV_URL, REDIS_KEY_PREFIX, AutoCnvJobStore, job_id, run_job
+from app.core.config import settings
+from app.schemas.remote import AutoCnvJobCreate, AutoCnvJobStatus
+from tests.utils import FakeRedis
+
+#: The CNV to classify.
+CNV = AutoCnvJobCreate(chromosome="1", start=100, end=200, func="del")
+
+
+@pytest.fixture
+def store() -> AutoCnvJobStore:
+    store = AutoCnvJobStore()
+    store.redis = FakeRedis()  # type: ignore[assignment]
+    return store
+
+
+def test_job_id():
+    """Test that the job ID only depends on the CNV."""
+    # act:
+    other = AutoCnvJobCreate(chromosome="1", start=100, end=200, func="dup")
+    # assert:
+    assert job_id(CNV) == job_id(AutoCnvJobCreate(**CNV.model_dump()))
+    assert job_id(CNV) != job_id(other)
+
+
+@pytest.mark.anyio
+async def test_submit(store: AutoCnvJobStore):
+    """Test that a CNV gets one job until the job failed."""
+    # act:
+    job, created = await store.submit(CNV)
+    again, created_again = await store.submit(CNV)
+    job.status = AutoCnvJobStatus.failed
+    await store.put(job)
+    retried, created_retry = await store.submit(CNV)
+    # assert:
+    assert (created, created_again, created_retry) == (True, False, True)
+    assert again.id == job.id == retried.id
+    assert retried.status == AutoCnvJobStatus.pending
+
+
+@pytest.mark.anyio
+async def test_run_job(store: AutoCnvJobStore, httpx_mock: HTTPXMock):
+    """Test that the AutoCNV result is stored in the job and kept like cached responses."""
+    # arrange:
+    httpx_mock.add_response(url=AUTOCNV_URL, method="POST", json={"score": 0.9})
+    job, _ = await store.submit(CNV)
+    # act:
+    await run_job(job.id, store)
+    # assert:
+    done = await store.get(job.id)
+    assert done is not None
+    assert done.status == AutoCnvJobStatus.done
+    assert done.result == {"score": 0.9}
+    assert b"chromosome=1&start=100&end=200&func=del" in httpx_mock.get_requests()[0].content
+    fake = store.redis
+    assert isinstance(fake, FakeRedis)
+    assert fake.ttls == {REDIS_KEY_PREFIX + job.id: settings.REMOTE_CACHE_TTLS["autocnv"]}
+
+
+@pytest.mark.anyio
+async def test_run_job_failed(store: AutoCnvJobStore, httpx_mock: HTTPXMock):
+    """Test that errors of AutoCNV mark the job as failed."""
+    # arrange:
+    httpx_mock.add_response(url=AUTOCNV_URL, method="POST", status_code=500, text="boom")
+    job, _ = await store.submit(CNV)
+    # act:
+    await run_job(job.id, store)
+    # assert:
+    fake = store.redis
+    assert isinstance(fake, FakeRedis)
+    assert fake.ttls == {REDIS_KEY_PREFIX + job.id: settings.AUTOCNV_JOB_TIMEOUT}
+    failed = await store.get(job.id)
+    assert failed is not None
+    assert failed.status == AutoCnvJobStatus.failed
+    assert (failed.status_code, failed.error) == (500, "boom")
+
+
+@pytest.mark.anyio
+async def test_run_job_unexpected_error(store: AutoCnvJobStore, httpx_mock: HTTPXMock):
+    """Test that unexpected errors mark the job as failed and are raised."""
+    # arrange:
+    httpx_mock.add_exception(RuntimeError("boom"), url=AUTOCNV_URL, method="POST")
+    job, _ = await store.submit(CNV)
+    # act:
+    with pytest.raises(RuntimeError):
+        await run_job(job.id, store)
+    # assert:
+    failed = await store.get(job.id)
+    assert failed is not None
+    assert failed.status == AutoCnvJobStatus.failed
+    assert failed.error == "AutoCNV job failed: RuntimeError('boom')"
+
+
+def test_run_autocnv_job_fails_task(mocker: MockerFixture):
+    """Test that the Celery task fails if the job failed unexpectedly."""
+    # arrange:
+    mocker.patch("app.autocnv.AutoCnvJobStore.start")
+    mocker.patch("app.autocnv.AutoCnvJobStore.stop")
+    mocker.patch("app.autocnv.run_job", side_effect=RuntimeError("boom"))
+    # act, assert:
+    with pytest.raises(RuntimeError):
+        worker.run_autocnv_job("job")
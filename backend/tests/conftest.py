@@ -19,7 +19,7 @@ from sqlalchemy.ext.asyncio import (
 
 from app import crud
 from app.api import deps
-from app.api.deps import current_active_superuser, current_active_user
+from app.api.deps import current_active_superuser, current_active_user, current_optional_user
 from app.db import init_db, session
 from app.db.base import Base
 from app.main import app
@@ -197,6 +197,7 @@ def client_user(test_user: User | None, request: pytest.FixtureRequest):
     user: UserChoice = getattr(request, "param", UserChoice.REGULAR)
 
     app.dependency_overrides[current_active_user] = lambda: test_user
+    app.dependency_overrides[current_optional_user] = lambda: test_user
 
     if test_user is not None:
         app.dependency_overrides[current_active_user] = lambda: test_user
@@ -208,6 +209,7 @@ def client_user(test_user: User | None, request: pytest.FixtureRequest):
     yield client
 
     app.dependency_overrides.pop(current_active_user, None)
+    app.dependency_overrides.pop(current_optional_user, None)
     if user == UserChoice.SUPERUSER:
         app.dependency_overrides.pop(current_active_superuser, None)
 
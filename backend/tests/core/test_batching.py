@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.core.batching import MicroBatcher
+
+
+class Recorder:
+    """Batch call returning the upper-cased items and recording the calls."""
+
+    def __init__(self, fail: bool = False):
+        self.calls: list[tuple[str, list[str]]] = []
+        self.fail = fail
+
+    async def __call__(self, group: str, items: list[str]) -> dict[str, str]:
+        self.calls.append((group, items))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return {item: item.upper() for item in items if item != "missing"}
+
+
+@pytest.mark.anyio
+async def test_micro_batcher_combines_concurrent_items():
+    """Test that concurrent items of a group are looked up with one call."""
+    # arrange:
+    recorder = Recorder()
+    batcher: MicroBatcher[str, str, str] = MicroBatcher(recorder, window=0.01, max_items=10)
+    # act:
+    results = await asyncio.gather(
+        batcher.submit("a", "x"),
+        batcher.submit("a", "y"),
+        batcher.submit("a", "x"),
+        batcher.submit("b", "z"),
+    )
+    # assert:
+    assert results == ["X", "Y", "X", "Z"]
+    assert sorted(recorder.calls) == [("a", ["x", "y"]), ("b", ["z"])]
+    assert (batcher.calls, batcher.items) == (2, 3)
+
+
+@pytest.mark.anyio
+async def test_micro_batcher_max_items():
+    """Test that a full batch is sent without waiting for the window."""
+    # arrange:
+    recorder = Recorder()
+    batcher: MicroBatcher[str, str, str] = MicroBatcher(recorder, window=10.0, max_items=2)
+    # act:
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.submit("a", "x"), batcher.submit("a", "y")), 1.0
+    )
+    # assert:
+    assert results == ["X", "Y"]
+    assert batcher.pending == {}
+
+
+@pytest.mark.anyio
+async def test_micro_batcher_errors():
+    """Test that errors of the call are raised to each caller and missing items fail."""
+    # arrange:
+    failing: MicroBatcher[str, str, str] = MicroBatcher(
+        Recorder(fail=True), window=0.01, max_items=10
+    )
+    batcher: MicroBatcher[str, str, str] = MicroBatcher(Recorder(), window=0.01, max_items=10)
+    # act:
+    failed = await asyncio.gather(
+        failing.submit("a", "x"), failing.submit("a", "y"), return_exceptions=True
+    )
+    missing = await asyncio.gather(
+        batcher.submit("a", "x"), batcher.submit("a", "missing"), return_exceptions=True
+    )
+    # assert:
+    assert [type(e) for e in failed] == [RuntimeError, RuntimeError]
+    assert missing[0] == "X"
+    assert isinstance(missing[1], KeyError)
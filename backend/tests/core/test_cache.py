@@ -0,0 +1,200 @@
+import time
+
+import pytest
+import redis
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.core.cache import (
+    REDIS_KEY_PREFIX,
+    CachedResponse,
+    LruCache,
+    ResponseCache,
+    cache_key,
+    data_version,
+    entity_tag,
+    if_none_match,
+    validity_period,
+)
+from app.core.config import settings
+from app.core.dataversions import DATA_VERSIONS
+
+
+class FakeRedis:
+    """Minimal stand-in for ``redis.asyncio.Redis``."""
+
+    def __init__(self, fail: bool = False):
+        self.data: dict[str, bytes] = {}
+        self.fail = fail
+        self.calls = 0
+
+    async def get(self, key: str) -> bytes | None:
+        self.calls += 1
+        if self.fail:
+            raise redis.ConnectionError("down")
+        return self.data.get(key)
+
+    async def set(self, key: str, value: bytes, ex: int | None = None):
+        self.calls += 1
+        if self.fail:
+            raise redis.ConnectionError("down")
+        self.data[key] = value
+
+
+def test_cache_key_normalization():
+    """Test that the query order does not matter but everything else does."""
+    # arrange:
+    base = cache_key("annonars", "/genes/info", "a=1&b=2", version="1")
+    # act/assert:
+    assert cache_key("annonars", "/genes/info", "b=2&a=1", version="1") == base
+    assert cache_key("annonars", "/genes/info", "a=1&b=3", version="1") != base
+    assert cache_key("annonars", "/genes/info", "a=1&b=2", version="2") != base
+    assert cache_key("mehari", "/genes/info", "a=1&b=2", version="1") != base
+    assert cache_key("annonars", "/genes/info", "a=1&b=2", version="1", body=b"x") != base
+
+
+def test_data_version():
+    """Test lookup of data versions."""
+    # act/assert:
+    assert data_version("annonars") == DATA_VERSIONS.annonars
+    assert data_version("unknown") == "unknown"
+    assert data_version(None) == ""
+
+
+def test_entity_tag():
+    """Test that ETags depend on the data version and period but not on the query order."""
+    # act:
+    etag = entity_tag("annonars", "/genes/info", "a=1&b=2", version="1", period=1)
+    # assert:
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == entity_tag("annonars", "/genes/info", "b=2&a=1", version="1", period=1)
+    assert etag != entity_tag("annonars", "/genes/info", "a=1&b=2", version="2", period=1)
+    assert etag != entity_tag("annonars", "/genes/info", "a=1&b=2", version="1", period=2)
+    assert etag != entity_tag(
+        "annonars", "/genes/info", "a=1&b=2", version="1", period=1, accept_encoding="gzip"
+    )
+
+
+def test_validity_period(monkeypatch: MonkeyPatch):
+    """Test the periods of ``PROXY_CACHE_REDIS_TTL`` seconds that ETags are valid for."""
+    # arrange:
+    monkeypatch.setattr(settings, "PROXY_CACHE_REDIS_TTL", 100)
+    # act, assert:
+    assert validity_period(now=250.5) == (2, 50)
+    assert validity_period(now=300.0) == (3, 100)
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        ("", False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ('"xyz"', False),
+        ("*", True),
+    ],
+)
+def test_if_none_match(header: str, expected: bool):
+    """Test matching of ``If-None-Match`` headers."""
+    # act, assert:
+    assert if_none_match(header, '"abc"') == expected
+
+
+def test_cached_response_roundtrip():
+    """Test serialization of cache entries, hop-by-hop headers are dropped."""
+    # arrange:
+    entry = CachedResponse.from_upstream(
+        200, [("content-type", "text/plain"), ("transfer-encoding", "chunked")], b"a\nb"
+    )
+    # act:
+    restored = CachedResponse.from_bytes(entry.to_bytes())
+    # assert:
+    assert restored.status_code == 200
+    assert restored.headers == [("content-type", "text/plain")]
+    assert restored.body == b"a\nb"
+    assert restored.created == entry.created
+
+
+def test_cached_response_drops_per_client_headers():
+    """Test that cookies of the upstream are not stored in shared entries."""
+    # act:
+    entry = CachedResponse.from_upstream(
+        200,
+        [("content-type", "text/plain"), ("Set-Cookie", "session=1"), ("set-cookie", "a=b")],
+        b"body",
+    )
+    # assert:
+    assert entry.headers == [("content-type", "text/plain")]
+    assert b"session" not in entry.to_bytes()
+
+
+def test_lru_cache_eviction():
+    """Test that the least recently used entries are evicted to keep the budget."""
+    # arrange:
+    lru = LruCache(max_bytes=250)
+    for key in "abc":
+        lru.set(key, CachedResponse(200, [], b"x" * 100))
+    # act:
+    lru.get("b")
+    lru.set("d", CachedResponse(200, [], b"x" * 100))
+    lru.set("huge", CachedResponse(200, [], b"x" * 1000))
+    # assert:
+    assert list(lru.entries) == ["b", "d"]
+    assert lru.size == 200
+
+
+def test_lru_cache_max_age():
+    """Test that entries older than the maximal age are dropped on lookup."""
+    # arrange:
+    lru = LruCache(max_bytes=1000, max_age=60)
+    lru.set("fresh", CachedResponse(200, [], b"x" * 100))
+    lru.set("old", CachedResponse(200, [], b"x" * 100, created=time.time() - 61))
+    # act:
+    fresh = lru.get("fresh")
+    old = lru.get("old")
+    # assert:
+    assert fresh is not None
+    assert old is None
+    assert list(lru.entries) == ["fresh"]
+    assert lru.size == 100
+
+
+@pytest.mark.anyio
+async def test_response_cache_redis_tier(monkeypatch: MonkeyPatch):
+    """Test that entries from the Redis tier are used and copied to memory."""
+    # arrange:
+    cache = ResponseCache()
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "redis", fake)
+    await cache.set("key", CachedResponse(200, [], b"body"))
+    cache.memory.clear()
+    # act:
+    from_redis = await cache.get("key")
+    from_memory = await cache.get("key")
+    missing = await cache.get("other")
+    # assert:
+    assert REDIS_KEY_PREFIX + "key" in fake.data
+    assert from_redis is not None and from_redis.body == b"body"
+    assert from_memory is from_redis
+    assert missing is None
+    assert cache.stats()["hits_redis"] == 1
+    assert cache.stats()["hits_memory"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.anyio
+async def test_response_cache_redis_failure(monkeypatch: MonkeyPatch):
+    """Test that the Redis tier is skipped after a failure."""
+    # arrange:
+    cache = ResponseCache()
+    fake = FakeRedis(fail=True)
+    monkeypatch.setattr(cache, "redis", fake)
+    # act:
+    first = await cache.get("key")
+    await cache.set("key", CachedResponse(200, [], b"body"))
+    second = await cache.get("key")
+    # assert:
+    assert first is None
+    assert second is not None
+    assert fake.calls == 1
+    assert cache.stats()["redis_errors"] == 1
@@ -0,0 +1,190 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from starlette.types import Message, Receive, Scope, Send
+
+from app.core.compression import (
+    CompressionMiddleware,
+    compress,
+    negotiate,
+    normalize_accept_encoding,
+)
+
+#: A JSON body that is large enough to be compressed.
+LARGE_BODY = json.dumps(
+    {"genes": [{"hgnc_id": f"HGNC:{i}", "symbol": "BRCA1"} for i in range(200)]}
+)
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        ("", None),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br, zstd", "gzip"),
+        ("identity", None),
+        ("gzip;q=0", None),
+        ("*", "gzip"),
+        ("*, gzip;q=0", None),
+        ("br;q=1.0, gzip;q=0.5", "gzip"),
+    ],
+)
+def test_negotiate(header: str, expected: str | None):
+    """Test selecting the content encoding."""
+    # act:
+    result = negotiate(header, ["gzip"])
+    # assert:
+    assert result == expected
+
+
+def test_negotiate_preference():
+    """Test that the server preference breaks ties and quality values win."""
+    # act, assert:
+    assert negotiate("gzip, br, zstd", ["zstd", "br", "gzip"]) == "zstd"
+    assert negotiate("gzip, br;q=0.9, zstd;q=0.8", ["zstd", "br", "gzip"]) == "gzip"
+
+
+def test_normalize_accept_encoding():
+    """Test that equivalent headers are normalized to the same string."""
+    # act, assert:
+    assert normalize_accept_encoding("gzip, br") == normalize_accept_encoding("br;q=0.9,gzip")
+    assert normalize_accept_encoding("gzip, br;q=0") == "gzip"
+
+
+def test_compress_gzip():
+    """Test that gzip compressed data can be decompressed again."""
+    # act:
+    data = compress(LARGE_BODY.encode(), "gzip")
+    # assert:
+    assert len(data) < len(LARGE_BODY)
+    assert gzip.decompress(data) == LARGE_BODY.encode()
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, path_prefixes=["/api"], minimum_size=100)
+
+    @app.get("/api/large")
+    async def large():
+        return PlainTextResponse(LARGE_BODY, media_type="application/json")
+
+    @app.get("/api/small")
+    async def small():
+        return PlainTextResponse("{}", media_type="application/json")
+
+    @app.get("/api/image")
+    async def image():
+        return PlainTextResponse(LARGE_BODY, media_type="image/png")
+
+    @app.get("/api/stream")
+    async def stream():
+        async def lines():
+            for i in range(10):
+                yield json.dumps({"i": i, "pad": "x" * 50}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/other/large")
+    async def other():
+        return PlainTextResponse(LARGE_BODY, media_type="application/json")
+
+    return app
+
+
+@pytest.mark.parametrize(
+    "path,expected_encoding",
+    [
+        ("/api/large", "gzip"),
+        ("/api/small", None),
+        ("/api/image", None),
+        ("/api/stream", "gzip"),
+        ("/other/large", None),
+    ],
+)
+def test_compression_middleware(path: str, expected_encoding: str | None):
+    """Test which responses the middleware compresses."""
+    # arrange:
+    client = TestClient(make_app())
+    # act:
+    response = client.get(path, headers={"accept-encoding": "gzip"})
+    # assert:
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == expected_encoding
+    if expected_encoding is not None:
+        assert "accept-encoding" in response.headers["vary"].lower()
+    if path == "/api/stream":
+        assert len(response.text.splitlines()) == 10
+
+
+def test_compression_middleware_content_length():
+    """Test that the content length of compressed responses is the compressed size."""
+    # arrange:
+    client = TestClient(make_app())
+    # act:
+    with client.stream("GET", "/api/large", headers={"accept-encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    # assert:
+    assert int(response.headers["content-length"]) == len(raw)
+    assert gzip.decompress(raw) == LARGE_BODY.encode()
+
+
+def test_compression_middleware_identity():
+    """Test that responses are not compressed without ``Accept-Encoding``."""
+    # arrange:
+    client = TestClient(make_app())
+    # act:
+    response = client.get("/api/large", headers={"accept-encoding": "identity"})
+    # assert:
+    assert "content-encoding" not in response.headers
+    assert response.text == LARGE_BODY
+
+
+@pytest.mark.anyio
+async def test_compression_middleware_streams_chunks():
+    """Test that each chunk of a streamed response is sent before the next one is produced."""
+    # arrange:
+    chunk_sent = asyncio.Event()
+    sent: list[Message] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")],
+            }
+        )
+        for i in range(3):
+            chunk_sent.clear()
+            await send(
+                {"type": "http.response.body", "body": b'{"i": %d}\n' % i, "more_body": True}
+            )
+            # The next chunk is only produced after the previous one went out.
+            await asyncio.wait_for(chunk_sent.wait(), 1)
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message: Message):
+        sent.append(message)
+        if message["type"] == "http.response.body":
+            chunk_sent.set()
+
+    async def receive() -> Message:
+        return {"type": "http.request"}  # pragma: no cover
+
+    middleware = CompressionMiddleware(app, path_prefixes=["/api"], minimum_size=1000)
+    scope = {"type": "http", "path": "/api/stream", "headers": [(b"accept-encoding", b"gzip")]}
+    # act:
+    await middleware(scope, receive, send)
+    # assert:
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    decompressor = zlib.decompressobj(31)
+    lines = [decompressor.decompress(message["body"]) for message in sent[1:]]
+    assert lines == [b'{"i": 0}\n', b'{"i": 1}\n', b'{"i": 2}\n', b""]
@@ -0,0 +1,39 @@
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api import deps
+from app.core.auth import get_user_db
+from app.db import session
+
+
+@pytest.mark.anyio
+async def test_session_shared_with_auth(monkeypatch: MonkeyPatch):
+    """Test that the user database and the endpoint share one session per request."""
+    # arrange:
+    maker = async_sessionmaker(create_async_engine("sqlite+aiosqlite:///"))
+    opened: list[AsyncSession] = []
+
+    def session_local() -> AsyncSession:
+        opened.append(maker())
+        return opened[-1]
+
+    monkeypatch.setattr(session, "SessionLocal", session_local)
+    app = FastAPI()
+
+    @app.get("/")
+    async def endpoint(
+        user_db: SQLAlchemyUserDatabase = Depends(get_user_db),
+        db: AsyncSession = Depends(deps.get_db),
+    ):
+        return {"shared": user_db.session is db}
+
+    # act:
+    with TestClient(app) as client:
+        responses = [client.get("/").json() for _ in range(2)]
+    # assert:
+    assert responses == [{"shared": True}, {"shared": True}]
+    assert len(opened) == 2
@@ -0,0 +1,161 @@
+from typing import Iterator
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.core.cache import CachedResponse
+from app.core.config import settings
+from app.core.diskcache import DiskCache
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch: MonkeyPatch) -> Iterator[DiskCache]:
+    monkeypatch.setattr(settings, "REMOTE_CACHE_PATH", str(tmp_path / "cache" / "remote.sqlite3"))
+    monkeypatch.setattr(settings, "REMOTE_CACHE_MAX_BYTES", 1000)
+    monkeypatch.setattr(settings, "REMOTE_CACHE_STALE_SECONDS", 60)
+    cache = DiskCache()
+    cache.start()
+    yield cache
+    cache.stop()
+
+
+def entry(body: bytes) -> CachedResponse:
+    return CachedResponse(200, [("content-type", "application/json")], body)
+
+
+@pytest.mark.anyio
+async def test_disk_cache_roundtrip(disk_cache: DiskCache):
+    """Test storing and looking up entries, also after reopening the database."""
+    # act:
+    await disk_cache.set("a", "variantvalidator", entry(b'{"a": 1}'), ttl=3600)
+    disk_cache.start()
+    result = await disk_cache.get("a")
+    missing = await disk_cache.get("b")
+    # assert:
+    assert result is not None
+    cached, fresh = result
+    assert fresh
+    assert cached.body == b'{"a": 1}'
+    assert cached.headers == [("content-type", "application/json")]
+    assert missing is None
+    assert (disk_cache.hits, disk_cache.misses) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_disk_cache_stale(disk_cache: DiskCache):
+    """Test that expired entries are stale during the stale period, then missing."""
+    # act:
+    await disk_cache.set("stale", "pubtator3", entry(b"1"), ttl=-10)
+    await disk_cache.set("expired", "pubtator3", entry(b"2"), ttl=-100)
+    stale = await disk_cache.get("stale")
+    expired = await disk_cache.get("expired")
+    # assert:
+    assert stale is not None
+    assert stale[1] is False
+    assert expired is None
+    assert disk_cache.stale_hits == 1
+
+
+@pytest.mark.anyio
+async def test_disk_cache_lru_eviction(disk_cache: DiskCache):
+    """Test that the least recently used entries are evicted beyond the size budget."""
+    # arrange:
+    await disk_cache.set("a", "wintervar", entry(b"a" * 400), ttl=3600)
+    await disk_cache.set("b", "wintervar", entry(b"b" * 400), ttl=3600)
+    await disk_cache.get("a")
+    # act:
+    await disk_cache.set("c", "wintervar", entry(b"c" * 400), ttl=3600)
+    await disk_cache.set("huge", "wintervar", entry(b"x" * 2000), ttl=3600)
+    # assert:
+    assert await disk_cache.get("a") is not None
+    assert await disk_cache.get("b") is None
+    assert await disk_cache.get("c") is not None
+    assert await disk_cache.get("huge") is None
+    assert disk_cache.evictions == 1
+
+
+def total_size(disk_cache: DiskCache) -> tuple[int, int]:
+    """Return the size in ``usage`` and the sum of the sizes of the entries."""
+    assert disk_cache.conn is not None
+    (usage,) = disk_cache.conn.execute("SELECT size FROM usage").fetchone()
+    (actual,) = disk_cache.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+    return usage, actual
+
+
+@pytest.mark.anyio
+async def test_disk_cache_usage(disk_cache: DiskCache):
+    """Test that the running total of the sizes follows writes, evictions and purges."""
+    # act, assert:
+    await disk_cache.set("a", "wintervar", entry(b"a" * 300), ttl=3600)
+    await disk_cache.set("b", "autocnv", entry(b"b" * 300), ttl=3600)
+    await disk_cache.set("a", "wintervar", entry(b"a" * 100), ttl=3600)
+    usage, actual = total_size(disk_cache)
+    assert usage == actual == entry(b"a" * 100).size + entry(b"b" * 300).size
+    await disk_cache.set("c", "wintervar", entry(b"c" * 700), ttl=3600)
+    usage, actual = total_size(disk_cache)
+    assert usage == actual <= disk_cache.max_bytes
+    await disk_cache.purge("wintervar")
+    assert total_size(disk_cache) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_disk_cache_usage_existing_database(disk_cache: DiskCache):
+    """Test that the running total is initialized for a database created without it."""
+    # arrange:
+    await disk_cache.set("a", "wintervar", entry(b"a" * 300), ttl=3600)
+    assert disk_cache.conn is not None
+    disk_cache.conn.executescript(
+        "DROP TABLE usage; DROP TRIGGER entries_insert; "
+        "DROP TRIGGER entries_update; DROP TRIGGER entries_delete;"
+    )
+    # act:
+    disk_cache.start()
+    # assert:
+    assert total_size(disk_cache) == (entry(b"a" * 300).size,) * 2
+
+
+@pytest.mark.anyio
+async def test_disk_cache_errors(disk_cache: DiskCache):
+    """Test that database errors in ``purge()`` and ``stats()`` are counted, not raised."""
+    # arrange:
+    assert disk_cache.conn is not None
+    disk_cache.conn.execute("DROP TABLE entries")
+    # act:
+    purged = await disk_cache.purge()
+    stats = await disk_cache.stats()
+    # assert:
+    assert purged == 0
+    assert stats["services"] == {}
+    assert disk_cache.errors == 2
+
+
+@pytest.mark.anyio
+async def test_disk_cache_purge(disk_cache: DiskCache):
+    """Test purging the entries of one service and of all services."""
+    # arrange:
+    await disk_cache.set("a", "wintervar", entry(b"a"), ttl=3600)
+    await disk_cache.set("b", "autocnv", entry(b"b"), ttl=3600)
+    await disk_cache.set("c", "autocnv", entry(b"c"), ttl=3600)
+    # act:
+    purged_service = await disk_cache.purge("autocnv")
+    stats = await disk_cache.stats()
+    purged_all = await disk_cache.purge()
+    # assert:
+    assert purged_service == 2
+    assert stats["services"] == {"wintervar": {"entries": 1, "size": entry(b"a").size}}
+    assert purged_all == 1
+
+
+@pytest.mark.anyio
+async def test_disk_cache_disabled(monkeypatch: MonkeyPatch):
+    """Test that the cache does nothing without a path."""
+    # arrange:
+    monkeypatch.setattr(settings, "REMOTE_CACHE_PATH", "")
+    cache = DiskCache()
+    cache.start()
+    # act:
+    await cache.set("a", "wintervar", entry(b"a"), ttl=3600)
+    # assert:
+    assert not cache.enabled
+    assert await cache.get("a") is None
+    assert await cache.purge() == 0
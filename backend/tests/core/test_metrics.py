@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from sqlalchemy import create_engine, text
+
+from app.core.auth import InstrumentedRedisStrategy
+from app.core.config import settings
+from app.core.metrics import (
+    EventLoopMonitor,
+    instrument_engine,
+    observe_upstream,
+    registry,
+    statement_type,
+)
+
+
+@pytest.mark.parametrize(
+    "statement,expected",
+    [
+        ("SELECT 1", "SELECT"),
+        ("\n  insert into foo values (1)", "INSERT"),
+        ("", "EMPTY"),
+    ],
+)
+def test_statement_type(statement: str, expected: str):
+    """Test the statement type label of database queries."""
+    # act, assert:
+    assert statement_type(statement) == expected
+
+
+def test_observe_upstream():
+    """Test recording a request to an upstream."""
+    # arrange:
+    labels = {"upstream": "test-observe"}
+    # act:
+    observe_upstream("test-observe", 200, 0.2, 123)
+    observe_upstream("test-observe", "error", 0.1)
+    # assert:
+    assert registry.get_sample_value("reev_upstream_request_duration_seconds_count", labels) == 2
+    assert registry.get_sample_value("reev_upstream_response_bytes_total", labels) == 123
+    assert (
+        registry.get_sample_value("reev_upstream_responses_total", {**labels, "status": "error"})
+        == 1
+    )
+
+
+def test_instrument_engine():
+    """Test that queries of an instrumented engine are recorded."""
+    # arrange:
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    labels = {"statement": "SELECT"}
+    before = registry.get_sample_value("reev_db_query_duration_seconds_count", labels) or 0
+    # act:
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("select 2"))
+    assert registry.get_sample_value("reev_db_query_duration_seconds_count", labels) == before + 2
+
+
+def test_instrument_engine_pool():
+    """Test that checkouts from the connection pool of an instrumented engine are recorded."""
+    # arrange:
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    checkouts = registry.get_sample_value("reev_db_pool_checkouts_total") or 0
+    checked_out = registry.get_sample_value("reev_db_pool_checked_out_connections") or 0
+    held = registry.get_sample_value("reev_db_pool_hold_duration_seconds_count") or 0
+    # act:
+    with engine.connect():
+        during = registry.get_sample_value("reev_db_pool_checked_out_connections")
+    with engine.connect():
+        pass
+    # assert:
+    assert during == checked_out + 1
+    assert registry.get_sample_value("reev_db_pool_checkouts_total") == checkouts + 2
+    assert registry.get_sample_value("reev_db_pool_checked_out_connections") == checked_out
+    assert registry.get_sample_value("reev_db_pool_hold_duration_seconds_count") == held + 2
+
+
+@pytest.mark.anyio
+async def test_event_loop_monitor(monkeypatch: MonkeyPatch):
+    """Test that the event loop lag is measured periodically."""
+    # arrange:
+    monkeypatch.setattr(settings, "METRICS_EVENT_LOOP_INTERVAL", 0.01)
+    monitor = EventLoopMonitor()
+    before = registry.get_sample_value("reev_event_loop_lag_seconds_count") or 0
+    # act:
+    monitor.start()
+    await asyncio.sleep(0.1)
+    await monitor.stop()
+    # assert:
+    assert (registry.get_sample_value("reev_event_loop_lag_seconds_count") or 0) > before
+    assert monitor.task is None
+
+
+class FakeRedis:
+    """Minimal stand-in for ``redis.asyncio.Redis``."""
+
+    async def get(self, key: str) -> str | None:
+        return None
+
+
+@pytest.mark.anyio
+async def test_redis_strategy_metrics():
+    """Test that token lookups in Redis are recorded."""
+    # arrange:
+    strategy = InstrumentedRedisStrategy(FakeRedis())  # type: ignore[arg-type]
+    labels = {"result": "miss"}
+    before = registry.get_sample_value("reev_redis_auth_lookup_duration_seconds_count", labels)
+    # act:
+    user = await strategy.read_token("token", None)  # type: ignore[arg-type]
+    # assert:
+    assert user is None
+    assert (
+        registry.get_sample_value("reev_redis_auth_lookup_duration_seconds_count", labels)
+        == (before or 0) + 1
+    )
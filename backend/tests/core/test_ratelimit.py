@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+import redis
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.core.config import settings
+from app.core.metrics import rate_limit_children
+from app.core.ratelimit import REDIS_KEY_PREFIX, RateLimiter, TokenBucket
+from app.core.resilience import UpstreamUnavailable
+
+
+class FakeScript:
+    """Minimal stand-in for the registered reservation script."""
+
+    def __init__(self, result: list[object] | None = None):
+        self.result = result
+        self.calls: list[tuple[list[str], list[float]]] = []
+
+    async def __call__(self, keys: list[str], args: list[float]):
+        self.calls.append((keys, args))
+        if self.result is None:
+            raise redis.ConnectionError("down")
+        return self.result
+
+
+def test_token_bucket_reserve():
+    """Test that tokens are reserved ahead of time up to the maximal wait."""
+    # arrange:
+    bucket = TokenBucket(rate=10.0, burst=2.0)
+    # act:
+    results = [bucket.reserve(max_wait=0.15) for _ in range(5)]
+    # assert:
+    assert [reserved for reserved, _ in results] == [True, True, True, False, False]
+    waits = [wait for _, wait in results]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_queues_calls(monkeypatch: MonkeyPatch):
+    """Test that concurrent calls are spaced according to the rate."""
+    # arrange:
+    monkeypatch.setattr(settings, "REMOTE_RATE_LIMITS", {"remote.example": 20.0})
+    monkeypatch.setattr(settings, "REMOTE_RATE_LIMIT_BURST", 1.0)
+    limiter = RateLimiter()
+    _, queue_metric, _ = rate_limit_children("remote.example")
+    depths: list[float] = []
+
+    async def watch_queue():
+        await asyncio.sleep(0.01)
+        depths.append(queue_metric._value.get())
+
+    # act:
+    start = time.monotonic()
+    await asyncio.gather(*(limiter.acquire("remote.example") for _ in range(3)), watch_queue())
+    elapsed = time.monotonic() - start
+    await limiter.acquire("unlimited.example")
+    # assert:
+    assert elapsed >= 0.09
+    assert depths == [2.0]
+    assert queue_metric._value.get() == 0.0
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_rejects_beyond_max_wait(monkeypatch: MonkeyPatch):
+    """Test that calls fail fast if the wait would exceed the maximal wait."""
+    # arrange:
+    monkeypatch.setattr(settings, "REMOTE_RATE_LIMITS", {"slow.example": 0.5})
+    monkeypatch.setattr(settings, "REMOTE_RATE_LIMIT_MAX_WAIT", 0.1)
+    limiter = RateLimiter()
+    _, _, rejected_metric = rate_limit_children("slow.example")
+    rejected_before = rejected_metric._value.get()
+    await limiter.acquire("slow.example")
+    # act:
+    with pytest.raises(UpstreamUnavailable) as excinfo:
+        await limiter.acquire("slow.example")
+    # assert:
+    assert excinfo.value.retry_after == pytest.approx(2.0, abs=0.1)
+    assert rejected_metric._value.get() == rejected_before + 1
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_redis(monkeypatch: MonkeyPatch):
+    """Test that the reservation is made in Redis if available."""
+    # arrange:
+    monkeypatch.setattr(settings, "REMOTE_RATE_LIMIT_BURST", 1.0)
+    limiter = RateLimiter()
+    script = FakeScript([1, b"0.25"])
+    limiter.script = script  # type: ignore[assignment]
+    # act:
+    result = await limiter.reserve("remote.example", 3.0, 10.0)
+    # assert:
+    assert result == (True, 0.25)
+    assert script.calls == [([REDIS_KEY_PREFIX + "remote.example"], [3.0, 1.0, 10.0])]
+    assert limiter.buckets == {}
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_redis_failure():
+    """Test that the in-process bucket is used while Redis is unavailable."""
+    # arrange:
+    limiter = RateLimiter()
+    script = FakeScript()
+    limiter.script = script  # type: ignore[assignment]
+    # act:
+    first = await limiter.reserve("remote.example", 3.0, 10.0)
+    second = await limiter.reserve("remote.example", 3.0, 10.0)
+    # assert:
+    assert first == (True, 0.0)
+    assert second[0] is True
+    assert len(script.calls) == 1
+    assert limiter.redis_errors == 1
+    assert "remote.example" in limiter.buckets
@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.core.config import settings
+from app.core.resilience import (
+    Bulkhead,
+    CircuitBreaker,
+    LatencyWindow,
+    RetryBudget,
+    UpstreamGuard,
+    UpstreamUnavailable,
+)
+
+
+@pytest.mark.anyio
+async def test_bulkhead_rejects_when_queue_full():
+    """Test that requests beyond the in-flight limit and the queue are rejected."""
+    # arrange:
+    bulkhead = Bulkhead("test", max_in_flight=1, max_queue=1, queue_timeout=1.0)
+    await bulkhead.acquire()
+    waiter = asyncio.ensure_future(bulkhead.acquire())
+    await asyncio.sleep(0)
+    # act:
+    with pytest.raises(UpstreamUnavailable):
+        await bulkhead.acquire()
+    bulkhead.release()
+    await waiter
+    # assert:
+    assert bulkhead.in_flight == 1
+    assert bulkhead.waiting == 0
+    assert bulkhead.rejected == 1
+
+
+@pytest.mark.anyio
+async def test_bulkhead_queue_timeout():
+    """Test that waiting for a slot is bounded in time."""
+    # arrange:
+    bulkhead = Bulkhead("test", max_in_flight=1, max_queue=1, queue_timeout=0.01)
+    await bulkhead.acquire()
+    # act:
+    with pytest.raises(UpstreamUnavailable):
+        await bulkhead.acquire()
+    # assert:
+    assert bulkhead.waiting == 0
+
+
+@pytest.mark.anyio
+async def test_bulkhead_cancelled_waiter_keeps_no_slot():
+    """Test that a waiter cancelled just as it gets a slot gives the slot back."""
+    # arrange:
+    bulkhead = Bulkhead("test", max_in_flight=1, max_queue=1, queue_timeout=1.0)
+    await bulkhead.acquire()
+    waiter = asyncio.ensure_future(bulkhead.acquire())
+    await asyncio.sleep(0)
+    # act:
+    bulkhead.release()
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    # assert:
+    assert bulkhead.in_flight == 0
+    assert bulkhead.waiting == 0
+    assert not bulkhead.semaphore.locked()
+
+
+def test_circuit_breaker_opens_and_recovers(monkeypatch: MonkeyPatch):
+    """Test the transitions closed -> open -> half-open -> closed."""
+    # arrange:
+    now = 1000.0
+    monkeypatch.setattr("app.core.resilience.time.monotonic", lambda: now)
+    breaker = CircuitBreaker("test", failure_threshold=2, slow_call_seconds=1.0, open_seconds=10.0)
+    # act, assert:
+    breaker.before_call()
+    breaker.record(0.1, failed=True)
+    breaker.before_call()
+    breaker.record(2.0, failed=False)  # slow
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(UpstreamUnavailable) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 10.0
+    now += 11.0
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()  # only one probe
+    breaker.record(0.1, failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_circuit_breaker_failed_probe(monkeypatch: MonkeyPatch):
+    """Test that a failed probe opens the breaker again."""
+    # arrange:
+    now = 1000.0
+    monkeypatch.setattr("app.core.resilience.time.monotonic", lambda: now)
+    breaker = CircuitBreaker("test", failure_threshold=1, slow_call_seconds=1.0, open_seconds=10.0)
+    breaker.record(0.1, failed=True)
+    now += 11.0
+    breaker.before_call()
+    # act:
+    breaker.record(0.1, failed=True)
+    # assert:
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_until == now + 10.0
+
+
+@pytest.mark.anyio
+async def test_upstream_guard_call(monkeypatch: MonkeyPatch):
+    """Test that the guard records failures and releases its slot."""
+    # arrange:
+    monkeypatch.setattr(settings, "UPSTREAM_BREAKER_FAILURES", 1)
+    guard = UpstreamGuard("test")
+    # act:
+    with pytest.raises(RuntimeError):
+        async with guard.call():
+            raise RuntimeError("boom")
+    # assert:
+    assert guard.bulkhead.in_flight == 0
+    assert guard.state()["state"] == CircuitBreaker.OPEN
+    with pytest.raises(UpstreamUnavailable):
+        async with guard.call():
+            pass
+
+
+def test_latency_window_quantile():
+    """Test quantiles of the recent latencies."""
+    # arrange:
+    window = LatencyWindow(100)
+    # act:
+    for i in range(200):
+        window.record(i / 1000)
+    # assert:
+    assert len(window.samples) == 100
+    assert window.quantile(0.5) == 0.15
+    assert window.quantile(0.95) == 0.195
+    assert LatencyWindow(10).quantile(0.95) is None
+
+
+def test_retry_budget(monkeypatch: MonkeyPatch):
+    """Test that the retry budget is limited by deposits and refills."""
+    # arrange:
+    now = 1000.0
+    monkeypatch.setattr("app.core.resilience.time.monotonic", lambda: now)
+    budget = RetryBudget(ratio=0.5, per_second=1.0, max_tokens=2.0)
+    # act, assert:
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    now += 1.0
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    assert budget.exhausted == 2
+
+
+def test_hedge_delay(monkeypatch: MonkeyPatch):
+    """Test that the hedge delay follows the latencies within its bounds."""
+    # arrange:
+    monkeypatch.setattr(settings, "UPSTREAM_HEDGE_MIN_SAMPLES", 10)
+    monkeypatch.setattr(settings, "UPSTREAM_HEDGE_MIN_DELAY", 0.1)
+    monkeypatch.setattr(settings, "UPSTREAM_HEDGE_MAX_DELAY", 2.0)
+    guard = UpstreamGuard("test")
+    # act, assert:
+    assert guard.hedge_delay() == 2.0
+    for _ in range(10):
+        guard.latency.record(0.5)
+    assert guard.hedge_delay() == 0.5
+    for _ in range(10):
+        guard.latency.record(0.01)
+    assert guard.hedge_delay() == 0.5
+    guard.latency.samples.clear()
+    for _ in range(10):
+        guard.latency.record(0.01)
+    assert guard.hedge_delay() == 0.1
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_call():
+    """Test that concurrent calls with the same key share one call."""
+    # arrange:
+    flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def func() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    # act:
+    results = await asyncio.gather(*(flight.do("key", func) for _ in range(10)))
+    other = await flight.do("other", func)
+    # assert:
+    assert results == [42] * 10
+    assert other == 42
+    assert calls == 2
+    assert flight.calls == 2
+    assert flight.shared == 9
+    assert flight.tasks == {}
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_exception():
+    """Test that an exception is raised for all callers."""
+    # arrange:
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def func() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    # act:
+    results = await asyncio.gather(
+        *(flight.do("key", func) for _ in range(3)), return_exceptions=True
+    )
+    # assert:
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.calls == 1
+
+
+@pytest.mark.anyio
+async def test_single_flight_cancel_one_waiter():
+    """Test that cancelling one caller does not cancel the call for the others."""
+    # arrange:
+    flight: SingleFlight[int] = SingleFlight()
+    release = asyncio.Event()
+
+    async def func() -> int:
+        await release.wait()
+        return 42
+
+    first = asyncio.ensure_future(flight.do("key", func))
+    second = asyncio.ensure_future(flight.do("key", func))
+    await asyncio.sleep(0)
+    # act:
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    # assert:
+    assert await second == 42
+    assert first.cancelled()
+
+
+@pytest.mark.anyio
+async def test_single_flight_cancel_all_waiters():
+    """Test that the call is cancelled when all callers are cancelled."""
+    # arrange:
+    flight: SingleFlight[int] = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def func() -> int:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return 42  # pragma: no cover
+
+    waiters = [asyncio.ensure_future(flight.do("key", func)) for _ in range(2)]
+    await asyncio.sleep(0)
+    # act:
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    await asyncio.sleep(0)
+    # assert:
+    assert flight.tasks == {}
+
+
+@pytest.mark.anyio
+async def test_single_flight_join_after_cancel():
+    """Test that a caller joining while the cancelled call winds down starts a new call."""
+    # arrange:
+    flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def func() -> int:
+        nonlocal calls
+        calls += 1
+        try:
+            await asyncio.sleep(0.01 if calls > 1 else 10)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.01)  # slow clean-up
+            raise
+        return 42
+
+    waiter = asyncio.ensure_future(flight.do("key", func))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    # act:
+    result = await flight.do("key", func)
+    # assert:
+    assert waiter.cancelled()
+    assert result == 42
+    assert flight.calls == 2
+    assert flight.tasks == {}
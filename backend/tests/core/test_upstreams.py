@@ -0,0 +1,250 @@
+import asyncio
+from typing import Awaitable, Callable
+
+import httpx
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.core.config import ProxyUpstreamConfig, settings
+from app.core.resilience import UpstreamGuard
+from app.core.upstreams import (
+    ResponseTooLarge,
+    UpstreamClients,
+    UpstreamRegistry,
+    send_buffered,
+    send_hedged,
+)
+
+
+@pytest.mark.anyio
+async def test_upstream_clients_reused_per_upstream():
+    """Test that one pooled client is created and reused per upstream."""
+    # arrange:
+    clients = UpstreamClients()
+    clients.start()
+    # act:
+    annonars_1 = clients("annonars")
+    annonars_2 = clients("annonars")
+    mehari = clients("mehari")
+    # assert:
+    assert annonars_1 is annonars_2
+    assert annonars_1 is not mehari
+    await clients.stop()
+    assert annonars_1.is_closed
+    assert mehari.is_closed
+    assert clients.clients == {}
+
+
+@pytest.mark.anyio
+async def test_upstream_clients_settings(monkeypatch: MonkeyPatch):
+    """Test that pool limits and timeouts are taken from the settings."""
+    # arrange:
+    monkeypatch.setattr(settings, "PROXY_POOL_MAX_CONNECTIONS", 7)
+    monkeypatch.setattr(settings, "PROXY_TIMEOUT_CONNECT", 1.5)
+    clients = UpstreamClients()
+    clients.start()
+    # act:
+    client = clients("viguno")
+    # assert:
+    assert client._transport._pool._max_connections == 7  # type: ignore[attr-defined]
+    assert client.timeout.connect == 1.5
+    await clients.stop()
+
+
+def test_upstream_clients_not_started():
+    """Test that clients cannot be obtained before ``start()``."""
+    # act/assert:
+    with pytest.raises(AssertionError):
+        UpstreamClients()("annonars")
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("annonars/genes/info", ("annonars", "/genes/info")),
+        ("cada-prio/api/v1/predict", ("cada-prio", "/api/v1/predict")),
+        ("mehari", ("mehari", "")),
+        ("annonarsX/genes/info", None),
+        ("", None),
+    ],
+)
+def test_upstream_registry_resolve(path: str, expected: tuple[str, str] | None):
+    """Test resolution of proxy paths to the built-in upstreams."""
+    # arrange:
+    registry = UpstreamRegistry.from_settings(settings)
+    # act:
+    resolved = registry.resolve(path)
+    # assert:
+    if expected is None:
+        assert resolved is None
+    else:
+        assert resolved is not None
+        upstream, rest = resolved
+        assert (upstream.name, rest) == expected
+
+
+def test_upstream_registry_override(monkeypatch: MonkeyPatch):
+    """Test that ``PROXY_UPSTREAMS`` overrides built-in upstreams."""
+    # arrange:
+    monkeypatch.setattr(
+        settings,
+        "PROXY_UPSTREAMS",
+        [ProxyUpstreamConfig(name="viguno", base_urls=["http://a/", "http://b"], timeout=3.0)],
+    )
+    # act:
+    registry = UpstreamRegistry.from_settings(settings)
+    upstream = registry.upstreams["viguno"]
+    # assert:
+    assert upstream.timeout.read == 3.0
+    assert not upstream.cacheable
+    assert [upstream.base_url() for _ in range(3)] == ["http://a", "http://b", "http://a"]
+
+
+def test_upstream_no_base_urls():
+    """Test that upstreams without base URLs are rejected."""
+    # act/assert:
+    with pytest.raises(ValueError):
+        UpstreamRegistry([ProxyUpstreamConfig(name="foo", base_urls=[])])
+
+
+class FakeTransport(httpx.AsyncBaseTransport):
+    """Transport answering requests with an async handler, leaving the body unread."""
+
+    def __init__(self, handler: Callable[[httpx.Request], Awaitable[httpx.Response]]):
+        self.handler = handler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.handler(request)
+
+
+@pytest.mark.anyio
+async def test_send_hedged_second_request_wins(monkeypatch: MonkeyPatch):
+    """Test that a hedged request is sent after the delay and the faster answer is used."""
+    # arrange:
+    monkeypatch.setattr(settings, "UPSTREAM_HEDGE_MAX_DELAY", 0.05)
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1.0)
+            return httpx.Response(200, stream=httpx.ByteStream(b"slow"))
+        return httpx.Response(200, stream=httpx.ByteStream(b"fast"))
+
+    guard = UpstreamGuard("test")
+    async with httpx.AsyncClient(transport=FakeTransport(handler)) as client:
+        # act:
+        entry = await send_hedged(client, lambda: client.build_request("GET", "http://x/"), guard)
+        await asyncio.sleep(0.01)  # let the cancelled request finish
+    # assert:
+    assert entry.body == b"fast"
+    assert calls == 2
+    assert guard.hedges == guard.hedges_won == 1
+    assert guard.bulkhead.in_flight == 0
+    assert guard.breaker.failures == 0
+
+
+@pytest.mark.anyio
+async def test_send_hedged_budget_exhausted(monkeypatch: MonkeyPatch):
+    """Test that no hedged request is sent without retry budget."""
+    # arrange:
+    monkeypatch.setattr(settings, "UPSTREAM_HEDGE_MAX_DELAY", 0.01)
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, stream=httpx.ByteStream(b"slow"))
+
+    guard = UpstreamGuard("test")
+    guard.retry_budget.tokens = 0.0
+    guard.retry_budget.per_second = 0.0
+    async with httpx.AsyncClient(transport=FakeTransport(handler)) as client:
+        # act:
+        entry = await send_hedged(client, lambda: client.build_request("GET", "http://x/"), guard)
+    # assert:
+    assert entry.body == b"slow"
+    assert calls == 1
+    assert guard.hedges == 0
+    assert guard.retry_budget.exhausted == 1
+
+
+@pytest.mark.anyio
+async def test_send_hedged_retries_connect_error():
+    """Test that a request that failed to connect is retried once."""
+    # arrange:
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectError("refused", request=request)
+
+    guard = UpstreamGuard("test")
+    async with httpx.AsyncClient(transport=FakeTransport(handler)) as client:
+        # act:
+        with pytest.raises(httpx.ConnectError):
+            await send_hedged(client, lambda: client.build_request("GET", "http://x/"), guard)
+    # assert:
+    assert calls == 2
+    assert guard.breaker.failures == 2
+
+
+async def chunked(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("declared", [True, False])
+async def test_send_buffered_too_large(declared: bool):
+    """Test that a body above ``max_size`` is left open to be streamed by the caller."""
+    # arrange:
+    chunks = [b"a" * 10, b"b" * 10, b"c" * 10]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        headers = {"content-length": "30"} if declared else {}
+        return httpx.Response(200, headers=headers, content=chunked(*chunks))
+
+    guard = UpstreamGuard("test")
+    async with httpx.AsyncClient(transport=FakeTransport(handler)) as client:
+        # act:
+        with pytest.raises(ResponseTooLarge) as excinfo:
+            await send_buffered(
+                client, client.build_request("GET", "http://x/"), guard=guard, max_size=15
+            )
+        body = b"".join([chunk async for chunk in excinfo.value.content()])
+        await excinfo.value.response.aclose()
+    # assert:
+    assert body == b"".join(chunks)
+    assert excinfo.value.claim()
+    assert not excinfo.value.claim()
+    assert guard.bulkhead.in_flight == 0
+    assert guard.breaker.failures == 0
+
+
+@pytest.mark.anyio
+async def test_send_hedged_too_large():
+    """Test that a response above ``max_size`` is passed on by ``send_hedged``."""
+    # arrange:
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, content=chunked(b"x" * 20))
+
+    guard = UpstreamGuard("test")
+    async with httpx.AsyncClient(transport=FakeTransport(handler)) as client:
+        # act:
+        with pytest.raises(ResponseTooLarge) as excinfo:
+            await send_hedged(
+                client, lambda: client.build_request("GET", "http://x/"), guard, max_size=10
+            )
+        body = b"".join([chunk async for chunk in excinfo.value.content()])
+        await excinfo.value.response.aclose()
+    # assert:
+    assert body == b"x" * 20
+    assert calls == 1
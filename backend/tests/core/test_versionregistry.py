@@ -0,0 +1,128 @@
+import json
+from typing import Iterator
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from pytest_httpx._httpx_mock import HTTPXMock
+
+from app.core.config import DataVersionProbe, settings
+from app.core.dataversions import DATA_VERSIONS, today
+from app.core.upstreams import upstream_clients
+from app.core.versionregistry import DataVersionRegistry, extract_version
+
+
+class FakeRedis:
+    """Minimal stand-in for ``redis.asyncio.Redis`` recording the published messages."""
+
+    def __init__(self) -> None:
+        self.published: list[tuple[str, str]] = []
+
+    async def publish(self, channel: str, message: str):
+        self.published.append((channel, message))
+
+
+class Registry(DataVersionRegistry):
+    """Registry with its own versions recording the changes."""
+
+    def __init__(self) -> None:
+        self.changes: list[set[str]] = []
+        super().__init__(DATA_VERSIONS.model_copy(), [self.record])
+
+    async def record(self, changed: set[str]):
+        self.changes.append(changed)
+
+
+@pytest.fixture
+def started_upstream_clients() -> Iterator[None]:
+    upstream_clients.start()
+    yield
+    upstream_clients.started = False
+
+
+@pytest.mark.parametrize(
+    "body,field,expected",
+    [
+        (b"0.26.0\n", None, "0.26.0"),
+        (b'{"version": "1.2"}', "version", "1.2"),
+        (b'{"version_spec": {"mehari": 3}}', "version_spec.mehari", "3"),
+    ],
+)
+def test_extract_version(body: bytes, field: str | None, expected: str):
+    """Test extracting the version from the response of a version endpoint."""
+    # act:
+    version = extract_version(body, field)
+    # assert:
+    assert version == expected
+
+
+@pytest.mark.parametrize(
+    "body,field",
+    [(b"", None), (b"{}", "version"), (b'{"version": {"a": 1}}', "version"), (b"x", "version")],
+)
+def test_extract_version_invalid(body: bytes, field: str | None):
+    """Test that responses without a version are rejected."""
+    # act/assert:
+    with pytest.raises(ValueError):
+        extract_version(body, field)
+
+
+@pytest.mark.anyio
+async def test_refresh(
+    monkeypatch: MonkeyPatch, httpx_mock: HTTPXMock, started_upstream_clients: None
+):
+    """Test that the upstreams are probed and changed versions are applied and published."""
+    # arrange:
+    monkeypatch.setattr(
+        settings,
+        "DATA_VERSION_PROBES",
+        {
+            "mehari": DataVersionProbe(upstream="mehari", path="/version", field="version"),
+            "viguno": DataVersionProbe(upstream="viguno", path="/version"),
+            "dotty": DataVersionProbe(upstream="unknown", path="/version"),
+        },
+    )
+    for _ in range(2):
+        httpx_mock.add_response(
+            url=f"{settings.BACKEND_PREFIX_MEHARI}/version", json={"version": "9"}
+        )
+        httpx_mock.add_response(url=f"{settings.BACKEND_PREFIX_VIGUNO}/version", status_code=500)
+    registry = Registry()
+    registry.versions.clingen_gene = "20000101"
+    fake = FakeRedis()
+    registry.redis = fake  # type: ignore[assignment]
+    # act:
+    changed = await registry.refresh()
+    unchanged = await registry.refresh()
+    # assert:
+    assert changed == {"mehari", "clingen_gene"}
+    assert unchanged == set()
+    assert registry.changes == [changed]
+    assert json.loads(registry.body)["mehari"] == "9"
+    assert registry.versions.clingen_gene == today()
+    assert registry.versions.viguno == DATA_VERSIONS.viguno
+    assert set(registry.errors) == {"viguno", "dotty"}
+    assert len(fake.published) == 1
+    channel, message = fake.published[0]
+    assert channel == "reev:data-versions"
+    assert json.loads(message) == {
+        "origin": registry.origin,
+        "versions": {"clingen_gene": today(), "mehari": "9"},
+    }
+
+
+@pytest.mark.anyio
+async def test_handle_message():
+    """Test that versions published by other processes are applied."""
+    # arrange:
+    registry = Registry()
+    own = json.dumps({"origin": registry.origin, "versions": {"mehari": "8"}})
+    other = json.dumps({"origin": "other", "versions": {"mehari": "9", "unknown": "1"}})
+    # act:
+    ignored = await registry.handle_message(own)
+    invalid = await registry.handle_message(b"{")
+    changed = await registry.handle_message(other.encode())
+    # assert:
+    assert (ignored, invalid, changed) == (set(), set(), {"mehari"})
+    assert registry.changes == [{"mehari"}]
+    assert json.loads(registry.body)["mehari"] == "9"
+    assert DATA_VERSIONS.mehari != "9"
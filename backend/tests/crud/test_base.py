@@ -0,0 +1,129 @@
+import uuid
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.models.acmgseqvar import AcmgSeqVar
+from app.models.bookmark import Bookmark
+from app.schemas.acmgseqvar import AcmgRank, AcmgSeqVarCreate
+from app.schemas.bookmark import BookmarkCreate, BookmarkTypes
+from tests.conftest import ObjNames
+
+
+@pytest.fixture
+def bookmarks_create(obj_names: ObjNames) -> list[BookmarkCreate]:
+    """Fixture for creating bookmarks of one user."""
+    user = uuid.uuid4()
+    return [
+        BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=gene, user=user)
+        for gene in obj_names.gene
+    ]
+
+
+async def count(session: AsyncSession, model) -> int:
+    return await session.scalar(select(func.count()).select_from(model)) or 0
+
+
+def test_unique_columns():
+    """Test finding the columns of the unique constraint."""
+    # act, assert:
+    assert crud.bookmark.unique_columns() == ["user", "obj_type", "obj_id"]
+    assert crud.acmgseqvar.unique_columns() == ["user", "seqvar_name"]
+    with pytest.raises(ValueError):
+        crud.adminmessage.unique_columns()
+
+
+@pytest.mark.anyio
+async def test_create_update_returning(
+    db_session: AsyncSession, bookmarks_create: list[BookmarkCreate]
+):
+    """Test creating and updating with ``RETURNING`` instead of a refresh."""
+    # act:
+    created = await crud.bookmark.create(db_session, obj_in=bookmarks_create[0], returning=True)
+    created_obj_id = created.obj_id
+    updated = await crud.bookmark.update(
+        db_session, db_obj=created, obj_in={"obj_id": "HGNC:9", "unknown": 1}, returning=True
+    )
+    # assert:
+    assert created_obj_id == bookmarks_create[0].obj_id
+    assert updated is created
+    assert updated.obj_id == "HGNC:9"
+    stored = await crud.bookmark.get(db_session, id=created.id)
+    assert stored is not None and stored.obj_id == "HGNC:9"
+
+
+@pytest.mark.anyio
+async def test_bulk_create_update_remove(
+    db_session: AsyncSession, bookmarks_create: list[BookmarkCreate]
+):
+    """Test creating, updating and removing bookmarks in bulk."""
+    # act:
+    created = await crud.bookmark.bulk_create(db_session, objs_in=bookmarks_create)
+    await crud.bookmark.bulk_update(
+        db_session,
+        objs_in={created[0].id: {"obj_id": "HGNC:1"}, created[1].id: {"obj_id": "HGNC:2"}},
+    )
+    db_session.expunge_all()
+    updated = [await crud.bookmark.get(db_session, id=bookmark.id) for bookmark in created]
+    removed = await crud.bookmark.bulk_remove(db_session, ids=[created[0].id, created[2].id])
+    # assert:
+    assert [bookmark.obj_id for bookmark in created] == [b.obj_id for b in bookmarks_create]
+    assert len({bookmark.id for bookmark in created}) == 3
+    assert [bookmark.obj_id for bookmark in updated if bookmark] == [
+        "HGNC:1",
+        "HGNC:2",
+        bookmarks_create[2].obj_id,
+    ]
+    assert removed == 2
+    assert await count(db_session, Bookmark) == 1
+    assert await crud.bookmark.bulk_create(db_session, objs_in=[]) == []
+    assert await crud.bookmark.bulk_remove(db_session, ids=[]) == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("dialect", ["sqlite", "other"])
+async def test_upsert(
+    db_session: AsyncSession, obj_names: ObjNames, monkeypatch: MonkeyPatch, dialect: str
+):
+    """Test inserting and then updating an ACMG rating by its unique columns."""
+    # arrange:
+    if dialect == "other":
+        assert db_session.bind is not None
+        monkeypatch.setattr(db_session.bind.dialect, "name", "other")
+    user = uuid.uuid4()
+    obj_in = AcmgSeqVarCreate(
+        user=user,
+        seqvar_name=obj_names.seqvar[0],
+        acmg_rank=AcmgRank(comment="first", criterias=[]),
+    )
+    # act:
+    inserted = await crud.acmgseqvar.upsert(db_session, obj_in=obj_in)
+    obj_in.acmg_rank = AcmgRank(comment="second", criterias=[])
+    updated = await crud.acmgseqvar.upsert(db_session, obj_in=obj_in)
+    # assert:
+    assert updated.id == inserted.id
+    assert AcmgRank.model_validate(updated.acmg_rank).comment == "second"
+    assert await count(db_session, AcmgSeqVar) == 1
+
+
+@pytest.mark.anyio
+async def test_get_multi_keyset_order(
+    db_session: AsyncSession, bookmarks_create: list[BookmarkCreate]
+):
+    """Test that ``get_multi`` pages through ``query_multi`` in its unique order."""
+    # arrange:
+    created = await crud.bookmark.bulk_create(db_session, objs_in=bookmarks_create)
+    # act:
+    pages = [
+        await crud.bookmark.get_multi(db_session, skip=skip, limit=2)
+        for skip in range(0, len(created), 2)
+    ]
+    in_order = (await db_session.scalars(crud.bookmark.query_multi())).all()
+    # assert:
+    assert [db_obj.id for page in pages for db_obj in page] == sorted(
+        db_obj.id for db_obj in created
+    )
+    assert list(in_order) == [db_obj for page in pages for db_obj in page]
@@ -72,3 +72,119 @@ async def test_get_by_user_and_obj(db_session: AsyncSession, bookmark_create: Bo
     assert bookmark_postcreate.id == stored_item.id
     assert bookmark_postcreate.obj_type == stored_item.obj_type
     assert bookmark_postcreate.obj_id == stored_item.obj_id
+
+
+@pytest.mark.anyio
+async def test_get_multi_by_user_and_objs(db_session: AsyncSession, obj_names: ObjNames):
+    """Test retrieving the bookmarks of a user on several objects at once."""
+    # arrange:
+    user = uuid.uuid4()
+    gene = await crud.bookmark.create(
+        db_session,
+        obj_in=BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=obj_names.gene[0], user=user),
+    )
+    seqvar = await crud.bookmark.create(
+        db_session,
+        obj_in=BookmarkCreate(obj_type=BookmarkTypes.seqvar, obj_id=obj_names.seqvar[0], user=user),
+    )
+    # Same object, other user.
+    await crud.bookmark.create(
+        db_session,
+        obj_in=BookmarkCreate(
+            obj_type=BookmarkTypes.gene, obj_id=obj_names.gene[1], user=uuid.uuid4()
+        ),
+    )
+    # act:
+    stored_items = await crud.bookmark.get_multi_by_user_and_objs(
+        db_session,
+        user_id=user,
+        objs=[
+            (BookmarkTypes.gene, obj_names.gene[0]),
+            (BookmarkTypes.gene, obj_names.gene[1]),
+            (BookmarkTypes.seqvar, obj_names.seqvar[0]),
+            # Same ID, other type.
+            (BookmarkTypes.strucvar, obj_names.gene[0]),
+        ],
+    )
+    # assert:
+    assert {item.id for item in stored_items} == {gene.id, seqvar.id}
+    assert await crud.bookmark.get_multi_by_user_and_objs(db_session, user_id=user, objs=[]) == []
+
+
+@pytest.mark.anyio
+async def test_bulk_create_for_user(db_session: AsyncSession, obj_names: ObjNames):
+    """Test bookmarking several objects at once, keeping the existing bookmarks."""
+    # arrange:
+    user = uuid.uuid4()
+    existing = await crud.bookmark.create(
+        db_session,
+        obj_in=BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=obj_names.gene[1], user=user),
+    )
+    objs_in = [
+        BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=obj_id) for obj_id in obj_names.gene
+    ]
+    # act:
+    created = await crud.bookmark.bulk_create_for_user(
+        db_session, user_id=user, objs_in=objs_in + objs_in[:1]
+    )
+    # assert:
+    assert [item.obj_id for item in created] == obj_names.gene
+    assert created[1].id == existing.id
+    assert {item.user for item in created} == {user}
+    stored_items = await crud.bookmark.get_multi_by_user(db_session, user_id=user)
+    assert {item.id for item in stored_items} == {item.id for item in created}
+
+
+@pytest.mark.anyio
+async def test_bulk_remove_for_user(db_session: AsyncSession, obj_names: ObjNames):
+    """Test deleting the bookmarks of a user on several objects at once."""
+    # arrange:
+    user = uuid.uuid4()
+    objs_in = [
+        BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=obj_id) for obj_id in obj_names.gene
+    ]
+    created = await crud.bookmark.bulk_create_for_user(db_session, user_id=user, objs_in=objs_in)
+    # act:
+    deleted = await crud.bookmark.bulk_remove_for_user(
+        db_session,
+        user_id=user,
+        objs=[
+            (BookmarkTypes.gene, obj_names.gene[0]),
+            (BookmarkTypes.seqvar, obj_names.seqvar[0]),
+        ],
+    )
+    # assert:
+    assert [item.id for item in deleted] == [created[0].id]
+    stored_items = await crud.bookmark.get_multi_by_user(db_session, user_id=user)
+    assert {item.id for item in stored_items} == {item.id for item in created[1:]}
+
+
+@pytest.mark.anyio
+async def test_bulk_create_for_user_concurrent(
+    db_session: AsyncSession, obj_names: ObjNames, monkeypatch: pytest.MonkeyPatch
+):
+    """Test bookmarking an object that a concurrent request bookmarked after the lookup."""
+    # arrange:
+    user = uuid.uuid4()
+    existing = await crud.bookmark.create(
+        db_session,
+        obj_in=BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=obj_names.gene[0], user=user),
+    )
+    lookups = []
+    get_multi_by_user_and_objs = crud.bookmark.get_multi_by_user_and_objs
+
+    async def missed_first_lookup(session, *, user_id, objs):
+        lookups.append(objs)
+        result = await get_multi_by_user_and_objs(session, user_id=user_id, objs=objs)
+        return result if len(lookups) > 1 else []
+
+    monkeypatch.setattr(crud.bookmark, "get_multi_by_user_and_objs", missed_first_lookup)
+    objs_in = [
+        BookmarkCreate(obj_type=BookmarkTypes.gene, obj_id=obj_id) for obj_id in obj_names.gene
+    ]
+    # act:
+    created = await crud.bookmark.bulk_create_for_user(db_session, user_id=user, objs_in=objs_in)
+    # assert:
+    assert len(lookups) == 2
+    assert [item.obj_id for item in created] == obj_names.gene
+    assert created[0].id == existing.id
@@ -86,6 +86,20 @@ async def test_get_multi_by_user(db_session: AsyncSession, case_create: CaseInfo
     assert caseinfo_postcreate.family_segregation == stored_items[0].family_segregation
 
 
+@pytest.mark.anyio
+async def test_get_multi_by_user_unlimited(db_session: AsyncSession, case_create: CaseInfoCreate):
+    """Test that all caseinfos of a user are returned, not only a first page."""
+    # arrange:
+    objs_in = [case_create.model_copy(update={"pseudonym": f"test{i:03}"}) for i in range(150)]
+    await crud.caseinfo.bulk_create(session=db_session, objs_in=objs_in)
+    # act:
+    stored_items = await crud.caseinfo.get_multi_by_user(
+        session=db_session, user_id=case_create.user
+    )
+    # assert:
+    assert [item.pseudonym for item in stored_items] == [obj.pseudonym for obj in objs_in]
+
+
 @pytest.mark.anyio
 async def test_get_by_user(db_session: AsyncSession, case_create: CaseInfoCreate):
     """Test retrieving a caseinfo by user."""
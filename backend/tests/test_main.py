@@ -3,6 +3,8 @@ from _pytest.monkeypatch import MonkeyPatch
 from fastapi.testclient import TestClient
 
 from app.core.config import settings
+from app.core.dataversions import DATA_VERSIONS, today
+from tests.conftest import UserChoice
 
 
 @pytest.mark.anyio
@@ -64,3 +66,82 @@ async def test_frontend_settings_no_matomo(monkeypatch: MonkeyPatch, client: Tes
     # assert:
     assert response.status_code == 200
     assert response.json() == {"matomo_host": None, "matomo_site_id": None}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "test_user, client_user", [(UserChoice.SUPERUSER, UserChoice.SUPERUSER)], indirect=True
+)
+async def test_proxy_cache_stats(client_user: TestClient):
+    """Test proxy cache statistics endpoint."""
+    # act:
+    response = client_user.get("/internal/proxy-cache/stats")
+    # assert:
+    assert response.status_code == 200
+    assert set(response.json()) >= {"hits_memory", "hits_redis", "misses"}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "test_user, client_user", [(UserChoice.SUPERUSER, UserChoice.SUPERUSER)], indirect=True
+)
+async def test_circuit_breakers(client_user: TestClient):
+    """Test circuit breaker state endpoint."""
+    # act:
+    response = client_user.get("/internal/circuit-breakers")
+    # assert:
+    assert response.status_code == 200
+    assert isinstance(response.json(), dict)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "test_user, client_user", [(UserChoice.SUPERUSER, UserChoice.SUPERUSER)], indirect=True
+)
+async def test_metrics(client_user: TestClient):
+    """Test metrics endpoint."""
+    # act:
+    response = client_user.get("/internal/metrics")
+    # assert:
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE reev_upstream_request_duration_seconds histogram" in response.text
+    assert "# TYPE reev_db_query_duration_seconds histogram" in response.text
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/internal/proxy-cache/stats",
+        "/internal/remote-cache/stats",
+        "/internal/circuit-breakers",
+        "/internal/metrics",
+    ],
+)
+@pytest.mark.parametrize(
+    "test_user, client_user",
+    [
+        (UserChoice.NONE, UserChoice.NONE),
+        (UserChoice.REGULAR, UserChoice.REGULAR),
+    ],
+    indirect=True,
+)
+async def test_operational_endpoints_require_superuser(path: str, client_user: TestClient):
+    """Test that the operational endpoints are not available to other users."""
+    # act:
+    response = client_user.get(path)
+    # assert:
+    assert response.status_code in (401, 403)
+
+
+@pytest.mark.anyio
+async def test_data_versions(client: TestClient):
+    """Test data versions endpoint."""
+    # act:
+    response = client.get("/internal/data-versions")
+    # assert:
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == DATA_VERSIONS.model_dump()
+    assert response.json()["clingen_gene"] == today()
@@ -16,3 +16,25 @@ def async_return(result: typing.Any) -> asyncio.Future:
     f: asyncio.Future = asyncio.Future()
     f.set_result(result)
     return f
+
+
+class FakeRedis:
+    """Minimal stand-in for ``redis.asyncio.Redis`` storing strings in a dict."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+        #: Time to live of the keys as passed to ``set``.
+        self.ttls: dict[str, int | None] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str | bytes, ex: int | None = None, nx: bool = False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        self.ttls[key] = ex
+        return True
+
+    async def aclose(self):
+        pass